@@ -0,0 +1,317 @@
+"""
+End-to-end benchmark of the task1/task2/task3 advisor loops against the
+simulated drone (sim/fake_mavsdk.py) and the Ollama stand-in (sim/ollama_standin.py).
+
+Every task runs in its own subprocess (the task directories share module
+names) and reports decisions/s, tick latency percentiles, telemetry snapshot
+latency, prompt bytes/tokens per LLM request and memory growth per tick.
+
+    python benchmarks/bench_advisor.py --save-baseline bench_baseline.json
+    python benchmarks/bench_advisor.py --compare bench_baseline.json   # exit code 1 on a regression
+
+A task that crashes or reports no result makes the run exit with code 1, with
+or without a baseline.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASKS = ("task1", "task2", "task3")
+DEFAULT_DURATION_S = 10.0
+DEFAULT_TIME_FACTOR = 20.0 # simulated drone time per second of benchmark
+TASK3_MISSION = "Take off to 20m, fly a small triangle around the launch point and land."
+
+# metric -> True if higher is better; metrics compared against a baseline
+COMPARED_METRICS = {
+    "decisions_per_s": True,
+    "tick_p50_ms": False,
+    "tick_p95_ms": False,
+    "snapshot_p50_us": False,
+    "snapshot_p99_us": False,
+    "prompt_bytes_per_request": False,
+    "rss_growth_kb_per_tick": False,
+}
+DEFAULT_THRESHOLD = 0.15 # relative change that counts as a regression
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))]
+
+def current_rss_kb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        import resource # peak instead of current outside Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# --- Worker: runs one task's advisor in this process ---
+
+async def run_task(task, duration_s, time_factor, profile):
+    sys.path.insert(0, os.path.join(REPO_DIR, "sim"))
+    sys.path.insert(0, os.path.join(REPO_DIR, task))
+    import functools
+    import main as advisor
+    import ollama_res
+    import telemetry
+    from fake_mavsdk import System as SimSystem
+    from ollama_standin import OllamaStandIn
+
+    server = await OllamaStandIn(port=0, profile=profile, seed=0).start()
+    ollama_res.OLLAMA_HOST = server.url
+
+    # Time every telemetry snapshot the advisor takes
+    snapshot_us = array("d")
+    original_snapshot = telemetry.TelemetryCache.snapshot
+    def timed_snapshot(self, *args, **kwargs):
+        started = time.perf_counter()
+        result = original_snapshot(self, *args, **kwargs)
+        snapshot_us.append((time.perf_counter() - started) * 1e6)
+        return result
+    telemetry.TelemetryCache.snapshot = timed_snapshot
+
+    drones = []
+    async def connect_sim_drone():
+        drone = await telemetry.connect_drone(system_factory=functools.partial(SimSystem, time_factor=time_factor))
+        drones.append(drone)
+        return drone
+    advisor.connect_drone = connect_sim_drone
+
+    tick_ms = array("d")
+    extra = {}
+    if task == "task3":
+        from plan_cache import PlanCache
+        plan_cache = PlanCache(os.path.join(tempfile.mkdtemp(), "plans.sqlite3"))
+        ollama_res.get_plan_cache = lambda: plan_cache
+        # A task3 "tick" is one check of the vehicle against the planned leg
+        original_detect = advisor.detect_deviation
+        def timed_detect(*args):
+            started = time.perf_counter()
+            result = original_detect(*args)
+            tick_ms.append((time.perf_counter() - started) * 1000)
+            return result
+        advisor.detect_deviation = timed_detect
+        original_plan = advisor.get_mission_plan
+        async def timed_plan(*args, **kwargs):
+            started = time.perf_counter()
+            result = await original_plan(*args, **kwargs)
+            extra.setdefault("plan_ms", []).append(round((time.perf_counter() - started) * 1000, 1))
+            return result
+        advisor.get_mission_plan = timed_plan
+        coro = advisor.run_ollama_drone_advisor(mission=TASK3_MISSION)
+    elif task == "task1":
+        # task1 creates its own TickTimer; keep a reference to it
+        timers = []
+        class RecordingTickTimer(advisor.TickTimer):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                timers.append(self)
+        advisor.TickTimer = RecordingTickTimer
+        coro = advisor.run_ollama_drone_advisor(duration_seconds=float("inf"), update_interval_seconds=0)
+    else:
+        from replay import ScriptedCommandSource
+        from fake_mavsdk import SIM_HOME
+        timers = [advisor.TickTimer()] # planner ticks only, not executor actions
+        commands = [(0.2, "Take off to 10m"),
+                    (duration_s * 0.4, f"Go to {SIM_HOME[0] + 0.0005:.6f}, {SIM_HOME[1]:.6f} at 20m"),
+                    (duration_s * 0.8, "Land")]
+        coro = advisor.run_ollama_drone_advisor(command_source=ScriptedCommandSource(commands),
+                                                tick_timer=timers[0], telemetry_log_dir=None)
+
+    def decisions():
+        return len(tick_ms) if task == "task3" else sum(timer.tick_count for timer in timers)
+
+    # Memory growth is measured from the first decision on, so imports and
+    # connection setup are not charged to the ticks
+    first_decision = None
+    async def sample_memory():
+        nonlocal first_decision
+        while first_decision is None:
+            await asyncio.sleep(0.05)
+            if decisions():
+                first_decision = (decisions(), current_rss_kb())
+
+    started = time.perf_counter()
+    sampler = asyncio.create_task(sample_memory())
+    task_handle = asyncio.ensure_future(coro)
+    done, _ = await asyncio.wait([task_handle], timeout=duration_s)
+    elapsed_s = time.perf_counter() - started
+    sampler.cancel()
+    decisions_after, rss_after_kb = decisions(), current_rss_kb()
+    decisions_before, rss_before_kb = first_decision or (decisions_after, rss_after_kb)
+    if not done:
+        task_handle.cancel()
+    try:
+        await task_handle
+    except asyncio.CancelledError:
+        pass
+
+    if task != "task3":
+        for timer in timers:
+            tick_ms.extend(tick["total_ms"] for tick in timer.ticks)
+    for drone in drones:
+        await telemetry.stop_telemetry_cache(drone)
+        extra["sim"] = drone.stats()
+        await drone.close()
+    await server.stop()
+
+    ticks = sorted(tick_ms)
+    snapshots = sorted(snapshot_us)
+    requests = max(1, server.requests)
+    return dict({
+        "duration_s": round(elapsed_s, 3),
+        "decisions": decisions_after,
+        "decisions_per_s": round(decisions_after / elapsed_s, 3),
+        "tick_p50_ms": round(percentile(ticks, 0.50), 3),
+        "tick_p95_ms": round(percentile(ticks, 0.95), 3),
+        "tick_p99_ms": round(percentile(ticks, 0.99), 3),
+        "snapshots": len(snapshots),
+        "snapshot_p50_us": round(percentile(snapshots, 0.50), 2),
+        "snapshot_p99_us": round(percentile(snapshots, 0.99), 2),
+        "llm_requests": server.requests,
+        "prompt_bytes_per_request": round(server.prompt_bytes / requests, 1),
+        "prompt_tokens_per_request": round(server.prompt_tokens / requests, 1),
+        "rss_mb": round(rss_after_kb / 1024, 1),
+        "rss_growth_kb_per_tick": round((rss_after_kb - rss_before_kb) / max(1, decisions_after - decisions_before), 3),
+    }, **extra)
+
+def worker_main(args):
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull if not args.verbose else sys.stdout):
+        result = asyncio.run(run_task(args.worker, args.duration, args.time_factor, args.profile))
+    with open(args.result, "w") as f:
+        json.dump(result, f)
+
+
+# --- Parent: one subprocess per task, then report / baseline ---
+
+def run_benchmarks(args):
+    """Returns the results of every task that finished; a crashed task has no entry."""
+    results = {}
+    for task in args.tasks:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            result_path = f.name
+        try:
+            command = [sys.executable, os.path.abspath(__file__), "--worker", task, "--result", result_path,
+                       "--duration", str(args.duration), "--time-factor", str(args.time_factor), "--profile", args.profile]
+            if args.verbose:
+                command.append("--verbose")
+            print(f"Running {task} for {args.duration:g}s ({args.profile} LLM, drone x{args.time_factor:g})...", flush=True)
+            completed = subprocess.run(command, cwd=tempfile.gettempdir())
+            if completed.returncode != 0:
+                print(f"{task} failed with exit code {completed.returncode}")
+                continue
+            try:
+                with open(result_path) as f:
+                    results[task] = json.load(f)
+            except ValueError as e:
+                print(f"{task} wrote no usable result: {e}")
+        finally:
+            os.unlink(result_path)
+    return results
+
+def print_results(results):
+    print(f"\n{'task':<6} {'decisions/s':>11} {'tick p50':>10} {'tick p95':>10} {'tick p99':>10} "
+          f"{'snap p50':>9} {'snap p99':>9} {'LLM req':>8} {'prompt B':>9} {'~tokens':>8} {'KB/tick':>8}")
+    for task, r in results.items():
+        print(f"{task:<6} {r['decisions_per_s']:>11.2f} {r['tick_p50_ms']:>8.2f}ms {r['tick_p95_ms']:>8.2f}ms "
+              f"{r['tick_p99_ms']:>8.2f}ms {r['snapshot_p50_us']:>7.1f}us {r['snapshot_p99_us']:>7.1f}us "
+              f"{r['llm_requests']:>8} {r['prompt_bytes_per_request']:>9.0f} {r['prompt_tokens_per_request']:>8.0f} "
+              f"{r['rss_growth_kb_per_tick']:>8.2f}")
+
+def compare(results, baseline, threshold, tasks=None):
+    """
+    Prints every compared metric against the baseline; returns the list of regressions.
+    A baseline task among `tasks` (default: all of them) without a result, or a
+    result missing a baseline metric, counts as a regression.
+    """
+    regressions = []
+    print(f"\nAgainst baseline from {baseline['meta'].get('created', '?')} (threshold {threshold:.0%}):")
+    for task in baseline["results"]:
+        if task not in results and (tasks is None or task in tasks):
+            regressions.append((task, "result", None, None))
+            print(f"  {task}: no result (crashed or missing) REGRESSION")
+    for task, r in results.items():
+        base = baseline["results"].get(task)
+        if base is None:
+            print(f"  {task}: not in baseline")
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = base.get(metric), r.get(metric)
+            if old is None:
+                continue
+            if new is None:
+                regressions.append((task, metric, old, new))
+                print(f"  {task} {metric:<26} {old:>12.3f} -> {'missing':>12} REGRESSION")
+                continue
+            change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+            worse = -change if higher_is_better else change
+            flag = "REGRESSION" if worse > threshold else ""
+            if flag:
+                regressions.append((task, metric, old, new))
+            print(f"  {task} {metric:<26} {old:>12.3f} -> {new:>12.3f} ({change:+.1%}) {flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", nargs="+", default=list(TASKS), choices=TASKS)
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION_S, help="seconds per task")
+    parser.add_argument("--time-factor", type=float, default=DEFAULT_TIME_FACTOR)
+    parser.add_argument("--profile", default="cpu-1b", help="Ollama stand-in latency profile")
+    parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--verbose", action="store_true", help="show the advisors' own output")
+    parser.add_argument("--worker", choices=TASKS, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args)
+        return
+    results = run_benchmarks(args)
+    print_results(results)
+    failed = [task for task in args.tasks if task not in results]
+    if failed:
+        print(f"\nNo result from {', '.join(failed)}.")
+    if args.save_baseline and failed:
+        print(f"Baseline not written to {args.save_baseline}: it would be missing {', '.join(failed)}.")
+    elif args.save_baseline:
+        meta = {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "duration_s": args.duration,
+            "time_factor": args.time_factor,
+            "profile": args.profile,
+        }
+        with open(args.save_baseline, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for option in ("profile", "time_factor", "duration_s"):
+            current = {"profile": args.profile, "time_factor": args.time_factor, "duration_s": args.duration}[option]
+            if baseline["meta"].get(option) != current:
+                print(f"Note: baseline was run with {option}={baseline['meta'].get(option)}, this run uses {current}.")
+        regressions = compare(results, baseline, args.threshold, args.tasks)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s).")
+            sys.exit(1)
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
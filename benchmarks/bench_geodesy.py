@@ -0,0 +1,69 @@
+"""
+Micro-benchmark for the geodesy helpers shared by goto arrival checks and mission planning:
+scalar haversine vs the equirectangular fast path, and the batch functions
+(NumPy-vectorized when NumPy is installed) vs a plain Python loop.
+
+    python benchmarks/bench_geodesy.py
+    python benchmarks/bench_geodesy.py --points 100000 --repeat 7
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "task2"))
+
+import geodesy
+from geodesy import distance_m, equirectangular_m, haversine_m, haversine_many, ned_to_lla, ned_to_lla_many
+
+HOME = (47.397742, 8.545594, 488.0)
+
+
+def best_ns(statement, number, repeat):
+    return min(timeit.repeat(statement, number=number, repeat=repeat)) / number * 1e9
+
+def report_scalar(repeat):
+    lat, lon, _ = HOME
+    target = (lat + 0.0009, lon + 0.0012)
+    print(f"{'scalar function':<22} {'ns/call':>10}")
+    for name, function in (("haversine_m", haversine_m), ("equirectangular_m", equirectangular_m),
+                           ("distance_m", distance_m)):
+        ns = best_ns(lambda: function(lat, lon, *target), 100000, repeat)
+        print(f"{name:<22} {ns:>10.0f}")
+
+def report_batch(points, repeat):
+    rng = random.Random(0)
+    lat0, lon0, alt0 = HOME
+    norths = [rng.uniform(-2000, 2000) for _ in range(points)]
+    easts = [rng.uniform(-2000, 2000) for _ in range(points)]
+    downs = [rng.uniform(-120, 0) for _ in range(points)]
+    lats, lons, _ = ned_to_lla_many(lat0, lon0, alt0, norths, easts, downs)
+
+    backend = "numpy" if geodesy.np is not None else "pure Python fallback"
+    print(f"\n{'batch of ' + str(points):<22} {'loop ms':>10} {'batch ms':>10} {'speedup':>8}   ({backend})")
+    cases = (
+        ("haversine_many",
+         lambda: [haversine_m(lat0, lon0, la, lo) for la, lo in zip(lats, lons)],
+         lambda: haversine_many(lat0, lon0, lats, lons)),
+        ("ned_to_lla_many",
+         lambda: [ned_to_lla(lat0, lon0, alt0, n, e, d) for n, e, d in zip(norths, easts, downs)],
+         lambda: ned_to_lla_many(lat0, lon0, alt0, norths, easts, downs)),
+    )
+    for name, loop, batch in cases:
+        loop_ms = best_ns(loop, 1, repeat) / 1e6
+        batch_ms = best_ns(batch, 1, repeat) / 1e6
+        print(f"{name:<22} {loop_ms:>10.2f} {batch_ms:>10.2f} {loop_ms / batch_ms:>7.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--points", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    report_scalar(args.repeat)
+    report_batch(args.points, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Compares prompt size and Ollama latency for the task2 telemetry encodings:
+  legacy  - the original prompt, verbatim: one prompt, no system prompt, indented JSON
+  json    - full snapshot as minified JSON
+  compact - abbreviated keys, rounded floats, only the fields the variant uses
+
+    python benchmarks/bench_prompt_encoding.py             # prompt sizes only
+    python benchmarks/bench_prompt_encoding.py --ollama    # plus llama3.2:1b / 3b timings
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "task2"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+from legacy_prompts import LEGACY_PROMPT_TEMPLATES
+from ollama_res import OLLAMA_HOST, PROMPT_TEMPLATES, build_prompt, encode_prompt_telemetry
+
+SAMPLE_TELEMETRY = {
+    "position": {"latitude_deg": 47.397742, "longitude_deg": 8.545594, "relative_altitude_m": 29.87312316894531},
+    "velocity_ned": {"north_m_s": 0.012345, "east_m_s": -0.0231, "down_m_s": 0.0031},
+    "attitude_euler": {"roll_deg": 0.41273, "pitch_deg": -1.2317, "yaw_deg": 89.9183},
+    "battery": {"remaining_percent": 64, "voltage_v": 15.42},
+    "flight_mode": "HOLD",
+    "gps_info": {"num_satellites": 10, "fix_type": 3},
+    "in_air": True,
+    "armed": True,
+    "health": {"global_position_ok": True, "home_position_ok": True, "armable": True},
+}
+HUMAN_COMMAND = "Go to 47.3980, 8.5460 at 30m"
+DEFAULT_MODELS = ("llama3.2:1b", "llama3.2:3b")
+
+
+def legacy_prompt(variant, human_command, telemetry_data):
+    # (system, prompt) like build_prompt(); the original sent no system prompt
+    template = LEGACY_PROMPT_TEMPLATES[variant]
+    return "", template.format(telemetry=json.dumps(telemetry_data, indent=2), human_command=human_command)
+
+PROMPT_FORMATS = {
+    "legacy": legacy_prompt,
+    "json": lambda variant, command, telemetry: build_prompt(command, telemetry, variant, "json"),
+    "compact": lambda variant, command, telemetry: build_prompt(command, telemetry, variant, "compact"),
+}
+
+def jittered_telemetry(rng):
+    # Vary the dynamic values per request so Ollama cannot reuse a cached prompt verbatim
+    telemetry = json.loads(json.dumps(SAMPLE_TELEMETRY))
+    telemetry["position"]["relative_altitude_m"] += rng.uniform(-0.5, 0.5)
+    telemetry["position"]["latitude_deg"] += rng.uniform(-1e-5, 1e-5)
+    telemetry["battery"]["remaining_percent"] = rng.randint(40, 90)
+    return telemetry
+
+
+def telemetry_part(name, variant, telemetry_data):
+    # The per-tick part of the prompt; everything else is static text
+    if name == "legacy":
+        return json.dumps(telemetry_data, indent=2)
+    return encode_prompt_telemetry(telemetry_data, variant, name)
+
+def report_prompt_sizes():
+    # ~tokens is a rough offline estimate (~4 characters per Llama 3 token); --ollama reports real counts
+    print(f"{'variant':<8} {'format':<8} {'chars':>6} {'~tokens':>8} {'vs legacy':>9} "
+          f"{'per-call chars':>15} {'telemetry chars':>16}")
+    for variant in PROMPT_TEMPLATES:
+        legacy_chars = sum(map(len, legacy_prompt(variant, HUMAN_COMMAND, SAMPLE_TELEMETRY)))
+        for name, build in PROMPT_FORMATS.items():
+            system_prompt, prompt = build(variant, HUMAN_COMMAND, SAMPLE_TELEMETRY)
+            chars = len(system_prompt) + len(prompt)
+            telemetry_chars = len(telemetry_part(name, variant, SAMPLE_TELEMETRY))
+            print(f"{variant:<8} {name:<8} {chars:>6} {round(chars / 4):>8} {chars / legacy_chars:>9.0%} "
+                  f"{len(prompt):>15} {telemetry_chars:>16}")
+
+async def time_format(client, model, variant, name, runs, rng):
+    build = PROMPT_FORMATS[name]
+    prompt_tokens, latencies_ms, prefill_ms = [], [], []
+    for _ in range(runs):
+        system_prompt, prompt = build(variant, HUMAN_COMMAND, jittered_telemetry(rng))
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+            "format": "json",
+            "options": {"temperature": 0},
+            "keep_alive": "30m",
+        }
+        if system_prompt:
+            payload["system"] = system_prompt
+        started = time.perf_counter()
+        response = await client.post("/api/generate", json=payload)
+        response.raise_for_status()
+        latencies_ms.append((time.perf_counter() - started) * 1000)
+        body = response.json()
+        prompt_tokens.append(body.get("prompt_eval_count", 0))
+        prefill_ms.append(body.get("prompt_eval_duration", 0) / 1e6)
+    return {
+        "prompt_eval_count_max": max(prompt_tokens),
+        "prompt_eval_ms_p50": statistics.median(prefill_ms),
+        "latency_ms_p50": statistics.median(latencies_ms),
+    }
+
+async def report_ollama(models, variant, runs, seed):
+    rng = random.Random(seed)
+    async with httpx.AsyncClient(base_url=OLLAMA_HOST, timeout=120.0) as client:
+        print(f"\n{'model':<13} {'format':<8} {'prompt tok':>10} {'prefill p50':>12} {'latency p50':>12}")
+        for model in models:
+            # Warm-up loads the model so the first timed format is not penalised
+            await client.post("/api/generate", json={"model": model, "prompt": "ok", "stream": False})
+            for name in PROMPT_FORMATS:
+                result = await time_format(client, model, variant, name, runs, rng)
+                print(f"{model:<13} {name:<8} {result['prompt_eval_count_max']:>10} "
+                      f"{result['prompt_eval_ms_p50']:>10.1f}ms {result['latency_ms_p50']:>10.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ollama", action="store_true", help="also time real Ollama requests")
+    parser.add_argument("--models", nargs="+", default=DEFAULT_MODELS)
+    parser.add_argument("--variant", default="prompt3", choices=sorted(PROMPT_TEMPLATES))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    report_prompt_sizes()
+    if args.ollama:
+        asyncio.run(report_ollama(args.models, args.variant, args.runs, args.seed))
+
+if __name__ == "__main__":
+    main()
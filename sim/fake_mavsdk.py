@@ -0,0 +1,497 @@
+# fake_mavsdk.py
+"""
+In-process stand-in for mavsdk.System, for soak tests and benchmarks without
+PX4 or Gazebo.
+
+System offers the telemetry.* async generators, action.* coroutines and
+core.connection_state() the advisors use, backed by a simple point-mass
+model: vertical climb/descent rates, a cruise speed, battery drain under load,
+auto-disarm after landing and scheduled or injected GPS dropouts.
+`time_factor` runs the simulated vehicle that many times faster than the
+event loop clock.
+
+    sys.path.insert(0, "sim")
+    from fake_mavsdk import System
+    drone = await connect_drone(system_factory=lambda: System(time_factor=10))
+"""
+import asyncio
+import math
+import random
+from collections import Counter
+from enum import Enum
+from types import SimpleNamespace
+
+try:
+    # Use the real enums where MAVSDK is installed, so comparisons like
+    # `flight_mode != FlightMode.HOLD` in the action code behave the same
+    from mavsdk.telemetry import FixType, FlightMode
+except ImportError:
+    FlightMode = Enum("FlightMode", [
+        ("UNKNOWN", 0), ("READY", 1), ("TAKEOFF", 2), ("HOLD", 3), ("MISSION", 4), ("RETURN_TO_LAUNCH", 5),
+        ("LAND", 6), ("OFFBOARD", 7), ("FOLLOW_ME", 8), ("MANUAL", 9), ("ALTCTL", 10), ("POSCTL", 11),
+        ("ACRO", 12), ("STABILIZED", 13), ("RATTITUDE", 14)])
+    FixType = Enum("FixType", [
+        ("NO_GPS", 0), ("NO_FIX", 1), ("FIX_2D", 2), ("FIX_3D", 3), ("FIX_DGPS", 4), ("RTK_FLOAT", 5),
+        ("RTK_FIXED", 6)])
+
+SIM_HOME = (47.397742, 8.545594)  # PX4 SITL default home
+SIM_PHYSICS_RATE_HZ = 50.0
+SIM_TELEMETRY_RATE_HZ = 10.0      # every telemetry stream publishes at this (simulated) rate
+SIM_CLIMB_RATE_M_S = 2.5
+SIM_DESCENT_RATE_M_S = 1.5
+SIM_CRUISE_SPEED_M_S = 8.0
+SIM_TAKEOFF_ALTITUDE_M = 2.5      # PX4 MIS_TAKEOFF_ALT default
+SIM_RTL_ALTITUDE_M = 30.0         # RTL climbs to at least this before flying home
+SIM_ARRIVAL_RADIUS_M = 0.5
+SIM_HOVER_DRAIN_PER_S = 1 / 1200  # battery fraction used per second of hover (~20 min flights)
+SIM_CRUISE_EXTRA_DRAIN = 0.3      # extra load at cruise speed, relative to hover
+SIM_GROUND_DRAIN = 0.05           # load while armed on the ground, relative to hover
+SIM_FULL_VOLTAGE_V = 16.8
+SIM_EMPTY_VOLTAGE_V = 13.2
+SIM_SATELLITES = 12
+SIM_DISARM_AFTER_LAND_S = 2.0     # PX4 COM_DISARM_LAND
+SIM_COMMAND_LATENCY_S = 0.02      # simulated seconds until a command is acknowledged
+
+_EARTH_RADIUS_M = 6378137.0
+
+
+class SimActionError(Exception):
+    """Raised by action.* commands the simulated autopilot denies, like mavsdk.action.ActionError."""
+
+
+class SimVehicle:
+    """
+    State and kinematics of one simulated vehicle. Positions are kept as
+    north/east meters from home plus relative altitude; goto altitudes are
+    taken as relative to home, the way the advisors use them.
+    """
+
+    def __init__(self, home=SIM_HOME, battery=1.0, gps_dropouts=(), gps_dropout_rate_per_h=0.0,
+                 gps_dropout_s=10.0, seed=None):
+        self.home = home
+        self.time_s = 0.0
+        self.north_m = self.east_m = self.altitude_m = 0.0
+        self.v_north = self.v_east = self.v_down = 0.0
+        self.yaw_deg = 0.0
+        self.armed = False
+        self.in_air = False
+        self.crashed = False
+        self.flight_mode = FlightMode.READY
+        self.battery = battery
+        self.takeoff_altitude_m = SIM_TAKEOFF_ALTITUDE_M
+        self.target = None           # (north_m, east_m, altitude_m) of a goto, held in HOLD
+        self.rtl_phase = None        # "climb", "return" during RETURN_TO_LAUNCH
+        self.landed_at = None
+        self.gps_dropouts = sorted(gps_dropouts) # (start_s, duration_s) in simulated time
+        self.gps_dropout_rate_per_h = gps_dropout_rate_per_h
+        self.gps_dropout_s = gps_dropout_s
+        self._gps_lost_until = -1.0
+        self._random = random.Random(seed)
+        self.flight_time_s = 0.0
+        self.distance_m = 0.0
+        self.commands = Counter()
+
+    # Derived values, as reported by the telemetry streams
+
+    def latitude_deg(self):
+        return self.home[0] + math.degrees(self.north_m / _EARTH_RADIUS_M)
+
+    def longitude_deg(self):
+        return self.home[1] + math.degrees(self.east_m / (_EARTH_RADIUS_M * math.cos(math.radians(self.home[0]))))
+
+    def gps_ok(self):
+        return self.time_s >= self._gps_lost_until
+
+    def voltage_v(self):
+        return SIM_EMPTY_VOLTAGE_V + (SIM_FULL_VOLTAGE_V - SIM_EMPTY_VOLTAGE_V) * self.battery
+
+    def lose_gps(self, duration_s):
+        self._gps_lost_until = max(self._gps_lost_until, self.time_s + duration_s)
+
+    # Kinematics
+
+    def step(self, dt):
+        self.time_s += dt
+        self._update_gps(dt)
+        if not self.armed:
+            self.v_north = self.v_east = self.v_down = 0.0
+            return
+        if self.in_air:
+            self.flight_time_s += dt
+            if self.battery <= 0.0 and self.flight_mode != FlightMode.LAND:
+                self.flight_mode = FlightMode.LAND # Empty battery: the autopilot lands wherever it is
+        mode = self.flight_mode
+        if mode == FlightMode.TAKEOFF:
+            if self._move_toward(self.north_m, self.east_m, self.takeoff_altitude_m, dt):
+                self.flight_mode = FlightMode.HOLD
+        elif mode == FlightMode.RETURN_TO_LAUNCH:
+            self._return_to_launch(dt)
+        elif mode == FlightMode.LAND:
+            self._land(dt)
+        elif self.in_air and self.target is not None and self.gps_ok():
+            self._move_toward(*self.target, dt)
+        else:
+            # Hold, or drift to a stop without a position fix
+            self.v_north *= 0.9
+            self.v_east *= 0.9
+            self.v_down = 0.0
+            self._integrate(dt)
+        self._drain_battery(dt)
+
+    def _update_gps(self, dt):
+        while self.gps_dropouts and self.gps_dropouts[0][0] <= self.time_s:
+            _, duration_s = self.gps_dropouts.pop(0)
+            self.lose_gps(duration_s)
+        if self.gps_dropout_rate_per_h and self._random.random() < self.gps_dropout_rate_per_h * dt / 3600:
+            self.lose_gps(self.gps_dropout_s)
+
+    def _move_toward(self, north_m, east_m, altitude_m, dt):
+        """Flies toward a point at cruise speed and climb/descent rate. Returns True once there."""
+        d_north, d_east, d_up = north_m - self.north_m, east_m - self.east_m, altitude_m - self.altitude_m
+        horizontal = math.hypot(d_north, d_east)
+        if horizontal > 1e-9:
+            speed = min(SIM_CRUISE_SPEED_M_S, horizontal / dt)
+            self.v_north, self.v_east = d_north / horizontal * speed, d_east / horizontal * speed
+            self.yaw_deg = math.degrees(math.atan2(d_east, d_north)) % 360
+        else:
+            self.v_north = self.v_east = 0.0
+        rate = SIM_CLIMB_RATE_M_S if d_up > 0 else SIM_DESCENT_RATE_M_S
+        self.v_down = -math.copysign(min(rate, abs(d_up) / dt), d_up)
+        self._integrate(dt)
+        if self.altitude_m > 0.0:
+            self.in_air = True
+        return horizontal <= SIM_ARRIVAL_RADIUS_M and abs(d_up) <= SIM_ARRIVAL_RADIUS_M
+
+    def _integrate(self, dt):
+        self.north_m += self.v_north * dt
+        self.east_m += self.v_east * dt
+        self.altitude_m = max(0.0, self.altitude_m - self.v_down * dt)
+        self.distance_m += math.hypot(self.v_north, self.v_east) * dt
+
+    def _return_to_launch(self, dt):
+        if self.rtl_phase == "climb":
+            if self._move_toward(self.north_m, self.east_m, max(SIM_RTL_ALTITUDE_M, self.altitude_m), dt):
+                self.rtl_phase = "return"
+        elif self._move_toward(0.0, 0.0, self.altitude_m, dt):
+            self.rtl_phase = None
+            self.flight_mode = FlightMode.LAND
+
+    def _land(self, dt):
+        if self.in_air:
+            self.v_north = self.v_east = 0.0
+            self.v_down = SIM_DESCENT_RATE_M_S
+            self._integrate(dt)
+            if self.altitude_m <= 0.0:
+                self.in_air = False
+                self.v_down = 0.0
+                self.landed_at = self.time_s
+        elif self.landed_at is None or self.time_s - self.landed_at >= SIM_DISARM_AFTER_LAND_S:
+            self.armed = False
+            self.target = None
+            self.landed_at = None
+            self.flight_mode = FlightMode.READY
+
+    def _drain_battery(self, dt):
+        if self.in_air:
+            load = 1.0 + SIM_CRUISE_EXTRA_DRAIN * math.hypot(self.v_north, self.v_east) / SIM_CRUISE_SPEED_M_S
+        else:
+            load = SIM_GROUND_DRAIN
+        self.battery = max(0.0, self.battery - SIM_HOVER_DRAIN_PER_S * load * dt)
+
+    # Commands (validated like PX4 would, applied at once)
+
+    def command(self, name, *args):
+        self.commands[name] += 1
+        getattr(self, f"_command_{name}")(*args)
+
+    def _command_arm(self):
+        if self.armed:
+            return
+        if self.crashed or not self.gps_ok() or self.battery <= 0.0:
+            raise SimActionError("COMMAND_DENIED: pre-arm checks failed")
+        self.armed = True
+        self.flight_mode = FlightMode.HOLD
+
+    def _command_disarm(self):
+        if self.in_air:
+            raise SimActionError("COMMAND_DENIED: vehicle is in air")
+        self.armed = False
+        self.flight_mode = FlightMode.READY
+
+    def _command_set_takeoff_altitude(self, altitude_m):
+        self.takeoff_altitude_m = float(altitude_m)
+
+    def _command_takeoff(self):
+        if not self.armed:
+            raise SimActionError("COMMAND_DENIED: vehicle is not armed")
+        self.target = None
+        self.flight_mode = FlightMode.TAKEOFF
+
+    def _command_goto_location(self, latitude_deg, longitude_deg, altitude_m, yaw_deg):
+        if not self.armed or not self.in_air:
+            raise SimActionError("COMMAND_DENIED: vehicle is not flying")
+        north_m = math.radians(latitude_deg - self.home[0]) * _EARTH_RADIUS_M
+        east_m = math.radians(longitude_deg - self.home[1]) * _EARTH_RADIUS_M * math.cos(math.radians(self.home[0]))
+        self.target = (north_m, east_m, float(altitude_m))
+        self.flight_mode = FlightMode.HOLD
+
+    def _command_hold(self):
+        if not self.armed:
+            raise SimActionError("COMMAND_DENIED: vehicle is not armed")
+        self.target = (self.north_m, self.east_m, self.altitude_m) if self.in_air else None
+        self.flight_mode = FlightMode.HOLD
+
+    def _command_land(self):
+        if not self.armed:
+            return
+        self.target = None
+        self.flight_mode = FlightMode.LAND
+
+    def _command_return_to_launch(self):
+        if not self.armed or not self.in_air:
+            raise SimActionError("COMMAND_DENIED: vehicle is not flying")
+        self.target = None
+        self.rtl_phase = "climb"
+        self.flight_mode = FlightMode.RETURN_TO_LAUNCH
+
+    def _command_kill(self):
+        if self.in_air:
+            self.crashed = True
+            self.in_air = False
+            self.altitude_m = 0.0
+        self.armed = False
+        self.target = None
+        self.flight_mode = FlightMode.READY
+
+
+class _Core:
+    def __init__(self, system):
+        self._system = system
+
+    async def connection_state(self):
+        while True:
+            yield SimpleNamespace(is_connected=self._system.connected, uuid=0)
+            await self._system._wait_for_telemetry()
+
+
+class _Telemetry:
+    """telemetry.* streams: each yields the current value at once, then on every telemetry tick."""
+
+    def __init__(self, system):
+        self._system = system
+        self._vehicle = system.vehicle
+
+    async def _stream(self, value):
+        while True:
+            yield value()
+            await self._system._wait_for_telemetry()
+
+    def position(self):
+        v = self._vehicle
+        return self._stream(lambda: SimpleNamespace(
+            latitude_deg=v.latitude_deg(), longitude_deg=v.longitude_deg(),
+            absolute_altitude_m=v.altitude_m, relative_altitude_m=v.altitude_m))
+
+    def velocity_ned(self):
+        v = self._vehicle
+        return self._stream(lambda: SimpleNamespace(north_m_s=v.v_north, east_m_s=v.v_east, down_m_s=v.v_down))
+
+    def attitude_euler(self):
+        v = self._vehicle
+        # Lean into the direction of travel, about 2 degrees per m/s
+        return self._stream(lambda: SimpleNamespace(
+            roll_deg=0.0, pitch_deg=-2.0 * math.hypot(v.v_north, v.v_east), yaw_deg=v.yaw_deg, timestamp_us=0))
+
+    def battery(self):
+        v = self._vehicle
+        return self._stream(lambda: SimpleNamespace(id=0, voltage_v=v.voltage_v(), remaining_percent=v.battery))
+
+    def flight_mode(self):
+        v = self._vehicle
+        return self._stream(lambda: v.flight_mode)
+
+    def gps_info(self):
+        v = self._vehicle
+        return self._stream(lambda: SimpleNamespace(
+            num_satellites=SIM_SATELLITES if v.gps_ok() else 0,
+            fix_type=FixType.FIX_3D if v.gps_ok() else FixType.NO_FIX))
+
+    def in_air(self):
+        v = self._vehicle
+        return self._stream(lambda: v.in_air)
+
+    def armed(self):
+        v = self._vehicle
+        return self._stream(lambda: v.armed)
+
+    def health(self):
+        v = self._vehicle
+        return self._stream(lambda: SimpleNamespace(
+            is_gyrometer_calibration_ok=True, is_accelerometer_calibration_ok=True,
+            is_magnetometer_calibration_ok=True, is_local_position_ok=True,
+            is_global_position_ok=v.gps_ok(), is_home_position_ok=True,
+            is_armable=v.gps_ok() and not v.armed and not v.crashed and v.battery > 0.0))
+
+
+class _Action:
+    def __init__(self, system):
+        self._system = system
+
+    async def _command(self, name, *args):
+        await asyncio.sleep(self._system.command_latency_s / self._system.time_factor)
+        self._system.vehicle.command(name, *args)
+
+    async def arm(self):
+        await self._command("arm")
+
+    async def disarm(self):
+        await self._command("disarm")
+
+    async def set_takeoff_altitude(self, altitude):
+        await self._command("set_takeoff_altitude", altitude)
+
+    async def get_takeoff_altitude(self):
+        return self._system.vehicle.takeoff_altitude_m
+
+    async def takeoff(self):
+        await self._command("takeoff")
+
+    async def goto_location(self, latitude_deg, longitude_deg, absolute_altitude_m, yaw_deg):
+        await self._command("goto_location", latitude_deg, longitude_deg, absolute_altitude_m, yaw_deg)
+
+    async def hold(self):
+        await self._command("hold")
+
+    async def land(self):
+        await self._command("land")
+
+    async def return_to_launch(self):
+        await self._command("return_to_launch")
+
+    async def kill(self):
+        await self._command("kill")
+
+
+class System:
+    """
+    Drop-in for mavsdk.System. connect() starts the physics loop on the running
+    event loop; close() stops it. Several Systems can share one loop.
+    """
+
+    def __init__(self, home=SIM_HOME, time_factor=1.0, physics_rate_hz=SIM_PHYSICS_RATE_HZ,
+                 telemetry_rate_hz=SIM_TELEMETRY_RATE_HZ, command_latency_s=SIM_COMMAND_LATENCY_S, **vehicle_options):
+        self.vehicle = SimVehicle(home=home, **vehicle_options)
+        self.time_factor = time_factor
+        self.physics_period_s = 1.0 / physics_rate_hz
+        self.telemetry_period_s = 1.0 / telemetry_rate_hz
+        self.command_latency_s = command_latency_s
+        self.system_address = None
+        self.connected = False
+        self.telemetry_ticks = 0
+        self.core = _Core(self)
+        self.telemetry = _Telemetry(self)
+        self.action = _Action(self)
+        self._telemetry_tick = asyncio.Event()
+        self._task = None
+
+    async def connect(self, system_address=None):
+        self.system_address = system_address
+        if self._task is None:
+            self._telemetry_tick = asyncio.Event() # bound to the running loop
+            self._task = asyncio.create_task(self._run())
+        self.connected = True
+
+    async def close(self):
+        self.connected = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _wait_for_telemetry(self):
+        await self._telemetry_tick.wait()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        vehicle = self.vehicle
+        last = loop.time()
+        next_telemetry_s = vehicle.time_s
+        while True:
+            await asyncio.sleep(self.physics_period_s / self.time_factor)
+            now = loop.time()
+            dt = (now - last) * self.time_factor
+            last = now
+            # Integrate in physics-sized steps even if the loop was late
+            while dt > 1e-9:
+                step = min(dt, self.physics_period_s)
+                vehicle.step(step)
+                dt -= step
+            if vehicle.time_s >= next_telemetry_s:
+                next_telemetry_s = vehicle.time_s + self.telemetry_period_s
+                self.telemetry_ticks += 1
+                tick, self._telemetry_tick = self._telemetry_tick, asyncio.Event()
+                tick.set()
+
+    def stats(self):
+        v = self.vehicle
+        return {
+            "sim_time_s": round(v.time_s, 1),
+            "flight_time_s": round(v.flight_time_s, 1),
+            "distance_m": round(v.distance_m, 1),
+            "battery_percent": round(v.battery * 100, 1),
+            "crashed": v.crashed,
+            "telemetry_ticks": self.telemetry_ticks,
+            "commands": dict(v.commands),
+        }
+
+
+async def main_fake_mavsdk_test():
+    import time
+    drone = System(time_factor=50.0, gps_dropouts=[(60.0, 5.0)])
+    await drone.connect(system_address="udp://:14540")
+    started = time.monotonic()
+
+    async def wait_until(condition, stream):
+        async for value in stream:
+            if condition(value):
+                return value
+
+    def log(message):
+        v = drone.vehicle
+        print(f"[{v.time_s:6.1f}s sim, {time.monotonic() - started:5.2f}s real] {message}: "
+              f"alt={v.altitude_m:.1f}m N={v.north_m:.1f} E={v.east_m:.1f} mode={v.flight_mode.name} "
+              f"battery={v.battery:.1%}")
+
+    try:
+        await drone.action.takeoff()
+    except SimActionError as e:
+        print(f"Takeoff while disarmed denied: {e}")
+    await drone.action.arm()
+    await drone.action.set_takeoff_altitude(10.0)
+    await drone.action.takeoff()
+    await wait_until(lambda mode: mode == FlightMode.HOLD, drone.telemetry.flight_mode())
+    log("Takeoff done")
+
+    lat, lon = drone.vehicle.latitude_deg(), drone.vehicle.longitude_deg()
+    await drone.action.goto_location(lat + 0.002, lon, 20.0, 0.0)
+    position = await wait_until(lambda p: abs(p.latitude_deg - (lat + 0.002)) < 1e-5, drone.telemetry.position())
+    log(f"Reached goto ({position.relative_altitude_m:.1f}m relative)")
+
+    gps = await wait_until(lambda g: g.fix_type != FixType.FIX_3D, drone.telemetry.gps_info())
+    log(f"GPS dropout: fix {gps.fix_type.name}, {gps.num_satellites} satellites")
+    await wait_until(lambda g: g.fix_type == FixType.FIX_3D, drone.telemetry.gps_info())
+    log("GPS back")
+
+    await drone.action.return_to_launch()
+    await wait_until(lambda in_air: not in_air, drone.telemetry.in_air())
+    log("Landed after RTL")
+    await wait_until(lambda armed: not armed, drone.telemetry.armed())
+    log("Auto-disarmed")
+    print(f"Sim stats: {drone.stats()}")
+    await drone.close()
+
+if __name__ == "__main__":
+    asyncio.run(main_fake_mavsdk_test())
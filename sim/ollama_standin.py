@@ -0,0 +1,361 @@
+# ollama_standin.py
+"""
+Local stand-in for the Ollama HTTP API, for load tests of the ollama_res.py
+clients without a model.
+
+Serves /api/generate in streaming (NDJSON) and non-streaming mode with the same
+fields Ollama returns. Responses are derived from the prompt with a few rules
+(task2 actions, task3 mission plans, task1 advisories) or taken from a script.
+A latency profile sets time to first token, prompt and generation speed, and
+how often a request fails or returns malformed JSON.
+
+    python ollama_standin.py --port 11434 --profile cpu-1b --error-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+
+STANDIN_HOST = "127.0.0.1"
+STANDIN_PORT = 11434
+STANDIN_MODEL = "llama3.2:1b"
+STANDIN_CHARS_PER_TOKEN = 4 # responses are streamed in chunks of about one token
+
+# Latency profiles: time to first token (s) on top of prompt evaluation, prompt and
+# generation speed (tokens/s), random +-jitter fraction, and injected failure rates
+LATENCY_PROFILES = {
+    "instant": {"ttft_s": 0.0, "prompt_tokens_per_s": 0, "tokens_per_s": 0, "jitter": 0.0,
+                "error_rate": 0.0, "malformed_rate": 0.0},
+    "gpu-3b": {"ttft_s": 0.03, "prompt_tokens_per_s": 4000, "tokens_per_s": 120, "jitter": 0.1,
+               "error_rate": 0.0, "malformed_rate": 0.0},
+    "cpu-1b": {"ttft_s": 0.15, "prompt_tokens_per_s": 400, "tokens_per_s": 25, "jitter": 0.2,
+               "error_rate": 0.0, "malformed_rate": 0.0},
+    "flaky": {"ttft_s": 0.1, "prompt_tokens_per_s": 1000, "tokens_per_s": 40, "jitter": 0.5,
+              "error_rate": 0.1, "malformed_rate": 0.1},
+}
+
+LOW_BATTERY_PERCENT = 15
+_NUMBER = r"(-?\d+(?:\.\d+)?)"
+_TAKEOFF_RE = re.compile(rf"take\s*off(?:\D+{_NUMBER})?", re.IGNORECASE)
+_GOTO_RE = re.compile(rf"go\s*to\D*?{_NUMBER}\s*,\s*(?:longitude\s*)?{_NUMBER}(?:\D+{_NUMBER})?", re.IGNORECASE)
+_ALTITUDE_RE = re.compile(rf"{_NUMBER}\s*m\b", re.IGNORECASE)
+
+
+def _telemetry_from_prompt(prompt, marker):
+    """Reads the telemetry JSON (compact or full) that follows `marker` in a prompt."""
+    start = prompt.find(marker)
+    if start < 0:
+        return {}
+    start = prompt.find("{", start)
+    try:
+        telemetry, _ = json.JSONDecoder().raw_decode(prompt, start)
+    except ValueError:
+        return {}
+    def pick(compact_key, *path):
+        if compact_key in telemetry:
+            return telemetry[compact_key]
+        value = telemetry
+        for part in path:
+            value = value.get(part) if isinstance(value, dict) else None
+        return value
+    return {
+        "armed": pick("arm", "armed"),
+        "in_air": pick("air", "in_air"),
+        "battery": pick("bat", "battery", "remaining_percent"),
+        "fix": pick("fix", "gps_info", "fix_type"),
+        "armable": pick("armable", "health", "armable"),
+    }
+
+def _decide_action(prompt):
+    """Rule-derived task2 action for a "Current Telemetry: ... Human Command: ..." prompt."""
+    t = _telemetry_from_prompt(prompt, "Current Telemetry:")
+    match = re.search(r'Human Command:\s*"(.*)"', prompt)
+    command = match.group(1) if match else ""
+    flying = t["armed"] is True and t["in_air"] is True
+    if flying and t["battery"] is not None and t["battery"] < LOW_BATTERY_PERCENT:
+        return {"action": "rtl"}
+    if flying and t["fix"] in (0, 1):
+        return {"action": "land"}
+    lowered = command.lower()
+    goto = _GOTO_RE.search(command)
+    takeoff = _TAKEOFF_RE.search(command)
+    if "land" in lowered:
+        return {"action": "land"}
+    if "rtl" in lowered or "return" in lowered:
+        return {"action": "rtl"}
+    if "disarm" in lowered:
+        return {"action": "disarm"}
+    if goto or takeoff or "arm" in lowered:
+        if not t["armed"]:
+            return {"action": "arm"}
+        if not t["in_air"]:
+            altitude = float((goto and goto.group(3)) or (takeoff and takeoff.group(1)) or 10.0)
+            return {"action": "takeoff", "altitude_m": altitude}
+        if goto:
+            return {"action": "goto", "latitude_deg": float(goto.group(1)), "longitude_deg": float(goto.group(2)),
+                    "altitude_m": float(goto.group(3) or 10.0)}
+    return {"action": "hold", "reason": f"Holding for command: {command or 'none'}"}
+
+def _plan_mission(prompt):
+    """A small task3 mission plan at the first altitude the mission mentions."""
+    match = _ALTITUDE_RE.search(prompt.split("### Mission:", 1)[-1])
+    altitude = float(match.group(1)) if match else 20.0
+    return {
+        "step 1": f"takeoff to {altitude:g}m",
+        "step 2": f"goto north 20m, east 0m, altitude {altitude:g}m",
+        "step 3": f"goto north 0m, east 20m, altitude {altitude:g}m",
+        "step 4": f"goto south 20m, west 20m, altitude {altitude:g}m",
+        "step 5": "land",
+    }
+
+def _advise(prompt):
+    """task1 advisory, following the rules in its system prompt."""
+    t = _telemetry_from_prompt(prompt, "Current drone telemetry:")
+    issues, action = [], "Continue mission"
+    if t["battery"] is not None and t["battery"] < LOW_BATTERY_PERCENT:
+        issues.append("Low battery")
+        action = "Initiate Return to Launch (RTL)"
+    elif t["in_air"] and t["fix"] == 0:
+        issues.append("GPS fix lost")
+        action = "Land immediately and check GPS"
+    elif t["in_air"] and t["fix"] == 1:
+        issues.append("GPS degraded")
+        action = "Consider landing, GPS degraded"
+    elif t["armed"] is False and t["in_air"] is True:
+        issues.append("Unexpected disarm")
+        action = "Investigate unexpected disarm"
+    elif t["armable"] is False and not t["armed"] and not t["in_air"]:
+        issues.append("Pre-arm checks failing")
+        action = "Check pre-arm checks"
+    summary = f"Battery {t['battery']}%, GPS fix {t['fix']}, {'in air' if t['in_air'] else 'on ground'}."
+    return {"summary": summary, "issues_detected": issues, "suggested_action": action}
+
+def rule_responder(system, prompt):
+    if "### Mission:" in prompt:
+        return _plan_mission(prompt)
+    if "Human Command:" in prompt:
+        return _decide_action(prompt)
+    return _advise(prompt)
+
+def scripted_responder(responses):
+    """Answers every request with the next of `responses` (dicts or raw text), cycling."""
+    index = 0
+    def respond(system, prompt):
+        nonlocal index
+        response = responses[index % len(responses)]
+        index += 1
+        return response
+    return respond
+
+
+class OllamaStandIn:
+    """
+    asyncio HTTP/1.1 server speaking enough of the Ollama API for the clients
+    in this repo: POST /api/generate plus GET /, /api/version and /api/tags.
+    Connections are kept alive. When a streaming client hangs up early (the
+    clients do once the JSON object is complete) generation stops, as it does
+    in Ollama.
+    """
+
+    def __init__(self, host=STANDIN_HOST, port=STANDIN_PORT, profile="instant", responder=rule_responder,
+                 seed=None, **overrides):
+        self.host = host
+        self.port = port
+        self.profile = dict(LATENCY_PROFILES[profile], **overrides)
+        self.responder = responder
+        self.requests = 0
+        self.streamed = 0
+        self.errors_injected = 0
+        self.malformed_injected = 0
+        self.cancelled = 0   # streams the client closed before the end
+        self.tokens_sent = 0
+        self.prompt_bytes = 0   # system + prompt, as received
+        self.prompt_tokens = 0
+        self._random = random.Random(seed)
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1] # resolves port=0
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "streamed": self.streamed,
+            "errors_injected": self.errors_injected,
+            "malformed_injected": self.malformed_injected,
+            "cancelled": self.cancelled,
+            "tokens_sent": self.tokens_sent,
+            "prompt_bytes": self.prompt_bytes,
+            "prompt_tokens": self.prompt_tokens,
+        }
+
+    def _jittered(self, seconds):
+        jitter = self.profile["jitter"]
+        return max(0.0, seconds * (1.0 + self._random.uniform(-jitter, jitter))) if jitter else seconds
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                keep_alive = headers.get("connection", "").lower() != "close"
+                if method == "POST" and path == "/api/generate":
+                    await self._generate(writer, body)
+                elif method == "GET" and path == "/":
+                    self._send(writer, 200, b"Ollama is running", "text/plain; charset=utf-8")
+                elif method == "GET" and path == "/api/version":
+                    self._send_json(writer, 200, {"version": "0.0.0-standin"})
+                elif method == "GET" and path == "/api/tags":
+                    self._send_json(writer, 200, {"models": [{"name": STANDIN_MODEL, "model": STANDIN_MODEL}]})
+                else:
+                    self._send_json(writer, 404, {"error": f"{method} {path} not found"})
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Loop shutdown with a request in flight; ending the handler cancelled
+            # makes asyncio.streams log a traceback
+            pass
+        finally:
+            writer.close()
+
+    def _send(self, writer, status, body, content_type):
+        writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                     f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+
+    def _send_json(self, writer, status, payload):
+        self._send(writer, status, json.dumps(payload).encode("utf-8"), "application/json; charset=utf-8")
+
+    async def _generate(self, writer, body):
+        started = time.perf_counter()
+        self.requests += 1
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self._send_json(writer, 400, {"error": "invalid request body"})
+            return
+        model = request.get("model", STANDIN_MODEL)
+        system, prompt = request.get("system", ""), request.get("prompt", "")
+        prompt_tokens = max(1, (len(system) + len(prompt)) // STANDIN_CHARS_PER_TOKEN)
+        self.prompt_bytes += len(system.encode("utf-8")) + len(prompt.encode("utf-8"))
+        self.prompt_tokens += prompt_tokens
+        profile = self.profile
+
+        prompt_eval_s = prompt_tokens / profile["prompt_tokens_per_s"] if profile["prompt_tokens_per_s"] else 0.0
+        await asyncio.sleep(self._jittered(profile["ttft_s"] + prompt_eval_s))
+        if self._random.random() < profile["error_rate"]:
+            self.errors_injected += 1
+            self._send_json(writer, 500, {"error": "model runner has unexpectedly stopped (injected)"})
+            return
+
+        response = self.responder(system, prompt)
+        text = response if isinstance(response, str) else json.dumps(response)
+        if self._random.random() < profile["malformed_rate"]:
+            self.malformed_injected += 1
+            text = text[:max(1, len(text) // 2)] + " ... (truncated)"
+        tokens = [text[i:i + STANDIN_CHARS_PER_TOKEN] for i in range(0, len(text), STANDIN_CHARS_PER_TOKEN)]
+        token_s = 1.0 / profile["tokens_per_s"] if profile["tokens_per_s"] else 0.0
+        prompt_done = time.perf_counter()
+
+        def final_fields():
+            now = time.perf_counter()
+            return {
+                "model": model, "created_at": _created_at(), "response": "", "done": True, "done_reason": "stop",
+                "total_duration": int((now - started) * 1e9), "load_duration": 0,
+                "prompt_eval_count": prompt_tokens, "prompt_eval_duration": int((prompt_done - started) * 1e9),
+                "eval_count": len(tokens), "eval_duration": int((now - prompt_done) * 1e9),
+            }
+
+        if not request.get("stream", True):
+            await asyncio.sleep(self._jittered(token_s * len(tokens)))
+            self.tokens_sent += len(tokens)
+            self._send_json(writer, 200, dict(final_fields(), response=text))
+            return
+
+        self.streamed += 1
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n")
+        try:
+            for token in tokens:
+                if token_s:
+                    await asyncio.sleep(self._jittered(token_s))
+                _write_chunk(writer, {"model": model, "created_at": _created_at(), "response": token, "done": False})
+                await writer.drain()
+                self.tokens_sent += 1
+            _write_chunk(writer, final_fields())
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except ConnectionError:
+            self.cancelled += 1
+            raise
+
+
+def _created_at():
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+def _write_chunk(writer, payload):
+    data = json.dumps(payload, separators=(",", ":")).encode("utf-8") + b"\n"
+    writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=STANDIN_HOST)
+    parser.add_argument("--port", type=int, default=STANDIN_PORT)
+    parser.add_argument("--profile", choices=sorted(LATENCY_PROFILES), default="cpu-1b")
+    parser.add_argument("--ttft", type=float, help="seconds to first token, overrides the profile")
+    parser.add_argument("--tokens-per-s", type=float, help="generation speed, overrides the profile")
+    parser.add_argument("--error-rate", type=float, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--malformed-rate", type=float, help="fraction of responses with truncated JSON")
+    parser.add_argument("--script", help="JSONL file of responses to return in turn instead of the rules")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    overrides = {key: value for key, value in (
+        ("ttft_s", args.ttft), ("tokens_per_s", args.tokens_per_s),
+        ("error_rate", args.error_rate), ("malformed_rate", args.malformed_rate)) if value is not None}
+    responder = rule_responder
+    if args.script:
+        with open(args.script) as f:
+            responder = scripted_responder([json.loads(line) for line in f if line.strip()])
+
+    async def serve():
+        server = await OllamaStandIn(args.host, args.port, args.profile, responder, args.seed, **overrides).start()
+        print(f"Ollama stand-in ({args.profile}) listening on {server.url}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            print(f"Stand-in stats: {server.stats()}")
+            await server.stop()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
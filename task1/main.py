@@ -4,7 +4,10 @@ import json
 import time
 
 from telemetry import connect_drone, get_drone_telemetry
-from ollama_res import get_ollama_response
+from ollama_res import get_ollama_response, close_ollama_client
+from tick_timing import TickTimer
+
+TICK_TIMINGS_EXPORT_PATH = None # e.g. "advisor_ticks.jsonl" to keep per-tick stage timings
 
 async def run_ollama_drone_advisor(duration_seconds=300, update_interval_seconds=3):
     """
@@ -22,32 +25,54 @@ async def run_ollama_drone_advisor(duration_seconds=300, update_interval_seconds
 
     print("Drone connected. Starting telemetry and LLM loop.")
     start_time = time.time()
+    tick_timer = TickTimer()
 
-    while (time.time() - start_time) < duration_seconds:
-        print(f"\n--- Telemetry Update (Time: {int(time.time() - start_time)}s) ---")
+    try:
+        while (time.time() - start_time) < duration_seconds:
+            print(f"\n--- Telemetry Update (Time: {int(time.time() - start_time)}s) ---")
+            tick_timer.start_tick()
         
-        # 1. Get Telemetry from MAVSDK (SITL)
-        telemetry_data = await get_drone_telemetry(drone)
-        print("Raw Telemetry Snippet:")
-        print(f"  Battery: {telemetry_data.get('battery', {}).get('remaining_percent', 'N/A')}%")
-        print(f"  GPS Fix: {telemetry_data.get('gps_info', {}).get('fix_type', 'N/A')}D")
-        print(f"  In Air: {telemetry_data.get('in_air', 'N/A')}")
-        print(f"  Armed: {telemetry_data.get('armed', 'N/A')}")
-        print(f"  Flight Mode: {telemetry_data.get('flight_mode', 'N/A')}")
+            # 1. Get Telemetry from MAVSDK (SITL)
+            with tick_timer.stage("telemetry"):
+                telemetry_data = await get_drone_telemetry(drone)
+            print("Raw Telemetry Snippet:")
+            print(f"  Battery: {telemetry_data.get('battery', {}).get('remaining_percent', 'N/A')}%")
+            print(f"  GPS Fix: {telemetry_data.get('gps_info', {}).get('fix_type', 'N/A')}D")
+            print(f"  In Air: {telemetry_data.get('in_air', 'N/A')}")
+            print(f"  Armed: {telemetry_data.get('armed', 'N/A')}")
+            print(f"  Flight Mode: {telemetry_data.get('flight_mode', 'N/A')}")
+            if telemetry_data.get("stale_topics"):
+                print(f"  Stale Topics: {', '.join(telemetry_data['stale_topics'])}")
 
-        # 2. Send to Ollama for Reasoning
-        ollama_analysis = await get_ollama_response(telemetry_data)
+            # 2. Send to Ollama for Reasoning
+            call_stats = {}
+            ollama_analysis = await get_ollama_response(telemetry_data, call_stats=call_stats)
+            tick_timer.record_ollama_call(call_stats)
         
-        # 3. Display Ollama's Output
-        print("\nOllama's Drone Advisory:")
-        print(f"  Summary: {ollama_analysis.get('summary', 'No summary.')}")
-        if ollama_analysis.get('issues_detected'):
-            print(f"  Issues: {', '.join(ollama_analysis['issues_detected'])}")
-        print(f"  Suggested Action: {ollama_analysis.get('suggested_action', 'No action suggested.')}")
+            # 3. Display Ollama's Output
+            print("\nOllama's Drone Advisory:")
+            print(f"  Summary: {ollama_analysis.get('summary', 'No summary.')}")
+            if ollama_analysis.get('issues_detected'):
+                print(f"  Issues: {', '.join(ollama_analysis['issues_detected'])}")
+            print(f"  Suggested Action: {ollama_analysis.get('suggested_action', 'No action suggested.')}")
         
-         # Next Step -> commanding the drone from here
+             # Next Step -> commanding the drone from here
+
+            tick = tick_timer.end_tick()
+            print(f"Tick timings: {tick_timer.format_tick(tick)}")
 
-        await asyncio.sleep(update_interval_seconds)
+            await asyncio.sleep(update_interval_seconds)
+    finally:
+        await close_ollama_client()
+        if tick_timer.ticks:
+            print(f"Advisor tick timings over {len(tick_timer.ticks)} ticks:\n{tick_timer.format_summary()}")
+            if TICK_TIMINGS_EXPORT_PATH:
+                # A bad export path must not skip landing the vehicle
+                try:
+                    tick_timer.export_jsonl(TICK_TIMINGS_EXPORT_PATH)
+                    print(f"Tick timings written to {TICK_TIMINGS_EXPORT_PATH}")
+                except OSError as e:
+                    print(f"Could not write tick timings to {TICK_TIMINGS_EXPORT_PATH}: {e}")
 
     print("\nSimulation Finished.")
     if drone:
@@ -1,19 +1,191 @@
 
 import json
 import asyncio
+import time
+from collections import deque
 import httpx 
 
+from prompt_encoding import encode_telemetry, telemetry_legend
+
 # Configuration for Ollama
 OLLAMA_HOST = "http://localhost:11434"
 OLLAMA_MODEL = "llama3.2:1b" 
+OLLAMA_STREAM = True # parse the action while tokens arrive and stop early
+OLLAMA_KEEP_ALIVE = "30m" # keep the model resident between ticks
+OLLAMA_LOG_TIMINGS = True # print per-call prompt_eval_count / durations
+OLLAMA_CALL_LOG_SIZE = 200
+OLLAMA_TIMEOUT_S = 30.0
+
+# Key legend for the compact telemetry encoding, rendered once
+TELEMETRY_LEGEND = telemetry_legend()
+
+# Shared HTTP client: one keep-alive connection pool for every Ollama call
+OLLAMA_MAX_CONNECTIONS = 4
+OLLAMA_MAX_KEEPALIVE_CONNECTIONS = 2
+OLLAMA_KEEPALIVE_EXPIRY_S = 60.0
+
+try:
+    import h2 # noqa: F401 (enables httpx HTTP/2 when the server offers it)
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+_ollama_client = None
 
-async def get_ollama_response(telemetry_data: dict):    
-    prompt_content = f"""
+def get_ollama_client() -> httpx.AsyncClient:
+    global _ollama_client
+    if _ollama_client is None or _ollama_client.is_closed:
+        _ollama_client = httpx.AsyncClient(
+            base_url=OLLAMA_HOST,
+            timeout=OLLAMA_TIMEOUT_S,
+            limits=httpx.Limits(
+                max_connections=OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY_S
+            ),
+            http2=_HTTP2_AVAILABLE
+        )
+    return _ollama_client
+
+async def close_ollama_client():
+    global _ollama_client
+    if _ollama_client is not None:
+        await _ollama_client.aclose()
+        _ollama_client = None
+
+
+class IncrementalJSONObjectParser:
+    """
+    Scans streamed text and returns the first complete top-level JSON object as
+    soon as its closing brace arrives. Text outside the object (markdown fences,
+    trailing whitespace) is ignored.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str):
+        self.text += chunk
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = self._depth > 0
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._pos = i + 1
+                    return json.loads(text[self._start:i + 1])
+        self._pos = len(text)
+        return None
+
+
+# Timing fields Ollama reports with a finished response (durations in nanoseconds)
+OLLAMA_TIMING_FIELDS = ("total_duration", "load_duration", "prompt_eval_count",
+                        "prompt_eval_duration", "eval_count", "eval_duration")
+
+def _copy_ollama_timings(body: dict, call_stats: dict):
+    for field in OLLAMA_TIMING_FIELDS:
+        if field in body:
+            call_stats[field] = body[field]
+
+async def _generate_json(client: httpx.AsyncClient, payload: dict, call_stats: dict = None):
+    """
+    Runs /api/generate and returns the parsed JSON object. In streaming mode the
+    object is returned as soon as it is complete and the response is closed,
+    which makes Ollama stop generating the remaining tokens.
+
+    call_stats, if given, receives the wall-clock time to the first token and to
+    the parsed object, the time spent parsing, plus Ollama's own timing fields when
+    the generation ran to completion (a stream cancelled early never receives them).
+    """
+    call_stats = call_stats if call_stats is not None else {}
+    started = time.perf_counter()
+    if not payload.get("stream"):
+        response = await client.post("/api/generate", json=payload)
+        response.raise_for_status()
+        body = response.json()
+        call_stats["http_ms"] = (time.perf_counter() - started) * 1000
+        _copy_ollama_timings(body, call_stats)
+        raw_text = body.get("response", "").strip()
+        parse_started = time.perf_counter()
+        # Clean up potential markdown fences
+        parsed_json = json.loads(raw_text.replace("```json", "").replace("```", "").strip())
+        call_stats["parse_ms"] = (time.perf_counter() - parse_started) * 1000
+        return parsed_json
+
+    parser = IncrementalJSONObjectParser()
+    async with client.stream("POST", "/api/generate", json=payload) as response:
+        if response.is_error:
+            await response.aread()
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if "error" in chunk:
+                raise RuntimeError(f"Ollama stream error: {chunk['error']}")
+            if "first_token_ms" not in call_stats:
+                call_stats["first_token_ms"] = (time.perf_counter() - started) * 1000
+            if chunk.get("done"):
+                _copy_ollama_timings(chunk, call_stats)
+            parse_started = time.perf_counter()
+            parsed_json = parser.feed(chunk.get("response", ""))
+            call_stats["parse_ms"] = call_stats.get("parse_ms", 0.0) + (time.perf_counter() - parse_started) * 1000
+            if parsed_json is not None:
+                call_stats["http_ms"] = (time.perf_counter() - started) * 1000
+                call_stats["early_exit"] = not chunk.get("done", False)
+                return parsed_json
+            if chunk.get("done"):
+                break
+    call_stats["http_ms"] = (time.perf_counter() - started) * 1000
+    # The stream ended without a complete object; let json report why.
+    return json.loads(parser.text.strip())
+
+def format_call_stats(call_stats: dict):
+    parts = [f"{call_stats.get('model', '?')}", f"http={call_stats.get('http_ms', 0):.0f}ms"]
+    if "first_token_ms" in call_stats:
+        parts.append(f"first_token={call_stats['first_token_ms']:.0f}ms")
+    if "prompt_eval_count" in call_stats:
+        parts.append(f"prompt_eval_count={call_stats['prompt_eval_count']}")
+        parts.append(f"prompt_eval={call_stats.get('prompt_eval_duration', 0) / 1e6:.0f}ms")
+        parts.append(f"eval_count={call_stats.get('eval_count', 0)}")
+        parts.append(f"total={call_stats.get('total_duration', 0) / 1e6:.0f}ms")
+    elif call_stats.get("early_exit"):
+        parts.append("early_exit (no Ollama counters)")
+    return " ".join(parts)
+
+
+# Stats of the most recent Ollama calls, newest last
+OLLAMA_CALL_LOG = deque(maxlen=OLLAMA_CALL_LOG_SIZE)
+
+def _record_call(call_stats: dict):
+    OLLAMA_CALL_LOG.append(call_stats)
+    if OLLAMA_LOG_TIMINGS:
+        print(f"[Ollama timings] {format_call_stats(call_stats)}")
+
+# Static instructions, sent as the system prompt so Ollama can reuse their KV cache
+SYSTEM_PROMPT = f"""
     You are an AI assistant for a drone operation. Your task is to analyze the provided drone telemetry data,
     identify any issues or notable statuses, provide a human-readable summary, and suggest a proactive action if necessary.
 
-    Here is the current drone telemetry data in JSON format:
-    {json.dumps(telemetry_data, indent=2)}
+    Each request gives you the current drone telemetry data in compact JSON format ({TELEMETRY_LEGEND}).
 
     Based on this data, please provide your analysis in the following structured JSON format:
     {{
@@ -26,46 +198,43 @@ async def get_ollama_response(telemetry_data: dict):
     }}
     
     Consider the following rules for suggestions:
-    - If battery remaining is below 15%, suggest 'Initiate Return to Launch (RTL)'.
-    - If GPS fix type is 0 (No Fix) and drone is in_air, suggest 'Land immediately and check GPS'.
-    - If GPS fix type is 1 (No GPS) and drone is in_air, suggest 'Consider landing, GPS degraded'.
-    - If health.armed is False but in_air is True, suggest 'Investigate unexpected disarm'.
+    - If battery.remaining_percent is below 15, suggest 'Initiate Return to Launch (RTL)'.
+    - If gps_info.fix_type is 0 (No Fix) and drone is in_air, suggest 'Land immediately and check GPS'.
+    - If gps_info.fix_type is 1 (No GPS) and drone is in_air, suggest 'Consider landing, GPS degraded'.
+    - If armed is False but in_air is True, suggest 'Investigate unexpected disarm'.
     - If health.armable is False and drone is not armed and not in_air, suggest 'Check pre-arm checks'.
     - If no critical issues, suggest 'Continue mission'.
     - Ensure your response is ONLY the JSON object, without any leading or trailing text like markdown fences.
     """
 
+async def get_ollama_response(telemetry_data: dict, client: httpx.AsyncClient = None,
+                              call_stats: dict = None):
+    call_stats = call_stats if call_stats is not None else {}
+    call_stats["model"] = OLLAMA_MODEL
+    build_started = time.perf_counter()
+    prompt = f"Current drone telemetry: {encode_telemetry(telemetry_data)}"
+    call_stats["prompt_build_ms"] = (time.perf_counter() - build_started) * 1000
+
     payload = {
         "model": OLLAMA_MODEL,
-        "prompt": prompt_content,
-        "stream": False, 
-        "format": "json" 
+        "system": SYSTEM_PROMPT,
+        "prompt": prompt,
+        "stream": OLLAMA_STREAM, 
+        "format": "json",
+        "keep_alive": OLLAMA_KEEP_ALIVE
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{OLLAMA_HOST}/api/generate", json=payload, timeout=30.0)
-            response.raise_for_status() 
-            
-            response_data = response.json()
-            
-        
-            raw_text = response_data.get("response", "").strip()
-            
-            # Attempt to parse the raw text as JSON
-            try:
-                # Remove common markdown fences if present
-                clean_text = raw_text.replace("```json", "").replace("```", "").strip()
-                parsed_json = json.loads(clean_text)
-                return parsed_json
-            except json.JSONDecodeError as e:
-                print(f"JSON parsing error from Ollama: {e}")
-                print(f"Ollama Raw Text (for debugging):\n{raw_text}")
-                return {
-                    "summary": "Error: Ollama response not valid JSON.",
-                    "issues_detected": ["LLM parsing error"],
-                    "suggested_action": "Request human intervention"
-                }
+        return await _generate_json(client or get_ollama_client(), payload, call_stats)
+
+    except json.JSONDecodeError as e:
+        print(f"JSON parsing error from Ollama: {e}")
+        print(f"Ollama Raw Text (for debugging):\n{e.doc}")
+        return {
+            "summary": "Error: Ollama response not valid JSON.",
+            "issues_detected": ["LLM parsing error"],
+            "suggested_action": "Request human intervention"
+        }
 
     except httpx.RequestError as e:
         print(f"Ollama connection error: {e}")
@@ -88,6 +257,8 @@ async def get_ollama_response(telemetry_data: dict):
             "issues_detected": ["Unexpected LLM error"],
             "suggested_action": "Request human intervention"
         }
+    finally:
+        _record_call(call_stats)
 
 # Example usage (for testing this module independently)
 async def main_ollama_test():
@@ -103,8 +274,11 @@ async def main_ollama_test():
     }
     
     print("Testing Ollama with low battery telemetry:")
-    llm_output = await get_ollama_response(test_telemetry_low_battery)
-    print(json.dumps(llm_output, indent=2))
+    try:
+        llm_output = await get_ollama_response(test_telemetry_low_battery)
+        print(json.dumps(llm_output, indent=2))
+    finally:
+        await close_ollama_client()
 
 if __name__ == "__main__":
     asyncio.run(main_ollama_test())
\ No newline at end of file
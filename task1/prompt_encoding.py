@@ -0,0 +1,59 @@
+# prompt_encoding.py
+import json
+
+# Short prompt key -> (path into the telemetry snapshot, decimals to round to or None)
+TELEMETRY_FIELDS = {
+    "lat": (("position", "latitude_deg"), 6),
+    "lon": (("position", "longitude_deg"), 6),
+    "alt": (("position", "relative_altitude_m"), 1),
+    "vn": (("velocity_ned", "north_m_s"), 1),
+    "ve": (("velocity_ned", "east_m_s"), 1),
+    "vd": (("velocity_ned", "down_m_s"), 1),
+    "roll": (("attitude_euler", "roll_deg"), 0),
+    "pitch": (("attitude_euler", "pitch_deg"), 0),
+    "yaw": (("attitude_euler", "yaw_deg"), 0),
+    "bat": (("battery", "remaining_percent"), None),
+    "volt": (("battery", "voltage_v"), 1),
+    "mode": (("flight_mode",), None),
+    "sats": (("gps_info", "num_satellites"), None),
+    "fix": (("gps_info", "fix_type"), None),
+    "air": (("in_air",), None),
+    "arm": (("armed",), None),
+    "gpos": (("health", "global_position_ok"), None),
+    "home": (("health", "home_position_ok"), None),
+    "armable": (("health", "armable"), None),
+    "stale": (("stale_topics",), None),
+}
+
+
+def field_name(key, prefix=""):
+    """Dotted name of a field in the telemetry snapshot, e.g. "battery.remaining_percent"."""
+    return prefix + ".".join(TELEMETRY_FIELDS[key][0])
+
+def telemetry_legend(fields=None, prefix=""):
+    """
+    One-line key legend for the static part of a prompt, mapping each short key
+    to the dotted snapshot field the instructions refer to, e.g.
+    "bat=battery.remaining_percent". `prefix` is prepended to every field name
+    for instructions that write them as e.g. "telemetry_data.battery...".
+    """
+    fields = fields or TELEMETRY_FIELDS
+    return " ".join(f"{key}={field_name(key, prefix)}" for key in fields)
+
+def encode_telemetry(telemetry_data: dict, fields=None):
+    """
+    Minified JSON with abbreviated keys and rounded floats, limited to `fields`.
+    Values missing from the snapshot are left out.
+    """
+    encoded = {}
+    for key in fields or TELEMETRY_FIELDS:
+        path, decimals = TELEMETRY_FIELDS[key]
+        value = telemetry_data
+        for part in path:
+            value = value.get(part) if isinstance(value, dict) else None
+        if value is None:
+            continue
+        if decimals is not None and isinstance(value, float):
+            value = round(value, decimals) if decimals else int(round(value))
+        encoded[key] = value
+    return json.dumps(encoded, separators=(",", ":"))
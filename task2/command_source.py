@@ -0,0 +1,114 @@
+# command_source.py
+import asyncio
+import os
+import sys
+import time
+
+COMMAND_PROMPT = "\nEnter command for drone (e.g., 'Take off to 10m', 'Go to 23.0225, 72.5714 at 50m', 'Land', 'RTL', 'Status'): "
+
+
+class CommandSource:
+    """
+    Collects human commands into one asyncio.Queue without threads or polling:
+    stdin is watched with an event-loop reader, and a local TCP port and/or
+    Unix socket accept one command per line (e.g. `echo Land | nc -U cmd.sock`).
+    get() wakes up as soon as a complete line arrives from any of them.
+    """
+
+    def __init__(self, use_stdin=True, tcp_port=None, unix_path=None, prompt=COMMAND_PROMPT):
+        self.use_stdin = use_stdin
+        self.tcp_port = tcp_port
+        self.unix_path = unix_path
+        self.prompt = prompt
+        self.queue = asyncio.Queue()
+        self.received = 0
+        self._stdin_fd = None
+        self._stdin_buffer = b""
+        self._stdin_task = None
+        self._servers = []
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self.use_stdin:
+            fd = sys.stdin.fileno()
+            try:
+                loop.add_reader(fd, self._on_stdin_readable)
+                self._stdin_fd = fd
+            except (NotImplementedError, PermissionError, ValueError):
+                # Regular files (and stdin on Windows) cannot be watched by the selector
+                self._stdin_task = asyncio.create_task(self._read_stdin_blocking())
+            self._show_prompt()
+        if self.tcp_port is not None:
+            server = await asyncio.start_server(self._handle_client, "127.0.0.1", self.tcp_port)
+            self._servers.append(server)
+            print(f"Accepting commands on tcp://127.0.0.1:{self.tcp_port}")
+        if self.unix_path is not None:
+            if os.path.exists(self.unix_path):
+                os.unlink(self.unix_path)
+            server = await asyncio.start_unix_server(self._handle_client, self.unix_path)
+            self._servers.append(server)
+            print(f"Accepting commands on unix socket {self.unix_path}")
+
+    async def stop(self):
+        if self._stdin_fd is not None:
+            asyncio.get_running_loop().remove_reader(self._stdin_fd)
+            self._stdin_fd = None
+        if self._stdin_task is not None:
+            self._stdin_task.cancel()
+            self._stdin_task = None
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        if self.unix_path is not None and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+    async def get(self):
+        """Waits for the next command and returns its text."""
+        _, _, text = await self.queue.get()
+        return text
+
+    def _show_prompt(self):
+        if self.use_stdin and self.prompt:
+            print(self.prompt, end="", flush=True)
+
+    def _push(self, text, source):
+        text = text.strip()
+        if text:
+            self.received += 1
+            self.queue.put_nowait((time.monotonic(), source, text))
+
+    def _on_stdin_readable(self):
+        data = os.read(self._stdin_fd, 4096)
+        if not data: # EOF: stop watching, commands can still come from the sockets
+            asyncio.get_running_loop().remove_reader(self._stdin_fd)
+            self._stdin_fd = None
+            return
+        self._stdin_buffer += data
+        *lines, self._stdin_buffer = self._stdin_buffer.split(b"\n")
+        for line in lines:
+            self._push(line.decode("utf-8", errors="replace"), "stdin")
+        if lines:
+            self._show_prompt()
+
+    async def _read_stdin_blocking(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            line = await loop.run_in_executor(None, sys.stdin.readline)
+            if not line:
+                return
+            self._push(line, "stdin")
+            self._show_prompt()
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self._push(line.decode("utf-8", errors="replace"), "socket")
+                writer.write(b"ok\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
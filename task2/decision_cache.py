@@ -0,0 +1,96 @@
+# decision_cache.py
+import math
+import time
+from collections import OrderedDict
+
+METERS_PER_DEGREE_LAT = 111320.0
+
+
+class DecisionCache:
+    """
+    LRU + TTL cache of LLM decisions, keyed on the human command plus a
+    quantized telemetry fingerprint. While the drone holds, consecutive ticks
+    map to the same key and reuse the previous decision instead of calling Ollama.
+    """
+
+    def __init__(self, max_entries=256, ttl_s=30.0, position_step_m=1.0,
+                 altitude_step_m=1.0, battery_step_percent=1, uncacheable_actions=("error",)):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.position_step_m = position_step_m
+        self.altitude_step_m = altitude_step_m
+        self.battery_step_percent = battery_step_percent
+        self.uncacheable_actions = uncacheable_actions
+        self._entries = OrderedDict() # key -> (stored_at, action)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def fingerprint(self, telemetry_data: dict):
+        position = telemetry_data.get("position") or {}
+        lat = position.get("latitude_deg")
+        lon = position.get("longitude_deg")
+        alt = position.get("relative_altitude_m")
+        if lat is not None and lon is not None:
+            north_m = lat * METERS_PER_DEGREE_LAT
+            east_m = lon * METERS_PER_DEGREE_LAT * math.cos(math.radians(lat))
+            position_key = (math.floor(north_m / self.position_step_m),
+                            math.floor(east_m / self.position_step_m))
+        else:
+            position_key = None
+        altitude_key = math.floor(alt / self.altitude_step_m) if alt is not None else None
+
+        battery_percent = (telemetry_data.get("battery") or {}).get("remaining_percent")
+        battery_key = battery_percent // self.battery_step_percent if battery_percent is not None else None
+
+        health = telemetry_data.get("health") or {}
+        return (
+            position_key,
+            altitude_key,
+            battery_key,
+            telemetry_data.get("armed"),
+            telemetry_data.get("in_air"),
+            telemetry_data.get("flight_mode"),
+            (telemetry_data.get("gps_info") or {}).get("fix_type"),
+            tuple(sorted(health.items())),
+        )
+
+    def get(self, human_command, telemetry_data: dict):
+        key = (human_command, self.fingerprint(telemetry_data))
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, action = entry
+            if time.monotonic() - stored_at <= self.ttl_s:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(action)
+            del self._entries[key]
+            self.expirations += 1
+        self.misses += 1
+        return None
+
+    def put(self, human_command, telemetry_data: dict, action: dict):
+        if action.get("action") in self.uncacheable_actions:
+            return
+        key = (human_command, self.fingerprint(telemetry_data))
+        self._entries[key] = (time.monotonic(), dict(action))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
@@ -1,17 +1,153 @@
 # drone_action_executor.py
 import asyncio
+import time
 from mavsdk import System
 from mavsdk.telemetry import FlightMode
+from telemetry import TELEMETRY_TOPICS, get_telemetry_cache
+from geodesy import distance_m
+
+# Actions that preempt whatever is running and cannot themselves be preempted by other actions
+SAFETY_ACTIONS = ("land", "rtl")
+# Actions that move the vehicle somewhere; while one runs, only a safety action or (for a
+# goto) a goto to a new target replaces it, so a stray hold or error reply cannot stop it
+TRANSIT_ACTIONS = ("takeoff", "goto")
+GOTO_SAME_TARGET_M = 1.0 # a goto closer than this (horizontally and vertically) to the running one is not a new target
+# Flight modes that mean a goto was overridden by the pilot, a failsafe or another command
+GOTO_OVERRIDE_MODES = ("LAND", "RETURN_TO_LAUNCH", "MANUAL", "POSCTL", "ALTCTL", "STABILIZED", "ACRO")
+
+
+class ActionHandle:
+    """
+    Returned immediately by every DroneActionExecutor action. The command and the
+    monitoring of its progress run in a background task; `await handle` waits for
+    completion and returns True/False like the actions used to.
+    cancel() only stops the monitoring: the vehicle keeps doing whatever it was
+    last commanded until a new command replaces it.
+    """
+
+    def __init__(self, name, args=()):
+        self.name = name
+        self.args = args        # the action's arguments, e.g. the goto target
+        self.status = "running" # running, done, failed, cancelled, rejected
+        self.progress = 0.0     # 0.0 .. 1.0 where the action can measure it
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.task = None
+
+    def _finish(self, status, progress=None):
+        self.status = status
+        if progress is not None:
+            self.progress = progress
+        self.finished_at = time.monotonic()
+
+    def done(self):
+        return self.status != "running"
+
+    def cancel(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+    def elapsed(self):
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def __await__(self):
+        if self.task is None:
+            return _completed(self.status == "done").__await__()
+        return self.task.__await__()
+
+    def __repr__(self):
+        return f"<ActionHandle {self.name} {self.status} {self.progress:.0%}>"
+
+async def _completed(result):
+    return result
+
 
 class DroneActionExecutor:
     def __init__(self, drone: System):
         self.drone = drone
         self.current_action = "none" 
+        self.current_handle = None
         self.target_latitude = None
         self.target_longitude = None
         self.target_altitude = None
 
-    async def arm_drone(self):
+    def _start(self, name, action, *args):
+        """
+        Runs `action(handle, *args)` in the background and returns its handle.
+        A safety action preempts the running action. While a safety action runs
+        every other action is rejected; while a takeoff or goto runs, so is every
+        other routine action except a goto to a new target, which replaces a
+        running goto. Short actions (arm, disarm, hold) are simply replaced.
+        """
+        handle = ActionHandle(name, args)
+        current = self.current_handle
+        if current is not None and not current.done():
+            reason = self._rejection_reason(handle, current)
+            if reason:
+                return self._reject(handle, reason)
+            print(f"-- {name} preempts {current.name}.")
+            current.cancel()
+        handle.task = asyncio.create_task(self._run(handle, action, *args))
+        self.current_handle = handle
+        return handle
+
+    def _reject(self, handle, reason):
+        print(f"-- Rejecting {handle.name}: {reason}.")
+        handle._finish("rejected")
+        return handle
+
+    def _rejection_reason(self, handle, current):
+        """Why `handle` may not replace the running `current` action, or None if it may."""
+        if handle.name in SAFETY_ACTIONS:
+            return None
+        if current.name in SAFETY_ACTIONS:
+            return f"{current.name} in progress"
+        if current.name not in TRANSIT_ACTIONS:
+            return None
+        if handle.name == "goto" and current.name == "goto":
+            if self._same_target(handle.args, current.args):
+                return "already going to that target"
+            return None
+        return f"{current.name} in progress"
+
+    def _same_target(self, target, other):
+        (lat, lon, alt), (other_lat, other_lon, other_alt) = target, other
+        return (self._calculate_distance(lat, lon, other_lat, other_lon) < GOTO_SAME_TARGET_M
+                and abs(alt - other_alt) < GOTO_SAME_TARGET_M)
+
+    async def _run(self, handle, action, *args):
+        try:
+            result = await action(handle, *args)
+        except asyncio.CancelledError:
+            handle._finish("cancelled")
+            return False
+        handle._finish("done" if result else "failed", 1.0 if result else None)
+        return result
+
+    def arm_drone(self):
+        return self._start("arm", self._arm)
+
+    def disarm_drone(self):
+        return self._start("disarm", self._disarm)
+
+    def takeoff_drone(self, altitude_m: float):
+        if not altitude_m > 0: # also catches NaN; _takeoff measures progress as a fraction of altitude_m
+            return self._reject(ActionHandle("takeoff", (altitude_m,)), f"takeoff altitude {altitude_m}m is not above ground")
+        return self._start("takeoff", self._takeoff, altitude_m)
+
+    def goto_location(self, latitude: float, longitude: float, altitude: float):
+        return self._start("goto", self._goto_location, latitude, longitude, altitude)
+
+    def land_drone(self):
+        return self._start("land", self._land)
+
+    def rtl_drone(self):
+        return self._start("rtl", self._rtl)
+
+    def hold_drone(self, reason: str):
+        return self._start("hold", self._hold, reason)
+
+    async def _arm(self, handle):
         print("-- Arming...")
         try:
             await self.drone.action.arm()
@@ -22,7 +158,7 @@ class DroneActionExecutor:
             print(f"Error arming drone: {e}")
             return False
 
-    async def disarm_drone(self):
+    async def _disarm(self, handle):
         print("-- Disarming...")
         try:
             await self.drone.action.disarm()
@@ -33,7 +169,7 @@ class DroneActionExecutor:
             print(f"Error disarming drone: {e}")
             return False
 
-    async def takeoff_drone(self, altitude_m: float):
+    async def _takeoff(self, handle, altitude_m: float):
         print(f"-- Taking off to {altitude_m} meters...")
         try:
             await self.drone.action.set_takeoff_altitude(altitude_m)
@@ -42,17 +178,17 @@ class DroneActionExecutor:
             print("-- Takeoff command sent")
             # Wait until it reaches target altitude or very close
             async for position in self.drone.telemetry.position():
+                handle.progress = min(1.0, max(0.0, position.relative_altitude_m / altitude_m))
                 if position.relative_altitude_m >= altitude_m * 0.95: # Within 95% of target
                     print(f"-- Reached takeoff altitude {position.relative_altitude_m:.2f}m")
                     break
-                await asyncio.sleep(0.5)
             self.current_action = "in_air"
             return True
         except Exception as e:
             print(f"Error taking off: {e}")
             return False
 
-    async def goto_location(self, latitude: float, longitude: float, altitude: float):
+    async def _goto_location(self, handle, latitude: float, longitude: float, altitude: float):
         print(f"-- Going to Lat: {latitude:.4f}, Lon: {longitude:.4f}, Alt: {altitude:.2f}m")
         self.target_latitude = latitude
         self.target_longitude = longitude
@@ -63,34 +199,64 @@ class DroneActionExecutor:
             self.current_action = "going_to_location"
             print("-- Goto command sent")
 
-            # Monitor progress towards target
-            async for position in self.drone.telemetry.position():
+            # Monitor progress towards target on the shared telemetry feed
+            start_dist = None
+            async for position, flight_mode in self._position_and_flight_mode():
                 dist_to_target = self._calculate_distance(
-                    position.latitude_deg, position.longitude_deg,
+                    position["latitude_deg"], position["longitude_deg"],
                     self.target_latitude, self.target_longitude
                 )
-                alt_diff = abs(position.relative_altitude_m - self.target_altitude)
+                alt_diff = abs(position["relative_altitude_m"] - self.target_altitude)
+                if start_dist is None:
+                    start_dist = max(dist_to_target, 1e-6)
+                handle.progress = min(1.0, max(0.0, 1.0 - dist_to_target / start_dist))
 
                 if dist_to_target < 2.0 and alt_diff < 1.0: # Within 2m horizontal, 1m vertical
                     print(f"-- Reached target location. Distance: {dist_to_target:.2f}m, Altitude difference: {alt_diff:.2f}m")
                     break
                 
                 # Also check flight mode for manual override or RTL
-                async for flight_mode in self.drone.telemetry.flight_mode():
-                    if flight_mode != FlightMode.POSCTL and flight_mode != FlightMode.AUTO: # Or whatever mode 'goto' uses
-                        print(f"-- Flight mode changed to {flight_mode.name}, stopping goto monitoring.")
-                        self.current_action = "monitoring"
-                        return False # Action interrupted
-                    break # Get current flight mode and break
-
-                await asyncio.sleep(1) # Check every second
+                if flight_mode in GOTO_OVERRIDE_MODES:
+                    print(f"-- Flight mode changed to {flight_mode}, stopping goto monitoring.")
+                    self.current_action = "monitoring"
+                    return False # Action interrupted
             self.current_action = "at_target"
             return True
         except Exception as e:
             print(f"Error going to location: {e}")
             return False
 
-    async def land_drone(self):
+    async def _position_and_flight_mode(self):
+        """
+        Yields (position dict, flight mode name) on every position update.
+        Reads the drone's telemetry cache when one is running; otherwise opens
+        one position stream and one flight mode stream for the whole goto.
+        """
+        cache = get_telemetry_cache(self.drone)
+        if cache is not None:
+            last_update = None
+            while True:
+                await cache.wait_for_update()
+                received_at = cache.received_at.get("position")
+                if received_at is not None and received_at != last_update:
+                    last_update = received_at
+                    yield cache.latest["position"], cache.latest.get("flight_mode")
+
+        _, position_to_dict = TELEMETRY_TOPICS["position"]
+        _, flight_mode_name = TELEMETRY_TOPICS["flight_mode"]
+        flight_mode = None
+        async def follow_flight_mode():
+            nonlocal flight_mode
+            async for mode in self.drone.telemetry.flight_mode():
+                flight_mode = flight_mode_name(mode)
+        flight_mode_task = asyncio.create_task(follow_flight_mode())
+        try:
+            async for position in self.drone.telemetry.position():
+                yield position_to_dict(position), flight_mode
+        finally:
+            flight_mode_task.cancel()
+
+    async def _land(self, handle):
         print("-- Landing...")
         try:
             await self.drone.action.land()
@@ -100,14 +266,13 @@ class DroneActionExecutor:
                 if not in_air:
                     print("-- Drone landed.")
                     break
-                await asyncio.sleep(0.5)
             self.current_action = "on_ground"
             return True
         except Exception as e:
             print(f"Error landing: {e}")
             return False
 
-    async def rtl_drone(self):
+    async def _rtl(self, handle):
         print("-- Initiating Return To Launch...")
         try:
             await self.drone.action.return_to_launch()
@@ -118,14 +283,13 @@ class DroneActionExecutor:
                 if not in_air:
                     print("-- Drone returned and landed.")
                     break
-                await asyncio.sleep(0.5)
             self.current_action = "on_ground"
             return True
         except Exception as e:
             print(f"Error initiating RTL: {e}")
             return False
 
-    async def hold_drone(self, reason: str):
+    async def _hold(self, handle, reason: str):
         print(f"-- Holding current position. Reason: {reason}")
         try:
             # Set to HOLD flight mode if not already
@@ -141,12 +305,4 @@ class DroneActionExecutor:
             return False
 
     def _calculate_distance(self, lat1, lon1, lat2, lon2):
-        # A simple approximation for distance for small distances (Haversine formula for accuracy)
-        # For this simulation, we'll use a very crude estimate, but for real, use geopy or similar.
-        # This is just to check if it's "close enough" for the SITL loop.
-        R = 6371000 # Earth radius in meters
-        d_lat = (lat2 - lat1) * 3.14159 / 180.0
-        d_lon = (lon2 - lon1) * 3.14159 / 180.0
-        a = (d_lat/2)**2 + (d_lon/2)**2 * 0.9 # crude cosine(lat) factor
-        c = 2 * 0.1 # crude asin(sqrt(a))
-        return R * c # Very rough approximation
\ No newline at end of file
+        return distance_m(lat1, lon1, lat2, lon2)
@@ -0,0 +1,375 @@
+# fleet.py
+"""
+Runs the task2 advisor for several vehicles in one process.
+
+Each vehicle gets its own telemetry cache, planner and executor on a shared
+event loop; the vehicles share the Ollama backend through a fair scheduler.
+
+    python fleet.py udp://:14540 udp://:14541 udp://:14542
+    python fleet.py --count 12                 # udp://:14540 ... udp://:14551
+    python fleet.py north=udp://:14540 south=udp://:14541
+
+Commands are addressed as "<vehicle>: <command>" or "all: <command>", e.g.
+"2: Take off to 10m". The console shows a per-vehicle status table and, unless
+--log gives a file for it, the advisors' own output. Nothing is written to disk
+unless --log or --telemetry-log-dir asks for it.
+
+    python fleet.py --count 3 --log fleet_advisor.log --telemetry-log-dir telemetry_logs
+"""
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import functools
+import heapq
+import os
+import sys
+import time
+from collections import Counter, deque
+
+from mavsdk import System
+
+import main as advisor
+from command_source import CommandSource
+from ollama_res import get_ollama_action, new_ollama_client
+from telemetry import MAVSDK_CONNECTION_ADDRESS, connect_drone, get_telemetry_cache, stop_telemetry_cache
+from tick_timing import TickTimer, percentile
+
+FLEET_OLLAMA_CONCURRENCY = 2           # concurrent Ollama requests; match OLLAMA_NUM_PARALLEL on the server
+FLEET_MAVSDK_SERVER_BASE_PORT = 50051  # vehicle i gets its own mavsdk_server on this port + i
+FLEET_CONNECT_TIMEOUT_S = 30.0
+FLEET_STATUS_INTERVAL_S = 5.0
+FLEET_LOG_PATH = None                  # default for --log, e.g. "fleet_advisor.log"; None prints advisor output to the console
+FLEET_WAIT_SAMPLES = 500               # queue wait samples kept per vehicle
+
+FLEET_PROMPT = "Fleet command ('<vehicle>: <command>' or 'all: <command>'): "
+
+
+class FairScheduler:
+    """
+    Shares `concurrency` Ollama request slots between vehicles with start-time
+    fair queuing: each request gets a tag one past the later of its vehicle's
+    previous tag and the tag last served, and free slots go to the lowest tag.
+    A vehicle asking continuously therefore gets its share but cannot starve
+    the others, and a vehicle that was quiet for a while gets no burst credit.
+    """
+
+    def __init__(self, concurrency=FLEET_OLLAMA_CONCURRENCY):
+        self.concurrency = concurrency
+        self.active = 0
+        self.granted = Counter()  # vehicle -> requests started
+        self.waits_ms = {}        # vehicle -> recent queue waits
+        self._virtual_time = 0
+        self._last_tag = {}
+        self._waiting = []        # heap of (tag, seq, vehicle, future)
+        self._seq = 0
+
+    def _tag(self, vehicle):
+        tag = max(self._last_tag.get(vehicle, 0), self._virtual_time) + 1
+        self._last_tag[vehicle] = tag
+        return tag
+
+    def _grant(self, vehicle, tag, waited_ms):
+        self.active += 1
+        self._virtual_time = max(self._virtual_time, tag)
+        self.granted[vehicle] += 1
+        self.waits_ms.setdefault(vehicle, deque(maxlen=FLEET_WAIT_SAMPLES)).append(waited_ms)
+
+    async def acquire(self, vehicle):
+        tag = self._tag(vehicle)
+        if self.active < self.concurrency and not self._waiting:
+            self._grant(vehicle, tag, 0.0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        heapq.heappush(self._waiting, (tag, self._seq, vehicle, future, time.monotonic()))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # A newer command cancelled the request; if the slot was already handed
+            # to us, pass it on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.active -= 1
+        while self._waiting and self.active < self.concurrency:
+            tag, _, vehicle, future, queued_at = heapq.heappop(self._waiting)
+            if future.done(): # cancelled while waiting
+                continue
+            self._grant(vehicle, tag, (time.monotonic() - queued_at) * 1000)
+            future.set_result(None)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, vehicle):
+        await self.acquire(vehicle)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self, vehicle):
+        waits = sorted(self.waits_ms.get(vehicle, ()))
+        return {
+            "requests": self.granted[vehicle],
+            "wait_p50_ms": round(percentile(waits, 0.50), 1),
+            "wait_p95_ms": round(percentile(waits, 0.95), 1),
+        }
+
+
+_current_vehicle = contextvars.ContextVar("fleet_vehicle", default=None)
+
+class VehicleLog:
+    """
+    Stdout replacement that prefixes each line with the vehicle whose task wrote
+    it; tasks inherit the vehicle from the context they were created in.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._at_line_start = True
+
+    def write(self, text):
+        vehicle = _current_vehicle.get()
+        prefix = f"[{vehicle}] " if vehicle else ""
+        for line in text.splitlines(keepends=True):
+            if self._at_line_start:
+                self.stream.write(prefix)
+            self.stream.write(line)
+            self._at_line_start = line.endswith("\n")
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class VehicleCommands:
+    """The command source one vehicle's advisor reads; the fleet routes commands into it."""
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.received = 0
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def get(self):
+        return await self.queue.get()
+
+    def put(self, command):
+        self.received += 1
+        self.queue.put_nowait(command)
+
+
+class Vehicle:
+    def __init__(self, name, address, index):
+        self.name = name
+        self.address = address
+        self.index = index
+        self.drone = None
+        self.commands = VehicleCommands()
+        self.tick_timer = TickTimer()
+        self.task = None
+        self.error = None
+
+    def status(self, scheduler):
+        ticks = self.tick_timer.ticks
+        sources = Counter(tick.get("source") for tick in ticks)
+        totals = sorted(tick["total_ms"] for tick in ticks)
+        telemetry = {}
+        cache = get_telemetry_cache(self.drone) if self.drone is not None else None
+        if cache is not None:
+            telemetry = cache.latest
+        return dict({
+            "vehicle": self.name,
+            "state": self.error or ("running" if self.task and not self.task.done() else "stopped"),
+            "ticks": self.tick_timer.tick_count,
+            "tick_p50_ms": round(percentile(totals, 0.50), 1),
+            "tick_p95_ms": round(percentile(totals, 0.95), 1),
+            "llm_share": round(sources["llm"] / len(ticks), 2) if ticks else 0.0,
+            "armed": telemetry.get("armed"),
+            "in_air": telemetry.get("in_air"),
+            "mode": telemetry.get("flight_mode"),
+            "battery": (telemetry.get("battery") or {}).get("remaining_percent"),
+        }, **scheduler.stats(self.name))
+
+
+def parse_vehicles(specs, count=None):
+    """Vehicles from "address" or "name=address" specs, or `count` consecutive UDP ports."""
+    if count:
+        port = int(MAVSDK_CONNECTION_ADDRESS.rsplit(":", 1)[1])
+        specs = [f"udp://:{port + i}" for i in range(count)]
+    vehicles = []
+    for index, spec in enumerate(specs):
+        name, _, address = spec.rpartition("=") if "=" in spec else (str(index + 1), "", spec)
+        vehicles.append(Vehicle(name, address, index))
+    if len({vehicle.name for vehicle in vehicles}) != len(vehicles):
+        raise ValueError("vehicle names must be unique")
+    return vehicles
+
+def mavsdk_system_factory(vehicle):
+    # Every vehicle needs its own mavsdk_server, each on its own gRPC port
+    return functools.partial(System, port=FLEET_MAVSDK_SERVER_BASE_PORT + vehicle.index)
+
+def route_command(vehicles, text):
+    """Delivers "<vehicle>: <command>" or "all: <command>". Returns the vehicles it went to."""
+    target, separator, command = text.partition(":")
+    target, command = target.strip(), command.strip()
+    if not separator or not command:
+        return []
+    if target.lower() == "all":
+        recipients = [vehicle for vehicle in vehicles if vehicle.drone is not None]
+    else:
+        recipients = [vehicle for vehicle in vehicles if vehicle.name == target and vehicle.drone is not None]
+    for vehicle in recipients:
+        vehicle.commands.put(command)
+    return recipients
+
+
+async def close_system(system):
+    """Stops a vehicle's telemetry cache and its System, including the mavsdk_server it started."""
+    await stop_telemetry_cache(system)
+    close = getattr(system, "close", None)
+    if close is not None:
+        await close()
+    elif hasattr(system, "_stop_mavsdk_server"):
+        # mavsdk.System has no public close(); it otherwise only kills its server when garbage collected
+        system._stop_mavsdk_server()
+
+async def _connect(vehicle, system_factory):
+    _current_vehicle.set(vehicle.name)
+    system = None
+    try:
+        # Built here rather than inside connect_drone so a timeout cannot orphan its mavsdk_server
+        system = system_factory(vehicle)()
+        vehicle.drone = await asyncio.wait_for(
+            connect_drone(address=vehicle.address, system_factory=lambda: system), FLEET_CONNECT_TIMEOUT_S)
+    except Exception as e:
+        vehicle.error = f"connect failed: {e or type(e).__name__}"
+    finally:
+        if vehicle.drone is None and system is not None:
+            await close_system(system)
+
+def format_status(statuses):
+    lines = [f"{'vehicle':<10} {'state':<10} {'mode':<17} {'arm':<5} {'air':<5} {'bat%':>4} {'ticks':>6} "
+             f"{'p50 ms':>8} {'p95 ms':>8} {'llm':>5} {'llm req':>7} {'wait p95':>9}"]
+    for s in statuses:
+        lines.append(f"{s['vehicle']:<10} {s['state'][:10]:<10} {str(s['mode']):<17} {str(s['armed']):<5} "
+                     f"{str(s['in_air']):<5} {str(s['battery']):>4} {s['ticks']:>6} {s['tick_p50_ms']:>8.1f} "
+                     f"{s['tick_p95_ms']:>8.1f} {s['llm_share']:>5.0%} {s['requests']:>7} {s['wait_p95_ms']:>7.1f}ms")
+    return "\n".join(lines)
+
+async def run_fleet(vehicles, system_factory=mavsdk_system_factory, command_source=None,
+                    concurrency=FLEET_OLLAMA_CONCURRENCY, status_interval_s=FLEET_STATUS_INTERVAL_S,
+                    telemetry_log_dir=None, console=None):
+    """
+    Connects every vehicle concurrently, then runs one advisor pipeline per
+    connected vehicle until interrupted. system_factory(vehicle) returns the
+    callable that builds that vehicle's System. Telemetry is only recorded when
+    `telemetry_log_dir` is given, one subdirectory per vehicle. Returns the
+    final status rows.
+    """
+    console = console or sys.stdout
+    await asyncio.gather(*(_connect(vehicle, system_factory) for vehicle in vehicles))
+    connected = [vehicle for vehicle in vehicles if vehicle.drone is not None]
+    print(f"Connected {len(connected)}/{len(vehicles)} vehicles.", file=console, flush=True)
+    for vehicle in vehicles:
+        if vehicle.error:
+            print(f"  {vehicle.name} ({vehicle.address}): {vehicle.error}", file=console, flush=True)
+
+    scheduler = FairScheduler(concurrency)
+    client = new_ollama_client(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    def decider(vehicle):
+        async def decide(human_command, telemetry_data, call_stats=None):
+            async with scheduler.slot(vehicle.name):
+                return await get_ollama_action(human_command, telemetry_data, client=client, call_stats=call_stats)
+        return decide
+
+    for vehicle in connected:
+        log_dir = os.path.join(telemetry_log_dir, vehicle.name) if telemetry_log_dir else None
+        _current_vehicle.set(vehicle.name)
+        vehicle.task = asyncio.create_task(advisor.run_ollama_drone_advisor(
+            drone=vehicle.drone, decide=decider(vehicle), command_source=vehicle.commands,
+            tick_timer=vehicle.tick_timer, telemetry_log_dir=log_dir))
+    _current_vehicle.set(None)
+
+    async def route_commands():
+        while True:
+            text = await command_source.get()
+            recipients = route_command(vehicles, text)
+            if recipients:
+                print(f"-> {', '.join(vehicle.name for vehicle in recipients)}: {text.partition(':')[2].strip()}",
+                      file=console, flush=True)
+            else:
+                print(f"Not delivered: {text!r}. {FLEET_PROMPT}", file=console, flush=True)
+
+    async def report_status():
+        while True:
+            await asyncio.sleep(status_interval_s)
+            print(f"\n{format_status(vehicle.status(scheduler) for vehicle in vehicles)}", file=console, flush=True)
+
+    helpers = [asyncio.create_task(report_status())]
+    if command_source is not None:
+        await command_source.start()
+        helpers.append(asyncio.create_task(route_commands()))
+    try:
+        if connected:
+            await asyncio.gather(*(vehicle.task for vehicle in connected), return_exceptions=True)
+    finally:
+        for task in helpers:
+            task.cancel()
+        for vehicle in connected:
+            vehicle.task.cancel()
+        # Every advisor runs its own landing/cleanup; let them finish together
+        await asyncio.gather(*(vehicle.task for vehicle in connected), return_exceptions=True)
+        statuses = [vehicle.status(scheduler) for vehicle in vehicles]
+        for vehicle in connected:
+            await close_system(vehicle.drone)
+        if command_source is not None:
+            await command_source.stop()
+        await client.aclose()
+        print(f"\nFinal fleet status:\n{format_status(statuses)}", file=console, flush=True)
+    return statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("vehicles", nargs="*", help="connection addresses, optionally as name=address")
+    parser.add_argument("--count", type=int, help=f"connect to this many vehicles from {MAVSDK_CONNECTION_ADDRESS} up")
+    parser.add_argument("--concurrency", type=int, default=FLEET_OLLAMA_CONCURRENCY,
+                        help="concurrent Ollama requests across the fleet")
+    parser.add_argument("--command-port", type=int, help="also accept fleet commands on this local TCP port")
+    parser.add_argument("--log", default=FLEET_LOG_PATH, metavar="PATH",
+                        help="append the advisors' output to this file instead of the console")
+    parser.add_argument("--telemetry-log-dir", metavar="DIR",
+                        help="record every vehicle's telemetry under DIR/<vehicle> for replay.py")
+    args = parser.parse_args()
+
+    vehicles = parse_vehicles(args.vehicles, args.count)
+    if not vehicles:
+        parser.error("give vehicle addresses or --count")
+
+    async def run():
+        console = sys.stdout
+        command_source = CommandSource(tcp_port=args.command_port, prompt=None)
+        print(FLEET_PROMPT, file=console, flush=True)
+        log = open(args.log, "a") if args.log else None
+        with contextlib.redirect_stdout(VehicleLog(log or console)):
+            try:
+                await run_fleet(vehicles, command_source=command_source, concurrency=args.concurrency,
+                                telemetry_log_dir=args.telemetry_log_dir, console=console)
+            finally:
+                if log:
+                    log.close()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\nFleet stopped.")
+
+if __name__ == "__main__":
+    main()
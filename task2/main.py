@@ -2,159 +2,276 @@
 import asyncio
 import json
 import time
-import queue
-import threading
 
-from telemetry import connect_drone, get_drone_telemetry
-from ollama_res import get_ollama_action
+from telemetry import connect_drone, get_telemetry_cache, wait_for_telemetry
+from ollama_res import get_ollama_action, close_ollama_client
 from drone_action import DroneActionExecutor
+from safety_rules import SafetyRuleEngine
+from decision_cache import DecisionCache
+from tick_timing import TickTimer
+from pipeline import CommandGenerations, LatestValue, action_key, vehicle_state
+from command_source import CommandSource
+from telemetry_recorder import TelemetryRecorder
 
-# Global variable to store the last human command
+# Command the advisor starts with, until a human enters one
 last_human_command = "Start mission" # Initial command for the LLM
 
-async def run_ollama_drone_advisor(update_interval_seconds=3):
-    print("--- Starting Ollama Drone Advisor ---")
+TICK_TIMINGS_EXPORT_PATH = None # e.g. "advisor_ticks.jsonl" to keep per-tick stage timings
+TELEMETRY_PRODUCER_INTERVAL_S = 0.02 # At most 50 telemetry snapshots per second reach the planner
+PLANNER_MIN_INTERVAL_S = 0.5 # Minimum time between two planner decisions
+COMMAND_TCP_PORT = None # e.g. 14600 to also accept commands with `echo Land | nc 127.0.0.1 14600`
+COMMAND_SOCKET_PATH = None # e.g. "/tmp/drone_commands.sock" for a Unix socket
+TELEMETRY_LOG_DIR = None # e.g. "telemetry_logs" to keep a binary log of every telemetry update for replay.py
 
-    drone = None
-    try:
-        drone = await connect_drone()
-    except Exception as e:
-        print(f"Failed to connect to drone: {e}")
-        print("Ensure PX4 SITL is running and accessible.")
-        return
+def execute_action(action_executor: DroneActionExecutor, llm_action_request: dict, telemetry_data: dict):
+    """
+    Starts a suggested action via the DroneActionExecutor, after checking it
+    against the given telemetry snapshot. Returns the action's ActionHandle
+    without waiting for it to finish, or None if the action was skipped.
+    """
+    handle = None
+    action_type = llm_action_request.get("action")
+    message = llm_action_request.get("message", "No specific message.")
+    
+    if action_type == "takeoff":
+        altitude = llm_action_request.get("altitude_m")
+        if telemetry_data.get("armed") == False:
+            print("-- Drone not armed, LLM suggests arming first.")
+            handle = action_executor.arm_drone()
+            # After arming, the next decision (planned on armed telemetry) should lead to takeoff
+        elif telemetry_data.get("in_air") == False and altitude is not None:
+            handle = action_executor.takeoff_drone(altitude)
+        else:
+            print(f"Skipping takeoff: Already in air or invalid altitude ({altitude}).")
+    
+    elif action_type == "arm":
+        if telemetry_data.get("armed") == False and telemetry_data.get("in_air") == False:
+            handle = action_executor.arm_drone()
+        else:
+            print(f"Skipping arm: Already armed ({telemetry_data.get('armed')}) or in air ({telemetry_data.get('in_air')}).")
 
-    action_executor = DroneActionExecutor(drone)
-    print("Drone connected. Ready for commands.")
+    elif action_type == "disarm":
+        if telemetry_data.get("armed") == True and telemetry_data.get("in_air") == False:
+            handle = action_executor.disarm_drone()
+        else:
+            print(f"Skipping disarm: Already disarmed or in air ({telemetry_data.get('in_air')}).")
+
+    elif action_type == "goto":
+        lat = llm_action_request.get("latitude_deg")
+        lon = llm_action_request.get("longitude_deg")
+        alt = llm_action_request.get("altitude_m")
+        if telemetry_data.get("armed") == True and telemetry_data.get("in_air") == True and telemetry_data.get("health", {}).get("global_position_ok", False) and lat is not None and lon is not None and alt is not None:
+            handle = action_executor.goto_location(lat, lon, alt)
+        else:
+            print(f"Skipping goto: Not armed, not in air, no GPS, or invalid coordinates.")
+    
+    elif action_type == "land":
+        if telemetry_data.get("armed") == True and telemetry_data.get("in_air") == True:
+            handle = action_executor.land_drone()
+        else:
+            print(f"Skipping land: Not armed or not in air.")
 
-    input_queue = queue.Queue()
+    elif action_type == "rtl":
+        if telemetry_data.get("armed") == True and telemetry_data.get("in_air") == True and telemetry_data.get("health", {}).get("home_position_ok", False):
+            handle = action_executor.rtl_drone()
+        else:
+            print(f"Skipping RTL: Not armed, not in air, or no home position.")
+
+    elif action_type == "hold":
+        handle = action_executor.hold_drone(llm_action_request.get("reason", "No specific reason."))
+    
+    elif action_type == "error":
+        print(f"!!! LLM Error/Intervention Requested: {message} !!!")
+        # In a real system, you'd alert the human operator prominently here
+        # and potentially halt automatic execution.
+        # For now, we'll continue to monitor.
+        handle = action_executor.hold_drone("LLM requested human intervention due to error.")
+    
+    else:
+        print(f"Unknown action type received from LLM: {action_type}. Defaulting to hold.")
+        handle = action_executor.hold_drone("Unknown LLM action.")
+
+    return handle
+
+
+async def run_ollama_drone_advisor(drone=None, decide=None, command_source=None, tick_timer=None,
+                                   telemetry_log_dir=TELEMETRY_LOG_DIR):
+    """
+    Runs the advisor pipeline until interrupted. By default it connects to PX4
+    SITL, asks Ollama and reads commands from stdin; the replay harness and the
+    simulators pass in their own drone, decide(command, telemetry, call_stats=)
+    coroutine function, command source and tick timer instead.
+    """
+    print("--- Starting Ollama Drone Advisor ---")
 
-    def _get_input_in_thread(prompt, input_q):
+    if drone is None:
         try:
-            input_q.put(input(prompt))
+            drone = await connect_drone()
         except Exception as e:
-            print(f"[Error in input thread]: {e}")
+            print(f"Failed to connect to drone: {e}")
+            print("Ensure PX4 SITL is running and accessible.")
+            return
+    decide = decide or get_ollama_action
+
+    action_executor = DroneActionExecutor(drone)
+    rule_engine = SafetyRuleEngine()
+    decision_cache = DecisionCache()
+    tick_timer = tick_timer or TickTimer() # planner ticks
+    action_timer = TickTimer()             # executor actions
+    recorder = None
+    telemetry_cache = get_telemetry_cache(drone)
+    if telemetry_log_dir and telemetry_cache is not None:
+        recorder = TelemetryRecorder(telemetry_log_dir)
+        recorder.start()
+        recorder.attach(telemetry_cache)
+    print("Drone connected. Ready for commands.")
+
+    command_source = command_source or CommandSource(tcp_port=COMMAND_TCP_PORT, unix_path=COMMAND_SOCKET_PATH)
+    await command_source.start()
+    commands = CommandGenerations(last_human_command) # Each new command starts a new generation
 
     async def human_input_monitor():
-        print("is this part running???")
-        global last_human_command
-        # Start the input thread if it's not running or completed
-        input_thread = None
         while True:
-            if input_thread is None or not input_thread.is_alive():
-                # Start new input thread
-                input_thread = threading.Thread(
-                    target=_get_input_in_thread,
-                    args=("\nEnter command for drone (e.g., 'Take off to 10m', 'Go to 23.0225, 72.5714 at 50m', 'Land', 'RTL', 'Status'): ", input_queue)
-                )
-                input_thread.daemon = True # Allow main program to exit even if thread is running
-                input_thread.start()
-
-            # Check if input is available without blocking
-            try:
-                new_command = input_queue.get_nowait()
-                if new_command.strip():
-                    last_human_command = new_command.strip()
-                    print(f"Human command received: '{last_human_command}'")
-            except queue.Empty:
-                pass # No new input yet
-
-            await asyncio.sleep(0.1) # Check frequently
+            commands.update(await command_source.get())
+            print(f"Human command received: '{commands.command}' (generation {commands.generation})")
     # Start the human input monitor as a background task
     input_task = asyncio.create_task(human_input_monitor())
 
-    try:
+    telemetry_slot = LatestValue() # telemetry producer -> planner (executor peeks)
+    action_slot = LatestValue()    # planner -> executor
+    async def telemetry_producer():
+        # Publishes a snapshot whenever the telemetry cache updates, coalesced to
+        # at most one per TELEMETRY_PRODUCER_INTERVAL_S
+        while True:
+            telemetry_slot.put(await wait_for_telemetry(drone))
+            await asyncio.sleep(TELEMETRY_PRODUCER_INTERVAL_S)
+
+    async def planner():
+        telemetry_version = 0
         while True:
+            decision_started = time.monotonic()
+            # Always plan on the freshest snapshot; older ones were overwritten in the slot
+            telemetry_version, telemetry_data = await telemetry_slot.get(newer_than=telemetry_version)
             print(f"\n--- Telemetry Update (Time: {int(time.time())}s) ---")
-            
-            # 1. Get Telemetry from MAVSDK (SITL)
-            telemetry_data = await get_drone_telemetry(drone)
+            generation, human_command = commands.current()
+            tick = tick_timer.start_tick(command=human_command, generation=generation)
+            tick_timer.record("telemetry_age", (time.monotonic() - telemetry_slot.put_at) * 1000)
             print("Raw Telemetry Snippet:")
             print(f"  Battery: {telemetry_data.get('battery', {}).get('remaining_percent', 'N/A')}%")
             print(f"  GPS Fix: {telemetry_data.get('gps_info', {}).get('fix_type', 'N/A')}D")
             print(f"  In Air: {telemetry_data.get('in_air', 'N/A')}")
             print(f"  Armed: {telemetry_data.get('armed', 'N/A')}")
             print(f"  Flight Mode: {telemetry_data.get('flight_mode', 'N/A')}")
-            print(f"  Current Action Executor State: {action_executor.current_action}")
+            if telemetry_data.get("stale_topics"):
+                print(f"  Stale Topics: {', '.join(telemetry_data['stale_topics'])}")
+            print(f"  Current Action Executor State: {action_executor.current_action} {action_executor.current_handle}")
 
-            # 2. Send current human command and telemetry to Ollama for Reasoning
+            # Send current human command and telemetry to Ollama for Reasoning
             # We are sending the *last* command, allowing LLM to adapt based on current state
-            llm_action_request = await get_ollama_action(last_human_command, telemetry_data)
-            
-            # 3. Display Ollama's Suggested Action
+            # Hard safety rules are checked locally first; Ollama is only asked when none fires
+            # and no decision is cached for this command and (quantized) telemetry
+            with tick_timer.stage("rules_and_cache"):
+                llm_action_request = rule_engine.evaluate(telemetry_data)
+                if llm_action_request is not None:
+                    tick["source"] = "rule"
+                else:
+                    llm_action_request = decision_cache.get(human_command, telemetry_data)
+                    if llm_action_request is not None:
+                        tick["source"] = "cache"
+            if llm_action_request is None:
+                tick["source"] = "llm"
+                call_stats = {}
+                # A newer human command cancels this request; the loop then replans at once
+                completed, llm_action_request = await commands.run_current(
+                    generation, decide(human_command, telemetry_data, call_stats=call_stats))
+                tick_timer.record_ollama_call(call_stats)
+                if not completed:
+                    tick["source"] = "llm_cancelled"
+                    tick = tick_timer.end_tick()
+                    print(f"-- Cancelled Ollama request for '{human_command}', replanning for '{commands.command}'. "
+                          f"{tick_timer.format_tick(tick)}")
+                    continue
+                decision_cache.put(human_command, telemetry_data, llm_action_request)
+            tick["action"] = llm_action_request.get("action")
+
             print("\nOllama's Suggested Action:")
             print(json.dumps(llm_action_request, indent=2))
+            action_slot.put({"action": llm_action_request, "telemetry": telemetry_data, "tick": tick["tick"],
+                             "generation": generation})
 
-            # 4. Execute the Suggested Action via DroneActionExecutor
-            action_type = llm_action_request.get("action")
-            message = llm_action_request.get("message", "No specific message.")
-            
-            if action_type == "takeoff":
-                altitude = llm_action_request.get("altitude_m")
-                if telemetry_data.get("armed") == False:
-                    print("-- Drone not armed, LLM suggests arming first.")
-                    await action_executor.arm_drone()
-                    # After arming, the next loop iteration should lead to takeoff
-                    await asyncio.sleep(update_interval_seconds) # Give time for arming
-                    continue # Skip to next loop iteration
-                elif telemetry_data.get("in_air") == False and altitude is not None:
-                    await action_executor.takeoff_drone(altitude)
-                else:
-                    print(f"Skipping takeoff: Already in air or invalid altitude ({altitude}).")
-            
-            elif action_type == "arm":
-                if telemetry_data.get("armed") == False and telemetry_data.get("in_air") == False:
-                    await action_executor.arm_drone()
-                else:
-                    print(f"Skipping arm: Already armed ({telemetry_data.get('armed')}) or in air ({telemetry_data.get('in_air')}).")
-
-            elif action_type == "disarm":
-                if telemetry_data.get("armed") == True and telemetry_data.get("in_air") == False:
-                    await action_executor.disarm_drone()
-                else:
-                    print(f"Skipping disarm: Already disarmed or in air ({telemetry_data.get('in_air')}).")
-
-            elif action_type == "goto":
-                lat = llm_action_request.get("latitude_deg")
-                lon = llm_action_request.get("longitude_deg")
-                alt = llm_action_request.get("altitude_m")
-                if telemetry_data.get("armed") == True and telemetry_data.get("in_air") == True and telemetry_data.get("health", {}).get("global_position_ok", False) and lat is not None and lon is not None and alt is not None:
-                    await action_executor.goto_location(lat, lon, alt)
-                else:
-                    print(f"Skipping goto: Not armed, not in air, no GPS, or invalid coordinates.")
-            
-            elif action_type == "land":
-                if telemetry_data.get("armed") == True and telemetry_data.get("in_air") == True:
-                    await action_executor.land_drone()
-                else:
-                    print(f"Skipping land: Not armed or not in air.")
+            tick = tick_timer.end_tick()
+            print(f"Tick timings: {tick_timer.format_tick(tick)}")
+            # Rule and cache decisions are paced; an LLM call slower than this is never delayed
+            # further, and a new human command is planned right away
+            try:
+                await asyncio.wait_for(commands.wait_newer(generation),
+                                       max(0.0, PLANNER_MIN_INTERVAL_S - (time.monotonic() - decision_started)))
+            except asyncio.TimeoutError:
+                pass
 
-            elif action_type == "rtl":
-                if telemetry_data.get("armed") == True and telemetry_data.get("in_air") == True and telemetry_data.get("health", {}).get("home_position_ok", False):
-                    await action_executor.rtl_drone()
-                else:
-                    print(f"Skipping RTL: Not armed, not in air, or no home position.")
+    async def executor():
+        last_executed = None
+        while True:
+            _, decision = await action_slot.get()
+            llm_action_request = decision["action"]
+            # Preconditions are checked against the current vehicle state, not the one planned on
+            telemetry_data = telemetry_slot.peek() or decision["telemetry"]
+            state = vehicle_state(telemetry_data)
+            if "rule" not in llm_action_request and not commands.is_current(decision["generation"]):
+                commands.dropped += 1
+                print(f"-- Dropping decision from tick {decision['tick']}: planned for an older command.")
+                continue
+            if "rule" not in llm_action_request and state != vehicle_state(decision["telemetry"]):
+                print(f"-- Dropping decision from tick {decision['tick']}: vehicle state changed while planning.")
+                continue
+            key = (action_key(llm_action_request), state)
+            if key == last_executed:
+                continue # Already executed in this vehicle state
+            last_executed = key
 
-            elif action_type == "hold":
-                await action_executor.hold_drone(llm_action_request.get("reason", "No specific reason."))
-            
-            elif action_type == "error":
-                print(f"!!! LLM Error/Intervention Requested: {message} !!!")
-                # In a real system, you'd alert the human operator prominently here
-                # and potentially halt automatic execution.
-                # For now, we'll continue to monitor.
-                await action_executor.hold_drone("LLM requested human intervention due to error.")
-            
-            else:
-                print(f"Unknown action type received from LLM: {action_type}. Defaulting to hold.")
-                await action_executor.hold_drone("Unknown LLM action.")
+            action_timer.start_tick(action=llm_action_request.get("action"), planned_in_tick=decision["tick"])
+            action_timer.record("queue_wait", (time.monotonic() - action_slot.put_at) * 1000)
+            # Actions run in the background, so the executor is free for the next decision;
+            # a land/rtl decision preempts the running action
+            with action_timer.stage("action_dispatch"):
+                execute_action(action_executor, llm_action_request, telemetry_data)
+            action_timer.end_tick()
 
-            await asyncio.sleep(update_interval_seconds)
+    try:
+        # Telemetry, reasoning and execution run concurrently, connected by latest-value slots
+        await asyncio.gather(telemetry_producer(), planner(), executor())
 
     except KeyboardInterrupt:
         print("\nSimulation interrupted by user.")
     except Exception as e:
         print(f"An unhandled error occurred: {e}")
     finally:
+        await close_ollama_client()
+        print(f"Safety rule engine: {rule_engine.stats()}")
+        print(f"Decision cache: {decision_cache.stats()}")
+        if tick_timer.ticks:
+            print(f"Advisor tick timings over {len(tick_timer.ticks)} ticks:\n{tick_timer.format_summary()}")
+            if TICK_TIMINGS_EXPORT_PATH:
+                # A bad export path must not skip landing the vehicle
+                try:
+                    tick_timer.export_jsonl(TICK_TIMINGS_EXPORT_PATH)
+                    print(f"Tick timings written to {TICK_TIMINGS_EXPORT_PATH}")
+                except OSError as e:
+                    print(f"Could not write tick timings to {TICK_TIMINGS_EXPORT_PATH}: {e}")
+        if action_timer.ticks:
+            print(f"Action timings over {len(action_timer.ticks)} actions:\n{action_timer.format_summary()}")
+        print(f"Pipeline slots: telemetry {telemetry_slot.stats()}, actions {action_slot.stats()}")
+        print(f"Command generations: {commands.stats()}")
+        if recorder is not None:
+            # Landing the vehicle below must not depend on the log being writable
+            try:
+                await recorder.close()
+                print(f"Telemetry recorder: {recorder.stats()} -> {telemetry_log_dir}")
+            except Exception as e:
+                print(f"Error closing telemetry recorder ({telemetry_log_dir}): {e}")
+        telemetry_data = telemetry_slot.peek() or {}
+        if action_executor.current_handle is not None:
+            action_executor.current_handle.cancel()
         if drone:
             print("Ensuring drone is disarmed and killed for cleanup...")
             # Attempt to disarm and kill only if drone is not already disarmed and on ground
@@ -189,6 +306,7 @@ async def run_ollama_drone_advisor(update_interval_seconds=3):
                 await input_task # Await to ensure cancellation propagates
             except asyncio.CancelledError:
                 pass # Expected during graceful shutdown
+        await command_source.stop()
 
 
 
@@ -2,70 +2,28 @@
 import asyncio
 import json
 import time
-import queue
-import threading # Required for threading
 
 from telemetry import connect_drone, get_drone_telemetry
-from ollama_res import get_ollama_action
+from ollama_res import get_ollama_action, close_ollama_client
 from drone_action import DroneActionExecutor
+from safety_rules import SafetyRuleEngine
+from decision_cache import DecisionCache
+from command_source import CommandSource
 
 # Global variable to store the last human command
 last_human_command = "Start mission" # Initial command for the LLM
 
-# --- Threading setup for non-blocking input ---
-input_queue = queue.Queue() # Thread-safe queue to get input from the separate thread
-input_prompt = "\nEnter command for drone (e.g., 'Take off to 10m', 'Go to 23.0225, 72.5714 at 50m', 'Land', 'RTL', 'Status'): "
-
-def _get_input_in_thread(prompt, input_q):
-    """
-    Function to run in a separate thread to get user input.
-    Blocks on input(), then puts the result into the queue.
-    """
-    try:
-        user_input = input(prompt)
-        input_q.put(user_input)
-    except EOFError:
-        # Handle cases where input stream might be closed (e.g., script run with no interactive terminal)
-        input_q.put("") # Put an empty string or specific signal
-    except Exception as e:
-        print(f"Error in input thread: {e}")
-        input_q.put("") # Ensure something is put to prevent blocking
+# --- Human command input (stdin via the event loop, no threads) ---
+command_source = None
 
 async def human_input_monitor():
     """
-    Asynchronous task to manage the input thread and update the global command.
+    Asynchronous task that updates the global command as soon as one is entered.
     """
     global last_human_command
-    input_thread = None # Initialize outside the loop to manage its lifecycle
-
     while True:
-        # Only start a new input thread if the previous one has finished or hasn't started
-        if input_thread is None or not input_thread.is_alive():
-            # Print the prompt in the main async loop, so it's not duplicated by multiple threads
-            # when the loop is fast, and to keep output synchronized.
-            print(input_prompt, end="", flush=True)
-
-            input_thread = threading.Thread(
-                target=_get_input_in_thread,
-                args=("", input_queue) # Pass empty string, as the prompt is printed above
-            )
-            input_thread.daemon = True # Allows the main program to exit even if thread is still running
-            input_thread.start()
-
-        # Check if input is available in the queue without blocking
-        try:
-            new_command = input_queue.get_nowait()
-            if new_command.strip():
-                last_human_command = new_command.strip()
-                print(f"\nHuman command received: '{last_human_command}'") # Add newline for clarity
-            # If a command was just processed, the thread is likely done,
-            # so we can set input_thread to None to ensure a new one starts next iteration
-            # This helps prevent multiple prompts if user types very slowly.
-            input_thread = None 
-        except queue.Empty:
-            pass # No new input yet
-
-        await asyncio.sleep(0.1) # Check for input frequently but don't busy-wait
+        last_human_command = await command_source.get()
+        print(f"\nHuman command received: '{last_human_command}'") # Add newline for clarity
 
 # --- Main drone advisor logic ---
 async def run_ollama_drone_advisor(update_interval_seconds=3):
@@ -90,10 +48,15 @@ async def run_ollama_drone_advisor(update_interval_seconds=3):
         return
 
     action_executor = DroneActionExecutor(drone)
+    rule_engine = SafetyRuleEngine()
+    decision_cache = DecisionCache()
     print("Drone connected. Ready for commands.")
     await drone.action.set_takeoff_altitude(10)
     print( await drone.action.get_takeoff_altitude())
     # Start the human input monitor as a background task
+    global command_source
+    command_source = CommandSource()
+    await command_source.start()
     input_task = asyncio.create_task(human_input_monitor())
 
     try:
@@ -108,6 +71,8 @@ async def run_ollama_drone_advisor(update_interval_seconds=3):
             print(f"  In Air: {telemetry_data.get('in_air', 'N/A')}")
             print(f"  Armed: {telemetry_data.get('armed', 'N/A')}")
             print(f"  Flight Mode: {telemetry_data.get('flight_mode', 'N/A')}")
+            if telemetry_data.get("stale_topics"):
+                print(f"  Stale Topics: {', '.join(telemetry_data['stale_topics'])}")
             print(f"  Current Action Executor State: {action_executor.current_action}")
             position = telemetry_data.get("position", {})
             print(f"  Latitude: {position.get('latitude_deg', 'N/A')}")
@@ -115,7 +80,14 @@ async def run_ollama_drone_advisor(update_interval_seconds=3):
             print(f"  Altitude: {position.get('relative_altitude_m', 'N/A')} m")
 
             # 2. Send current human command and telemetry to Ollama for Reasoning
-            llm_action_request = await get_ollama_action(last_human_command, telemetry_data)
+            # Hard safety rules are checked locally first; Ollama is only asked when none fires
+            # and no decision is cached for this command and (quantized) telemetry
+            llm_action_request = rule_engine.evaluate(telemetry_data)
+            if llm_action_request is None:
+                llm_action_request = decision_cache.get(last_human_command, telemetry_data)
+            if llm_action_request is None:
+                llm_action_request = await get_ollama_action(last_human_command, telemetry_data)
+                decision_cache.put(last_human_command, telemetry_data, llm_action_request)
             
             # 3. Display Ollama's Suggested Action
             print(f"\nOllama's Suggested Action for {last_human_command}:")
@@ -165,7 +137,7 @@ async def run_ollama_drone_advisor(update_interval_seconds=3):
                 else:
                     print(f"Skipping land: Not armed or not in air.")
 
-            elif action_type == "RTL":
+            elif action_type == "rtl":
                 if telemetry_data.get("armed") == True and telemetry_data.get("in_air") == True and telemetry_data.get("health", {}).get("home_position_ok", False):
                     await action_executor.rtl_drone()
                 else:
@@ -189,6 +161,9 @@ async def run_ollama_drone_advisor(update_interval_seconds=3):
     except Exception as e:
         print(f"An unhandled error occurred: {e}")
     finally:
+        await close_ollama_client()
+        print(f"Safety rule engine: {rule_engine.stats()}")
+        print(f"Decision cache: {decision_cache.stats()}")
         # Graceful shutdown: cancel the input task first
         if input_task:
             input_task.cancel()
@@ -196,6 +171,7 @@ async def run_ollama_drone_advisor(update_interval_seconds=3):
                 await input_task # Await to ensure cancellation propagates
             except asyncio.CancelledError:
                 pass # Expected during graceful shutdown
+        await command_source.stop()
 
         # Then handle drone cleanup
         if drone:
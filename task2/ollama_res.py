@@ -1,22 +1,199 @@
 # ollama_advisor.py
 import json
+import re
 import httpx
 import asyncio
+import time
+from collections import deque
+
+from prompt_encoding import TELEMETRY_FIELDS, encode_telemetry, telemetry_legend
 
 # Configuration for Ollama
 OLLAMA_HOST = "http://localhost:11434"
 OLLAMA_MODEL = "llama3.2:1b" 
-
-async def get_ollama_action(human_command: str, telemetry_data: dict):
-    prompt_content ={
-        "prompt1" :  f"""
+OLLAMA_PROMPT_VARIANT = "prompt3" # key into PROMPT_TEMPLATES
+OLLAMA_TELEMETRY_ENCODING = "compact" # "compact" (short keys, only the fields a prompt uses) or "json"
+OLLAMA_STREAM = True # parse the action while tokens arrive and stop early
+OLLAMA_KEEP_ALIVE = "30m" # keep the model resident between ticks
+OLLAMA_LOG_TIMINGS = True # print per-call prompt_eval_count / durations
+OLLAMA_CALL_LOG_SIZE = 200
+OLLAMA_TIMEOUT_S = 60.0
+
+# Shared HTTP client: one keep-alive connection pool for every Ollama call
+OLLAMA_MAX_CONNECTIONS = 4
+OLLAMA_MAX_KEEPALIVE_CONNECTIONS = 2
+OLLAMA_KEEPALIVE_EXPIRY_S = 60.0
+
+try:
+    import h2 # noqa: F401 (enables httpx HTTP/2 when the server offers it)
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+_ollama_client = None
+
+def new_ollama_client(max_connections=OLLAMA_MAX_CONNECTIONS,
+                      max_keepalive_connections=OLLAMA_MAX_KEEPALIVE_CONNECTIONS) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=OLLAMA_HOST,
+        timeout=OLLAMA_TIMEOUT_S,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY_S
+        ),
+        http2=_HTTP2_AVAILABLE
+    )
+
+def get_ollama_client() -> httpx.AsyncClient:
+    global _ollama_client
+    if _ollama_client is None or _ollama_client.is_closed:
+        _ollama_client = new_ollama_client()
+    return _ollama_client
+
+async def close_ollama_client():
+    global _ollama_client
+    if _ollama_client is not None:
+        await _ollama_client.aclose()
+        _ollama_client = None
+
+
+class IncrementalJSONObjectParser:
+    """
+    Scans streamed text and returns the first complete top-level JSON object as
+    soon as its closing brace arrives. Text outside the object (markdown fences,
+    trailing whitespace) is ignored.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str):
+        self.text += chunk
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = self._depth > 0
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._pos = i + 1
+                    return json.loads(text[self._start:i + 1])
+        self._pos = len(text)
+        return None
+
+
+# Timing fields Ollama reports with a finished response (durations in nanoseconds)
+OLLAMA_TIMING_FIELDS = ("total_duration", "load_duration", "prompt_eval_count",
+                        "prompt_eval_duration", "eval_count", "eval_duration")
+
+def _copy_ollama_timings(body: dict, call_stats: dict):
+    for field in OLLAMA_TIMING_FIELDS:
+        if field in body:
+            call_stats[field] = body[field]
+
+async def _generate_json(client: httpx.AsyncClient, payload: dict, call_stats: dict = None):
+    """
+    Runs /api/generate and returns the parsed JSON object. In streaming mode the
+    object is returned as soon as it is complete and the response is closed,
+    which makes Ollama stop generating the remaining tokens.
+
+    call_stats, if given, receives the wall-clock time to the first token and to
+    the parsed object, the time spent parsing, plus Ollama's own timing fields when
+    the generation ran to completion (a stream cancelled early never receives them).
+    """
+    call_stats = call_stats if call_stats is not None else {}
+    started = time.perf_counter()
+    if not payload.get("stream"):
+        response = await client.post("/api/generate", json=payload)
+        response.raise_for_status()
+        body = response.json()
+        call_stats["http_ms"] = (time.perf_counter() - started) * 1000
+        _copy_ollama_timings(body, call_stats)
+        raw_text = body.get("response", "").strip()
+        parse_started = time.perf_counter()
+        # Clean up potential markdown fences
+        parsed_json = json.loads(raw_text.replace("```json", "").replace("```", "").strip())
+        call_stats["parse_ms"] = (time.perf_counter() - parse_started) * 1000
+        return parsed_json
+
+    parser = IncrementalJSONObjectParser()
+    async with client.stream("POST", "/api/generate", json=payload) as response:
+        if response.is_error:
+            await response.aread()
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if "error" in chunk:
+                raise RuntimeError(f"Ollama stream error: {chunk['error']}")
+            if "first_token_ms" not in call_stats:
+                call_stats["first_token_ms"] = (time.perf_counter() - started) * 1000
+            if chunk.get("done"):
+                _copy_ollama_timings(chunk, call_stats)
+            parse_started = time.perf_counter()
+            parsed_json = parser.feed(chunk.get("response", ""))
+            call_stats["parse_ms"] = call_stats.get("parse_ms", 0.0) + (time.perf_counter() - parse_started) * 1000
+            if parsed_json is not None:
+                call_stats["http_ms"] = (time.perf_counter() - started) * 1000
+                call_stats["early_exit"] = not chunk.get("done", False)
+                return parsed_json
+            if chunk.get("done"):
+                break
+    call_stats["http_ms"] = (time.perf_counter() - started) * 1000
+    # The stream ended without a complete object; let json report why.
+    return json.loads(parser.text.strip())
+
+def format_call_stats(call_stats: dict):
+    parts = [f"{call_stats.get('model', '?')}", f"http={call_stats.get('http_ms', 0):.0f}ms"]
+    if "first_token_ms" in call_stats:
+        parts.append(f"first_token={call_stats['first_token_ms']:.0f}ms")
+    if "prompt_eval_count" in call_stats:
+        parts.append(f"prompt_eval_count={call_stats['prompt_eval_count']}")
+        parts.append(f"prompt_eval={call_stats.get('prompt_eval_duration', 0) / 1e6:.0f}ms")
+        parts.append(f"eval_count={call_stats.get('eval_count', 0)}")
+        parts.append(f"total={call_stats.get('total_duration', 0) / 1e6:.0f}ms")
+    elif call_stats.get("early_exit"):
+        parts.append("early_exit (no Ollama counters)")
+    return " ".join(parts)
+
+
+# Stats of the most recent Ollama calls, newest last
+OLLAMA_CALL_LOG = deque(maxlen=OLLAMA_CALL_LOG_SIZE)
+
+def _record_call(call_stats: dict):
+    OLLAMA_CALL_LOG.append(call_stats)
+    if OLLAMA_LOG_TIMINGS:
+        print(f"[Ollama timings] {format_call_stats(call_stats)}")
+
+
+# Prompt variants. These are sent as the system prompt and never change between
+# calls, so Ollama can reuse their KV cache; {legend} is the only slot, filled once
+# at import. Literal braces are doubled as in str.format.
+PROMPT_TEMPLATES = {
+    "prompt1" : """
     You are an AI drone mission planner and safety monitor. Your primary goal is to respond to user commands
     and maintain drone safety, providing structured MAVSDK-compatible actions.
 
-    The drone's current telemetry is:
-    {json.dumps(telemetry_data, indent=2)}
-
-    The human command is: "{human_command}"
+    Each request gives you the drone's current telemetry{legend} and the human command.
 
     Based on the human command and current telemetry, you must output a single JSON object.
     This JSON object should represent the next logical action the drone should take or a critical safety directive.
@@ -29,7 +206,7 @@ async def get_ollama_action(human_command: str, telemetry_data: dict):
 
     2.  **Goto Location:**
         {{ "action": "goto", "latitude_deg": <float>, "longitude_deg": <float>, "altitude_m": <float> }}
-        (Only if drone is armed and in air, and global_position_ok is True)
+        (Only if drone is armed and in air, and health.global_position_ok is True)
 
     3.  **Land:**
         {{ "action": "land" }}
@@ -37,7 +214,7 @@ async def get_ollama_action(human_command: str, telemetry_data: dict):
 
     4.  **Return to Launch (RTL):**
         {{ "action": "rtl" }}
-        (Only if drone is armed and in air, and home_position_ok is True)
+        (Only if drone is armed and in air, and health.home_position_ok is True)
 
     5.  **Arm:**
         {{ "action": "arm" }}
@@ -56,9 +233,9 @@ async def get_ollama_action(human_command: str, telemetry_data: dict):
         (Use this for unrecoverable errors or when human input is absolutely required)
 
     Consider these safety and operational rules:
-    - If battery remaining is below 15% AND drone is in_air, suggest 'rtl' if home_position_ok, else 'land'.
-    - If GPS fix type is 0 (No Fix) AND drone is in_air, suggest 'land'.
-    - If GPS fix type is 1 (No GPS) AND drone is in_air, suggest 'land'.
+    - If battery.remaining_percent is below 15 AND drone is in_air, suggest 'rtl' if health.home_position_ok, else 'land'.
+    - If gps_info.fix_type is 0 (No Fix) AND drone is in_air, suggest 'land'.
+    - If gps_info.fix_type is 1 (No GPS) AND drone is in_air, suggest 'land'.
     - If health.armable is False AND drone is not armed and not in_air, suggest 'error' with message 'Pre-arm checks failed'.
     - If drone is not armed and not in_air, and the human command implies flight, suggest 'arm' then 'takeoff'.
     - Always prioritize safety actions (land, rtl) if conditions are critical.
@@ -67,16 +244,11 @@ async def get_ollama_action(human_command: str, telemetry_data: dict):
     """ ,
 
 
-    "prompt2" : f"""
+    "prompt2" : """
 You are an **AI drone mission controller and safety guardian**. Your sole purpose is to process the drone's current state and a human command, then issue the single, safest, and most logical drone action in **MAVSDK-compatible JSON format**.
 
 ---
-**Current Drone Telemetry:**
-{json.dumps(telemetry_data, indent=2)}
-
----
-**Human Command:**
-"{human_command}"
+Each request gives you the **Current Drone Telemetry**{legend} and the **Human Command**.
 
 ---
 **Strict Operational Rules (Evaluate in Order of Priority):**
@@ -93,7 +265,7 @@ You are an **AI drone mission controller and safety guardian**. Your sole purpos
 2.  **Human Command Fulfillment & State Management:**
     * **Arming for Flight:** If the `human_command` clearly implies flight (e.g., "take off", "fly", "go to", "start mission") AND `telemetry_data.armed` is False AND `telemetry_data.in_air` is False AND `telemetry_data.health.armable` is True:
         * Command: `{{ "action": "arm" }}` (The LLM will then be prompted again with the new state, where it can then trigger takeoff).
-    * **Takeoff:** If `human_command` is "take off" or similar, AND `telemetry_data.armed` is True AND `telemetry_data.in_air` is False AND `telemetry_data.on_ground` is True:
+    * **Takeoff:** If `human_command` is "take off" or similar, AND `telemetry_data.armed` is True AND `telemetry_data.in_air` is False:
         * Command: `{{ "action": "takeoff", "altitude_m": <float, default 3.0> }}` (Choose a reasonable default if not specified in command, e.g., 3m)
     * **Go to Location:** If `human_command` includes a target location (e.g., "go to 12.34, 67.89 at 10m", "fly to building X") AND `telemetry_data.armed` is True AND `telemetry_data.in_air` is True AND `telemetry_data.health.global_position_ok` is True:
         * Command: `{{ "action": "goto", "latitude_deg": <float>, "longitude_deg": <float>, "altitude_m": <float> }}` (Extract coordinates and altitude from command)
@@ -128,18 +300,15 @@ You are an **AI drone mission controller and safety guardian**. Your sole purpos
 
 **Think Step-by-Step:**
 1.  First, analyze the `telemetry_data` and apply **CRITICAL SAFETY FIRST** rules. If any safety rule is triggered, immediately output the corresponding JSON and stop.
-2.  If no critical safety rule is triggered, then evaluate the `human_command` in conjunction with `telemetry_data` to determine the most logical action, following the **Human Command Fulfillment & State Management** rules. Consider the drone's current state (armed, in_air, on_ground) before suggesting an action.
+2.  If no critical safety rule is triggered, then evaluate the `human_command` in conjunction with `telemetry_data` to determine the most logical action, following the **Human Command Fulfillment & State Management** rules. Consider the drone's current state (armed, in_air) before suggesting an action.
 3.  If no specific human command action can be performed or understood, resort to the **Default/Fallback Actions**.
 
    """,
 
-   "prompt3" : f"""
+    "prompt3" : """
 You are an AI drone controller. Based on the drone's current telemetry and the human command, output a single MAVSDK-compatible JSON action.
 
-**Current Telemetry:**
-{json.dumps(telemetry_data, indent=2)}
-
-**Human Command:** "{human_command}"
+Each request gives you the **Current Telemetry**{legend} and the **Human Command**.
 
 **Response MUST be ONLY a single JSON object, with one of these exact formats:**
 * `{{"action": "takeoff", "altitude_m": <float>}}`
@@ -156,32 +325,104 @@ You are an AI drone controller. Based on the drone's current telemetry and the h
 - If a command requires multiple steps (e.g., "take off" when disarmed), suggest the immediate next step (e.g., "arm").
 - If command is unclear or unexecutable, use "hold" or "error".
 """ ,
-
-
-    }
-
+}
+
+
+# Telemetry fields each variant's instructions refer to (compact encoding only), and how
+# the instructions write field names; the legend spells every key out the same way
+_SAFETY_FIELDS = ("lat", "lon", "alt", "bat", "fix", "air", "arm", "mode", "gpos", "home", "armable", "stale")
+PROMPT_FIELDS = {
+    "prompt1": _SAFETY_FIELDS,
+    "prompt2": _SAFETY_FIELDS,
+    "prompt3": ("lat", "lon", "alt", "bat", "fix", "sats", "air", "arm", "mode", "home", "stale"),
+}
+PROMPT_FIELD_PREFIXES = {
+    "prompt2": "telemetry_data.",
+}
+TELEMETRY_ENCODINGS = ("compact", "json")
+
+
+# Per-call part of every request: only these tokens change from tick to tick
+USER_PROMPT_TEMPLATE = """Current Telemetry: {telemetry}
+Human Command: "{human_command}"
+"""
+
+
+class PromptTemplate:
+    """
+    Pre-renders the static text of a template once, so that building a prompt
+    only joins the pieces around the filled-in slots.
+    """
+
+    _SLOT_MARKER = re.compile(r"\x00(\w+)\x00")
+
+    def __init__(self, template: str):
+        marked = template.format(telemetry="\x00telemetry\x00", human_command="\x00human_command\x00")
+        pieces = self._SLOT_MARKER.split(marked)
+        self.static_parts = pieces[0::2]
+        self.slots = pieces[1::2]
+
+    def render(self, **values):
+        parts = [self.static_parts[0]]
+        for slot, static_text in zip(self.slots, self.static_parts[1:]):
+            parts.append(values[slot])
+            parts.append(static_text)
+        return "".join(parts)
+
+
+def _legend_for(variant: str, encoding: str):
+    if encoding != "compact":
+        return ""
+    legend = telemetry_legend(PROMPT_FIELDS.get(variant, TELEMETRY_FIELDS), PROMPT_FIELD_PREFIXES.get(variant, ""))
+    return f" (keys: {legend})"
+
+SYSTEM_PROMPTS = {
+    (name, encoding): template.format(legend=_legend_for(name, encoding))
+    for name, template in PROMPT_TEMPLATES.items()
+    for encoding in TELEMETRY_ENCODINGS
+}
+USER_PROMPT = PromptTemplate(USER_PROMPT_TEMPLATE)
+
+def encode_prompt_telemetry(telemetry_data: dict, variant: str = None, encoding: str = None):
+    variant = variant or OLLAMA_PROMPT_VARIANT
+    if (encoding or OLLAMA_TELEMETRY_ENCODING) == "compact":
+        return encode_telemetry(telemetry_data, PROMPT_FIELDS.get(variant))
+    return json.dumps(telemetry_data, separators=(",", ":"))
+
+def build_prompt(human_command: str, telemetry_data: dict, variant: str = None, encoding: str = None):
+    """
+    Returns (system, prompt): the byte-stable instructions for the chosen variant
+    and the short per-call message carrying telemetry and the human command.
+    """
+    variant = variant or OLLAMA_PROMPT_VARIANT
+    encoding = encoding or OLLAMA_TELEMETRY_ENCODING
+    telemetry = encode_prompt_telemetry(telemetry_data, variant, encoding)
+    prompt = USER_PROMPT.render(telemetry=telemetry, human_command=str(human_command))
+    return SYSTEM_PROMPTS[(variant, encoding)], prompt
+
+
+async def get_ollama_action(human_command: str, telemetry_data: dict, client: httpx.AsyncClient = None,
+                            call_stats: dict = None):
+    call_stats = call_stats if call_stats is not None else {}
+    call_stats["model"] = OLLAMA_MODEL
+    build_started = time.perf_counter()
+    system_prompt, prompt = build_prompt(human_command, telemetry_data)
+    call_stats["prompt_build_ms"] = (time.perf_counter() - build_started) * 1000
     payload = {
         "model": OLLAMA_MODEL,
-        "prompt": prompt_content['prompt3'],
-        "stream": False,
-        "format": "json" 
+        "system": system_prompt,
+        "prompt": prompt,
+        "stream": OLLAMA_STREAM,
+        "format": "json",
+        "keep_alive": OLLAMA_KEEP_ALIVE
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{OLLAMA_HOST}/api/generate", json=payload, timeout=60.0) # Increased timeout
-            response.raise_for_status()
-            
-            raw_text = response.json().get("response", "").strip()
-            
-            # Attempt to parse the raw text as JSON, cleaning up potential markdown fences
-            clean_text = raw_text.replace("```json", "").replace("```", "").strip()
-            parsed_json = json.loads(clean_text)
-            return parsed_json
+        return await _generate_json(client or get_ollama_client(), payload, call_stats)
 
     except json.JSONDecodeError as e:
         print(f"JSON parsing error from Ollama: {e}")
-        print(f"Ollama Raw Text (for debugging):\n{raw_text}")
+        print(f"Ollama Raw Text (for debugging):\n{e.doc}")
         return {"action": "error", "message": f"LLM response not valid JSON: {e}"}
     except httpx.RequestError as e:
         print(f"Ollama connection error: {e}")
@@ -192,6 +433,8 @@ You are an AI drone controller. Based on the drone's current telemetry and the h
     except Exception as e:
         print(f"An unexpected error occurred with Ollama: {e}")
         return {"action": "error", "message": f"Unexpected LLM issue: {e}"}
+    finally:
+        _record_call(call_stats)
 
 
 
@@ -227,10 +470,13 @@ async def main_ollama_test():
         }
     ]
     
-    for t in testcases:
-        print(f"Testing Ollama {t['test_type']}:")
-        llm_output = await get_ollama_action(t['human_response'], t['telemetry'])
-        print(json.dumps(llm_output, indent=2))
+    try:
+        for t in testcases:
+            print(f"Testing Ollama {t['test_type']}:")
+            llm_output = await get_ollama_action(t['human_response'], t['telemetry'])
+            print(json.dumps(llm_output, indent=2))
+    finally:
+        await close_ollama_client()
     
     
     
@@ -0,0 +1,122 @@
+# pipeline.py
+import asyncio
+import json
+import time
+
+# Action fields that only explain a decision; two decisions differing only in these do the same thing
+_EXPLANATION_FIELDS = ("reason", "message", "rule")
+
+
+class LatestValue:
+    """
+    Bounded (single-slot) queue between two pipeline stages. put() never blocks
+    and overwrites a value the consumer has not taken yet, so a slow consumer
+    always works on the freshest value instead of draining a backlog.
+    """
+
+    def __init__(self):
+        self.value = None
+        self.version = 0        # incremented on every put()
+        self.put_at = None      # time.monotonic() of the last put()
+        self.dropped = 0        # values overwritten before anyone took them
+        self._taken_version = 0
+        self._changed = asyncio.Event()
+
+    def put(self, value):
+        if self.version > self._taken_version:
+            self.dropped += 1
+        self.value = value
+        self.version += 1
+        self.put_at = time.monotonic()
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def peek(self):
+        return self.value
+
+    async def get(self, newer_than=None, timeout=None):
+        """
+        Waits for a value newer than version `newer_than` (by default, newer than
+        the last one taken) and returns (version, value).
+        Raises asyncio.TimeoutError if none arrives within `timeout`.
+        """
+        newer_than = self._taken_version if newer_than is None else newer_than
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.version <= newer_than:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            await asyncio.wait_for(self._changed.wait(), remaining)
+        self._taken_version = max(self._taken_version, self.version)
+        return self.version, self.value
+
+    def stats(self):
+        return {"puts": self.version, "dropped": self.dropped}
+
+
+class CommandGenerations:
+    """
+    The current human command plus a generation id that is bumped by every new
+    command. Work started for an older generation is stale: run_current()
+    cancels it as soon as a newer command arrives.
+    """
+
+    def __init__(self, command):
+        self.command = command
+        self.generation = 0
+        self.cancelled = 0 # requests cancelled because a newer command arrived
+        self.dropped = 0   # decisions dropped because they were planned for an older command
+        self._changed = asyncio.Event()
+
+    def update(self, command):
+        self.command = command
+        self.generation += 1
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def current(self):
+        return self.generation, self.command
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    async def wait_newer(self, generation):
+        while self.generation <= generation:
+            await self._changed.wait()
+
+    async def run_current(self, generation, coro):
+        """
+        Runs `coro` for command `generation`. Returns (True, result), or
+        (False, None) if a newer command arrived first and the run was cancelled.
+        """
+        task = asyncio.ensure_future(coro)
+        newer = asyncio.ensure_future(self.wait_newer(generation))
+        try:
+            await asyncio.wait((task, newer), return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            newer.cancel()
+        if task.done():
+            return True, task.result()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        self.cancelled += 1
+        return False, None
+
+    def stats(self):
+        return {"generation": self.generation, "cancelled": self.cancelled, "dropped": self.dropped}
+
+
+def vehicle_state(telemetry_data: dict):
+    """
+    The part of a snapshot a decision's preconditions depend on. A decision
+    planned on a different vehicle state than the current one is stale.
+    """
+    return (telemetry_data.get("armed"), telemetry_data.get("in_air"), telemetry_data.get("flight_mode"))
+
+def action_key(action: dict):
+    return json.dumps({k: v for k, v in action.items() if k not in _EXPLANATION_FIELDS}, sort_keys=True)
+
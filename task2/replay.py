@@ -0,0 +1,358 @@
+# replay.py
+"""
+Replays recorded telemetry logs (telemetry_recorder.py) through the advisor
+pipeline of main.py, faster than real time and without PX4.
+
+Every flight runs on its own VirtualTimeEventLoop: whenever nothing is ready to
+run, the clock jumps straight to the next timer, so asyncio.sleep(), wait_for()
+timeouts, time.time() and time.monotonic() all follow the recording instead of
+the wall clock. time.perf_counter() is left alone, so tick stage timings still
+measure real compute.
+
+    python replay.py telemetry_logs/ --command "0:Take off to 10m" --command "45:Land"
+    python replay.py telemetry_logs/ --decide ollama   # LLM calls are charged in real time
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import selectors
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+from mavsdk.telemetry import FlightMode
+
+import main as advisor
+from ollama_res import get_ollama_action
+from telemetry import TELEMETRY_TOPICS, TelemetryCache, register_telemetry_cache, stop_telemetry_cache
+from telemetry_recorder import LOG_SUFFIX, log_segments, read_logs
+from tick_timing import TickTimer, percentile
+
+REPLAY_STATIC_ACTION = {"action": "hold", "reason": "Replayed flight, static decision."}
+REPLAY_TAIL_S = 1.0         # virtual seconds the advisor keeps running after the last record
+REPLAY_STREAM_POLL_S = 1.0  # how often replayed telemetry streams check whether the replay ended
+REPLAY_TICK_CAPACITY = 100000
+
+_TOPIC_BY_STREAM = {stream_name: topic for topic, (stream_name, _) in TELEMETRY_TOPICS.items()}
+
+
+class _VirtualTimeSelector(selectors.DefaultSelector):
+    """Polls instead of sleeping, and moves the loop's clock by the time it would have slept."""
+
+    def __init__(self, loop):
+        super().__init__()
+        self._loop = loop
+
+    def select(self, timeout=None):
+        loop = self._loop
+        if loop.real_time_users:
+            started = time.perf_counter()
+            events = super().select(timeout)
+            loop.advance(time.perf_counter() - started)
+            return events
+        events = super().select(0)
+        if not events:
+            if timeout is None:
+                # No timer pending: only a socket or another thread can wake us
+                events = super().select(None)
+            elif timeout > 0:
+                loop.advance(timeout)
+        return events
+
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop whose time() only moves when the loop would otherwise sleep.
+    Inside `with loop.real_time():` it waits for I/O for real and advances by
+    the real time spent, so e.g. a live Ollama call costs its true latency.
+    """
+
+    def __init__(self, start=0.0):
+        self._now = start
+        self.real_time_users = 0
+        super().__init__(_VirtualTimeSelector(self))
+
+    def time(self):
+        return self._now
+
+    def advance(self, seconds):
+        self._now += seconds
+
+    @contextlib.contextmanager
+    def real_time(self):
+        self.real_time_users += 1
+        try:
+            yield
+        finally:
+            self.real_time_users -= 1
+
+
+def _stream_value(topic, value):
+    # Cached values are already converted; give the action code back attribute access
+    if isinstance(value, dict):
+        return SimpleNamespace(**value)
+    if topic == "flight_mode":
+        return FlightMode[value] if value in FlightMode.__members__ else value
+    return value
+
+
+class _ReplayTelemetry:
+    def __init__(self, drone):
+        self._drone = drone
+
+    def __getattr__(self, stream_name):
+        topic = _TOPIC_BY_STREAM.get(stream_name)
+        if topic is None:
+            raise AttributeError(stream_name)
+        return lambda: self._drone._stream(topic)
+
+
+class _ReplayAction:
+    def __init__(self, drone):
+        self._drone = drone
+
+    def __getattr__(self, name):
+        async def command(*args):
+            self._drone.actions.append((time.time(), name, args))
+        return command
+
+
+class ReplayDrone:
+    """
+    Stands in for a mavsdk.System during a replay. Telemetry streams follow the
+    replayed cache and end when the replay does; action commands are only
+    recorded (virtual time.time(), name, args), the vehicle keeps doing what
+    the recording says.
+    """
+
+    def __init__(self):
+        self.cache = TelemetryCache(self)
+        self.telemetry = _ReplayTelemetry(self)
+        self.action = _ReplayAction(self)
+        self.actions = []
+        self.finished = False
+        register_telemetry_cache(self, self.cache)
+
+    async def _stream(self, topic):
+        cache = self.cache
+        last_update = None
+        while not self.finished:
+            received_at = cache.received_at.get(topic)
+            if received_at is not None and received_at != last_update:
+                last_update = received_at
+                yield _stream_value(topic, cache.latest[topic])
+            else:
+                await cache.wait_for_update(REPLAY_STREAM_POLL_S)
+
+
+class ScriptedCommandSource:
+    """CommandSource stand-in that delivers (seconds after start, command) pairs."""
+
+    def __init__(self, commands=()):
+        self.commands = sorted(commands, key=lambda command: command[0])
+        self.queue = asyncio.Queue()
+        self.received = 0
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._play())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def get(self):
+        return await self.queue.get()
+
+    async def _play(self):
+        started = time.monotonic()
+        for offset_s, command in self.commands:
+            await asyncio.sleep(max(0.0, started + offset_s - time.monotonic()))
+            self.received += 1
+            self.queue.put_nowait(command)
+
+
+def static_decider(latency_s=0.0, action=REPLAY_STATIC_ACTION):
+    """Returns an instant (or `latency_s` virtual seconds) stand-in for get_ollama_action()."""
+    async def decide(human_command, telemetry_data, call_stats=None):
+        if latency_s:
+            await asyncio.sleep(latency_s)
+        return dict(action)
+    return decide
+
+async def ollama_decider(human_command, telemetry_data, call_stats=None):
+    # The HTTP round trip has to happen in real time, or the replay would race ahead of it
+    with asyncio.get_running_loop().real_time():
+        return await get_ollama_action(human_command, telemetry_data, call_stats=call_stats)
+
+
+async def _feed(drone, records):
+    # Each record is applied when the virtual clock reaches its receive time
+    count = 0
+    for received_at, topic, value in records:
+        delay = received_at - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        drone.cache.update(topic, value, received_at)
+        count += 1
+    return count
+
+async def _replay(records, decide, commands, tail_s):
+    drone = ReplayDrone()
+    tick_timer = TickTimer(capacity=REPLAY_TICK_CAPACITY)
+    advisor_task = asyncio.create_task(advisor.run_ollama_drone_advisor(
+        drone=drone, decide=decide, command_source=ScriptedCommandSource(commands),
+        tick_timer=tick_timer, telemetry_log_dir=None))
+    started = time.time()
+    record_count = await _feed(drone, records)
+    await asyncio.sleep(tail_s)
+    drone.finished = True
+    advisor_task.cancel()
+    try:
+        await advisor_task
+    except asyncio.CancelledError:
+        pass
+    await stop_telemetry_cache(drone)
+    return drone, tick_timer, record_count, time.time() - started
+
+def _cancel_remaining_tasks(loop):
+    tasks = asyncio.all_tasks(loop)
+    for task in tasks:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+def replay_flight(segments, decide=None, commands=(), tail_s=REPLAY_TAIL_S, verbose=False):
+    """
+    Replays one recording (its segment files, in order) through the advisor and
+    returns a report dict, or None if the recording holds no records.
+    """
+    records = read_logs(segments)
+    first = next(records, None)
+    if first is None:
+        return None
+    decide = decide or static_decider()
+
+    def all_records():
+        yield first
+        yield from records
+
+    loop = VirtualTimeEventLoop()
+    real_time, real_monotonic = time.time, time.monotonic
+    offset = first[0] - loop.time()
+    time.time = lambda: offset + loop.time()
+    time.monotonic = loop.time
+    wall_started = time.perf_counter()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with output:
+            asyncio.set_event_loop(loop)
+            try:
+                drone, tick_timer, record_count, virtual_s = loop.run_until_complete(
+                    _replay(all_records(), decide, commands, tail_s))
+            finally:
+                _cancel_remaining_tasks(loop)
+                loop.run_until_complete(loop.shutdown_asyncgens())
+                loop.close()
+                asyncio.set_event_loop(None)
+    finally:
+        time.time, time.monotonic = real_time, real_monotonic
+    wall_s = time.perf_counter() - wall_started
+
+    ticks = list(tick_timer.ticks)
+    decisions = [tick for tick in ticks if tick.get("source") != "llm_cancelled"]
+    tick_ms = sorted(tick["total_ms"] for tick in ticks)
+    return {
+        "flight": os.path.basename(segments[0]).rsplit("-", 1)[0],
+        "records": record_count,
+        "virtual_s": round(virtual_s, 3),
+        "wall_s": round(wall_s, 3),
+        "speedup": round(virtual_s / wall_s, 1) if wall_s else 0.0,
+        "ticks": len(ticks),
+        "decisions": len(decisions),
+        "decisions_per_s": round(len(decisions) / virtual_s, 3) if virtual_s else 0.0,
+        "tick_p50_ms": round(percentile(tick_ms, 0.50), 3),
+        "tick_p95_ms": round(percentile(tick_ms, 0.95), 3),
+        "sources": dict(Counter(tick.get("source") for tick in ticks)),
+        "decided_actions": dict(Counter(tick.get("action") for tick in decisions)),
+        "drone_commands": dict(Counter(name for _, name, _ in drone.actions)),
+    }
+
+
+def find_flights(paths):
+    """Groups the segment files under `paths` by recording: {recording prefix: [segments]}."""
+    segments = []
+    for path in paths:
+        if os.path.isdir(path):
+            segments.extend(log_segments(path, prefix="*"))
+        else:
+            segments.append(path)
+    flights = {}
+    for segment in sorted(set(segments)):
+        if segment.endswith(LOG_SUFFIX):
+            prefix = segment[:-len(LOG_SUFFIX)].rsplit("-", 1)[0]
+            flights.setdefault(prefix, []).append(segment)
+    return flights
+
+def aggregate(reports):
+    virtual_s = sum(report["virtual_s"] for report in reports)
+    wall_s = sum(report["wall_s"] for report in reports)
+    decisions = sum(report["decisions"] for report in reports)
+    sources = Counter()
+    for report in reports:
+        sources.update(report["sources"])
+    return {
+        "flights": len(reports),
+        "records": sum(report["records"] for report in reports),
+        "virtual_s": round(virtual_s, 3),
+        "wall_s": round(wall_s, 3),
+        "speedup": round(virtual_s / wall_s, 1) if wall_s else 0.0,
+        "decisions": decisions,
+        "decisions_per_s": round(decisions / virtual_s, 3) if virtual_s else 0.0,
+        "sources": dict(sources),
+    }
+
+def format_report(report):
+    return (f"{report.get('flight', 'total'):<40} {report['virtual_s']:>9.1f}s virtual {report['wall_s']:>7.2f}s wall "
+            f"x{report['speedup']:<7} {report['decisions']:>6} decisions ({report['decisions_per_s']:.2f}/s) "
+            f"{report['sources']}")
+
+
+def _parse_command(text):
+    offset_s, _, command = text.partition(":")
+    return float(offset_s), command.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="log segments or directories")
+    parser.add_argument("--decide", choices=("static", "ollama"), default="static",
+                        help="static: instant hold decisions; ollama: real get_ollama_action calls")
+    parser.add_argument("--latency", type=float, default=0.0, help="virtual seconds per static decision")
+    parser.add_argument("--command", action="append", default=[], type=_parse_command,
+                        metavar="SECONDS:COMMAND", help="human command sent that many seconds into each flight")
+    parser.add_argument("--json", help="write every flight report plus the total to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the advisor's own output")
+    args = parser.parse_args()
+
+    decide = ollama_decider if args.decide == "ollama" else static_decider(args.latency)
+    reports = []
+    for prefix, segments in find_flights(args.paths).items():
+        report = replay_flight(segments, decide=decide, commands=args.command, verbose=args.verbose)
+        if report is not None:
+            reports.append(report)
+            print(format_report(report))
+    if not reports:
+        print("No telemetry logs found.")
+        return
+    total = aggregate(reports)
+    print(format_report(total))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"flights": reports, "total": total}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# safety_rules.py
+from collections import Counter
+
+# Thresholds from the safety rules in the Ollama prompts
+LOW_BATTERY_PERCENT = 15
+NO_GPS_FIX_TYPES = (0, 1) # 0: No Fix, 1: No GPS
+
+PRE_ARM_FAILED_MESSAGE = "Pre-arm checks failed. Cannot arm drone. Human intervention required."
+
+
+def _extract_facts(telemetry_data: dict):
+    """
+    Pulls the handful of values the rules look at out of a telemetry snapshot.
+    Missing values stay None so that no rule fires on data we do not have.
+    """
+    battery = telemetry_data.get("battery") or {}
+    gps_info = telemetry_data.get("gps_info") or {}
+    health = telemetry_data.get("health") or {}
+    return {
+        "armed": telemetry_data.get("armed"),
+        "in_air": telemetry_data.get("in_air"),
+        "battery_percent": battery.get("remaining_percent"),
+        "fix_type": gps_info.get("fix_type"),
+        "home_position_ok": health.get("home_position_ok"),
+        "armable": health.get("armable"),
+    }
+
+def _flying(f):
+    return f["armed"] is True and f["in_air"] is True
+
+def _low_battery(f):
+    return f["battery_percent"] is not None and f["battery_percent"] < LOW_BATTERY_PERCENT
+
+
+# Rule table, evaluated in order; the first rule whose condition holds wins.
+# (name, condition over the extracted facts, action returned instead of asking the LLM)
+SAFETY_RULES = (
+    ("low_battery_rtl",
+     lambda f: _flying(f) and _low_battery(f) and f["home_position_ok"] is True,
+     {"action": "rtl"}),
+    ("low_battery_land",
+     lambda f: _flying(f) and _low_battery(f),
+     {"action": "land"}),
+    ("gps_lost_land",
+     lambda f: _flying(f) and f["fix_type"] in NO_GPS_FIX_TYPES,
+     {"action": "land"}),
+    ("pre_arm_failed",
+     lambda f: f["armed"] is False and f["in_air"] is False and f["armable"] is False,
+     {"action": "error", "message": PRE_ARM_FAILED_MESSAGE}),
+)
+
+
+class SafetyRuleEngine:
+    """
+    Checks the hard safety rules against a telemetry snapshot before the LLM is
+    consulted. evaluate() returns an action dict when a rule fires, else None.
+    """
+
+    def __init__(self, rules=SAFETY_RULES):
+        # Pre-build the action dicts once; evaluate() only copies them.
+        self._compiled = tuple(
+            (name, condition, dict(action, rule=name)) for name, condition, action in rules
+        )
+        self.hits = Counter({name: 0 for name, _, _ in rules})
+        self.evaluations = 0
+        self.llm_fallthroughs = 0
+
+    def evaluate(self, telemetry_data: dict):
+        self.evaluations += 1
+        facts = _extract_facts(telemetry_data)
+        for name, condition, action in self._compiled:
+            if condition(facts):
+                self.hits[name] += 1
+                return dict(action)
+        self.llm_fallthroughs += 1
+        return None
+
+    def stats(self):
+        return {
+            "evaluations": self.evaluations,
+            "llm_fallthroughs": self.llm_fallthroughs,
+            "rule_hits": dict(self.hits),
+        }
+
@@ -1,89 +1,265 @@
 
 import asyncio
+import time
 from mavsdk import System
 
 
-MAVSDK_CONNECTION_ADDRESS = "udp://:14540" 
+MAVSDK_CONNECTION_ADDRESS = "udp://:14540"
+TELEMETRY_TOPIC_TIMEOUT_S = 1.0 # per-topic budget for a live (uncached) snapshot
+TELEMETRY_MAX_AGE_S = 2.0 # cached values older than this are reported as stale
 
-async def get_drone_telemetry(drone: System):
-    telemetry_data = {}
 
-    #position
-    async for position in drone.telemetry.position():
-        telemetry_data["position"] = {
-            "latitude_deg": position.latitude_deg,
-            "longitude_deg": position.longitude_deg,
-            "relative_altitude_m": position.relative_altitude_m
-        }
-        break # Get current value and break
-
-    #velocity
-    async for velocity_ned in drone.telemetry.velocity_ned():
-        telemetry_data["velocity_ned"] = {
-            "north_m_s": velocity_ned.north_m_s,
-            "east_m_s": velocity_ned.east_m_s,
-            "down_m_s": velocity_ned.down_m_s
-        }
-        break
-
-    #attitude
-    async for attitude_euler in drone.telemetry.attitude_euler():
-        telemetry_data["attitude_euler"] = {
-            "roll_deg": attitude_euler.roll_deg,
-            "pitch_deg": attitude_euler.pitch_deg,
-            "yaw_deg": attitude_euler.yaw_deg
-        }
-        break
-
-    #battery status
-    async for battery in drone.telemetry.battery():
-        telemetry_data["battery"] = {
-            "remaining_percent": int(battery.remaining_percent * 100),
-            "voltage_v": round(battery.voltage_v, 2)
-        }
-        break
-
-    #flight mode
-    async for flight_mode in drone.telemetry.flight_mode():
-        telemetry_data["flight_mode"] = flight_mode.name
-        break
-
-    #GPS info
-    async for gps_info in drone.telemetry.gps_info():
-        telemetry_data["gps_info"] = {
-            "num_satellites": gps_info.num_satellites,
-            "fix_type": gps_info.fix_type.value # 0: No Fix, 1: No GPS, 2: 2D Fix, 3: 3D Fix
-        }
-        break
-
-    
-    
-    async for in_air in drone.telemetry.in_air():
-        telemetry_data["in_air"] = in_air
-        break
-    
-    async for armed in drone.telemetry.armed():
-        telemetry_data["armed"] = armed
-        break
+def _position_to_dict(position):
+    return {
+        "latitude_deg": position.latitude_deg,
+        "longitude_deg": position.longitude_deg,
+        "relative_altitude_m": position.relative_altitude_m
+    }
+
+def _velocity_to_dict(velocity_ned):
+    return {
+        "north_m_s": velocity_ned.north_m_s,
+        "east_m_s": velocity_ned.east_m_s,
+        "down_m_s": velocity_ned.down_m_s
+    }
+
+def _attitude_to_dict(attitude_euler):
+    return {
+        "roll_deg": attitude_euler.roll_deg,
+        "pitch_deg": attitude_euler.pitch_deg,
+        "yaw_deg": attitude_euler.yaw_deg
+    }
+
+def _battery_to_dict(battery):
+    return {
+        "remaining_percent": int(battery.remaining_percent * 100),
+        "voltage_v": round(battery.voltage_v, 2)
+    }
+
+def _gps_info_to_dict(gps_info):
+    return {
+        "num_satellites": gps_info.num_satellites,
+        "fix_type": gps_info.fix_type.value # 0: No Fix, 1: No GPS, 2: 2D Fix, 3: 3D Fix
+    }
+
+def _health_to_dict(health):
+    return {
+        "global_position_ok": health.is_global_position_ok,
+        "home_position_ok": health.is_home_position_ok,
+        "armable": health.is_armable
+    }
+
+
+# topic name in the snapshot -> (MAVSDK telemetry stream, converter)
+TELEMETRY_TOPICS = {
+    "position": ("position", _position_to_dict),
+    "velocity_ned": ("velocity_ned", _velocity_to_dict),
+    "attitude_euler": ("attitude_euler", _attitude_to_dict),
+    "battery": ("battery", _battery_to_dict),
+    "flight_mode": ("flight_mode", lambda flight_mode: flight_mode.name),
+    "gps_info": ("gps_info", _gps_info_to_dict),
+    "in_air": ("in_air", bool),
+    "armed": ("armed", bool),
+    "health": ("health", _health_to_dict),
+}
+
+
+class TelemetryCache:
+    """
+    Keeps the latest value of every telemetry topic, fed by one long-lived
+    MAVSDK subscription per topic. snapshot() never awaits.
+    """
+
+    def __init__(self, drone: System, topics=None):
+        self.drone = drone
+        self.topics = topics if topics is not None else TELEMETRY_TOPICS
+        self.latest = {}       # topic -> converted value
+        self.received_at = {}  # topic -> time.time() of the last update
+        self.updates = 0       # total topic updates received, for wait_for_update()
+        self.listeners = []    # callables(topic, value, received_at) run on every update, e.g. a recorder
+        self._updated = asyncio.Event()
+        self._tasks = []
+
+    def start(self):
+        if self._tasks:
+            return
+        for topic, (stream_name, convert) in self.topics.items():
+            self._tasks.append(asyncio.create_task(self._subscribe(topic, stream_name, convert)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _subscribe(self, topic, stream_name, convert):
+        while True:
+            try:
+                async for item in getattr(self.drone.telemetry, stream_name)():
+                    self.update(topic, convert(item))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Telemetry stream '{topic}' failed: {e}. Resubscribing...")
+            await asyncio.sleep(1)
+
+    def update(self, topic, value, received_at=None):
+        """
+        Stores a converted value. Called for every stream item; a replay or
+        simulator can also feed the cache through it directly.
+        """
+        received_at = time.time() if received_at is None else received_at
+        self.latest[topic] = value
+        self.received_at[topic] = received_at
+        self.updates += 1
+        # Swap in a fresh event before waking waiters, so each waiter
+        # sleeps until the next update after the one it saw
+        updated, self._updated = self._updated, asyncio.Event()
+        updated.set()
+        # A failing listener must not break the subscription or starve the other listeners
+        for listener in self.listeners:
+            try:
+                listener(topic, value, received_at)
+            except Exception as e:
+                print(f"Telemetry listener {getattr(listener, '__qualname__', listener)} failed on '{topic}': {e}")
+
+    def is_ready(self):
+        return all(topic in self.latest for topic in self.topics)
+
+    async def wait_ready(self, timeout=10.0):
+        deadline = time.time() + timeout
+        while not self.is_ready() and time.time() < deadline:
+            await asyncio.sleep(0.05)
+        return self.is_ready()
 
+    async def wait_for_update(self, timeout=None):
+        """
+        Waits until any topic receives a new value. Returns False on timeout.
+        """
+        try:
+            await asyncio.wait_for(self._updated.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def age(self, topic):
+        received_at = self.received_at.get(topic)
+        if received_at is None:
+            return None
+        return time.time() - received_at
+
+    def snapshot(self, max_age_s=TELEMETRY_MAX_AGE_S):
+        # Converted values are rebuilt on every update, so copying the top level is
+        # enough. Keys follow TELEMETRY_TOPICS order so snapshots serialize stably.
+        latest = self.latest
+        telemetry_data = {topic: latest[topic] for topic in self.topics if topic in latest}
+        now = time.time()
+        stale_topics = [
+            topic for topic in self.topics
+            if now - self.received_at.get(topic, 0.0) > max_age_s
+        ]
+        if stale_topics:
+            telemetry_data["stale_topics"] = stale_topics
+        return telemetry_data
+
+
+_telemetry_caches = {} # drone -> TelemetryCache
+
+def get_telemetry_cache(drone: System):
+    return _telemetry_caches.get(drone)
+
+def register_telemetry_cache(drone: System, cache: TelemetryCache):
+    """Makes get_drone_telemetry(drone) read `cache`, which the caller feeds."""
+    _telemetry_caches[drone] = cache
+
+async def start_telemetry_cache(drone: System, ready_timeout=10.0):
+    cache = _telemetry_caches.get(drone)
+    if cache is None:
+        cache = TelemetryCache(drone)
+        _telemetry_caches[drone] = cache
+        cache.start()
+    if not await cache.wait_ready(ready_timeout):
+        missing = [topic for topic in cache.topics if topic not in cache.latest]
+        print(f"Telemetry cache started without data for: {', '.join(missing)}")
+    return cache
+
+async def stop_telemetry_cache(drone: System):
+    cache = _telemetry_caches.pop(drone, None)
+    if cache is not None:
+        await cache.stop()
+
+
+async def _read_topic(drone: System, stream_name, convert):
+    async for item in getattr(drone.telemetry, stream_name)():
+        return convert(item) # Get current value and stop
+
+async def _read_drone_telemetry(drone: System, timeout_s=TELEMETRY_TOPIC_TIMEOUT_S):
+    # All topics are read at once, so the snapshot costs the slowest topic rather
+    # than the sum; a topic that misses its timeout is reported in "stale_topics".
+    topics = list(TELEMETRY_TOPICS.items())
+    results = await asyncio.gather(
+        *(asyncio.wait_for(_read_topic(drone, stream_name, convert), timeout_s)
+          for _, (stream_name, convert) in topics),
+        return_exceptions=True
+    )
+
+    telemetry_data = {}
+    stale_topics = []
+    for (topic, _), result in zip(topics, results):
+        if isinstance(result, BaseException) or result is None:
+            if not isinstance(result, (asyncio.TimeoutError, type(None))):
+                print(f"Error reading telemetry topic '{topic}': {result}")
+            stale_topics.append(topic)
+        else:
+            telemetry_data[topic] = result
+    if stale_topics:
+        telemetry_data["stale_topics"] = stale_topics
     return telemetry_data
 
-async def connect_drone():
-    print(f"Connecting to drone at {MAVSDK_CONNECTION_ADDRESS}...")
-    drone = System()
-    await drone.connect(system_address=MAVSDK_CONNECTION_ADDRESS)
+async def get_drone_telemetry(drone: System):
+    cache = _telemetry_caches.get(drone)
+    if cache is not None:
+        return cache.snapshot()
+    return await _read_drone_telemetry(drone)
+
+async def wait_for_telemetry(drone: System, timeout=TELEMETRY_MAX_AGE_S):
+    """
+    Like get_drone_telemetry(), but with a telemetry cache it first waits for the
+    next topic update, so callers can be driven by telemetry instead of a fixed sleep.
+    If nothing arrives within `timeout` the snapshot is returned anyway, with its
+    stale topics marked.
+    """
+    cache = _telemetry_caches.get(drone)
+    if cache is not None:
+        await cache.wait_for_update(timeout)
+        return cache.snapshot()
+    return await _read_drone_telemetry(drone)
+
+async def connect_drone(use_telemetry_cache=True, address=None, system_factory=None):
+    """
+    Connects to the vehicle at `address` (default MAVSDK_CONNECTION_ADDRESS).
+    `system_factory` builds the System to connect with, e.g. the simulator's
+    fake_mavsdk.System instead of mavsdk.System.
+    """
+    address = address or MAVSDK_CONNECTION_ADDRESS
+    print(f"Connecting to drone at {address}...")
+    drone = (system_factory or System)()
+    await drone.connect(system_address=address)
 
     async for state in drone.core.connection_state():
         if state.is_connected:
             print("Drone connected!")
             break
-        await asyncio.sleep(1) 
-    
+        await asyncio.sleep(1)
+
     async for health in drone.telemetry.health():
         if health.is_global_position_ok and health.is_home_position_ok:
             print("Drone has a good global position estimate.")
             break
-        await asyncio.sleep(1) 
+        await asyncio.sleep(1)
+
+    if use_telemetry_cache:
+        await start_telemetry_cache(drone)
 
     return drone
 
@@ -95,12 +271,12 @@ async def main_collector_test():
     print(json.dumps(telemetry, indent=2))
     await drone.action.land()
     await asyncio.sleep(10)
-    await drone.action.disarm() 
-    await drone.action.kill() 
+    await drone.action.disarm()
+    await drone.action.kill()
 
 if __name__ == "__main__":
     import json
     try:
         asyncio.run(main_collector_test())
     except Exception as e:
-        print(f"Error during initial telemetry collection: {e}")
\ No newline at end of file
+        print(f"Error during initial telemetry collection: {e}")
@@ -0,0 +1,211 @@
+# telemetry_recorder.py
+import asyncio
+import glob
+import json
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+LOG_MAGIC = b"ODTL"
+LOG_VERSION = 1
+LOG_SUFFIX = ".odtl"
+FLUSH_BYTES = 64 * 1024            # hand the buffer to the writer thread once it is this large
+FLUSH_INTERVAL_S = 1.0             # ... or at least this often
+MAX_PENDING_FLUSHES = 8            # buffers queued for the writer before new records are dropped
+ROTATE_BYTES = 64 * 1024 * 1024    # start a new segment file after this many bytes
+
+# MAVSDK FlightMode names, stored as their index (unknown names as 0)
+FLIGHT_MODES = ("UNKNOWN", "READY", "TAKEOFF", "HOLD", "MISSION", "RETURN_TO_LAUNCH", "LAND",
+                "OFFBOARD", "FOLLOW_ME", "MANUAL", "ALTCTL", "POSCTL", "ACRO", "STABILIZED", "RATTITUDE")
+_FLIGHT_MODE_INDEX = {name: i for i, name in enumerate(FLIGHT_MODES)}
+_HEALTH_FIELDS = ("global_position_ok", "home_position_ok", "armable")
+
+
+def _pack_health(health):
+    return (sum(1 << i for i, field in enumerate(_HEALTH_FIELDS) if health.get(field)),)
+
+def _unpack_health(bits):
+    return {field: bool(bits & (1 << i)) for i, field in enumerate(_HEALTH_FIELDS)}
+
+
+# Every record is RECORD_HEADER (topic id, time.time() of receipt) followed by
+# the topic's fixed-width payload.
+# topic -> (id, payload struct, value -> payload tuple, payload tuple -> value)
+RECORD_HEADER = struct.Struct("<Bd")
+RECORD_LAYOUTS = {
+    "position": (1, struct.Struct("<ddf"),
+                 lambda v: (v["latitude_deg"], v["longitude_deg"], v["relative_altitude_m"]),
+                 lambda p: {"latitude_deg": p[0], "longitude_deg": p[1], "relative_altitude_m": p[2]}),
+    "velocity_ned": (2, struct.Struct("<fff"),
+                     lambda v: (v["north_m_s"], v["east_m_s"], v["down_m_s"]),
+                     lambda p: {"north_m_s": p[0], "east_m_s": p[1], "down_m_s": p[2]}),
+    "attitude_euler": (3, struct.Struct("<fff"),
+                       lambda v: (v["roll_deg"], v["pitch_deg"], v["yaw_deg"]),
+                       lambda p: {"roll_deg": p[0], "pitch_deg": p[1], "yaw_deg": p[2]}),
+    "battery": (4, struct.Struct("<Bf"),
+                lambda v: (max(0, min(255, v["remaining_percent"])), v["voltage_v"]),
+                lambda p: {"remaining_percent": p[0], "voltage_v": round(p[1], 2)}),
+    "flight_mode": (5, struct.Struct("<B"),
+                    lambda v: (_FLIGHT_MODE_INDEX.get(v, 0),),
+                    lambda p: FLIGHT_MODES[p[0]] if p[0] < len(FLIGHT_MODES) else "UNKNOWN"),
+    "gps_info": (6, struct.Struct("<BB"),
+                 lambda v: (min(255, v["num_satellites"]), v["fix_type"]),
+                 lambda p: {"num_satellites": p[0], "fix_type": p[1]}),
+    "in_air": (7, struct.Struct("<?"), lambda v: (bool(v),), lambda p: p[0]),
+    "armed": (8, struct.Struct("<?"), lambda v: (bool(v),), lambda p: p[0]),
+    "health": (9, struct.Struct("<B"), _pack_health, lambda p: _unpack_health(p[0])),
+}
+_LAYOUTS_BY_ID = {layout[0]: (topic,) + layout[1:] for topic, layout in RECORD_LAYOUTS.items()}
+
+
+def _file_header():
+    # Self-describing: the topic ids and struct formats are stored in every segment
+    schema = json.dumps({topic: [layout[0], layout[1].format] for topic, layout in RECORD_LAYOUTS.items()},
+                        separators=(",", ":")).encode("utf-8")
+    return LOG_MAGIC + struct.pack("<HI", LOG_VERSION, len(schema)) + schema
+
+
+class TelemetryRecorder:
+    """
+    Appends every telemetry update to compact binary log segments (about
+    10-30 bytes per sample instead of a printed snapshot). record() only packs
+    into an in-memory buffer; full buffers are written by one background
+    thread, so the event loop never blocks on disk. Memory is bounded: if the
+    disk falls behind by MAX_PENDING_FLUSHES buffers, new records are dropped
+    and counted instead of queued.
+    """
+
+    def __init__(self, log_dir, prefix="telemetry", rotate_bytes=ROTATE_BYTES,
+                 flush_bytes=FLUSH_BYTES, flush_interval_s=FLUSH_INTERVAL_S):
+        self.log_dir = log_dir
+        self.prefix = f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}"
+        self.rotate_bytes = rotate_bytes
+        self.flush_bytes = flush_bytes
+        self.flush_interval_s = flush_interval_s
+        self.records = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self.segments = []
+        self._buffer = bytearray()
+        self._pending = 0
+        self._file = None
+        self._file_bytes = 0
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="telemetry-recorder")
+        self._flush_task = None
+
+    def start(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    def attach(self, cache):
+        """Records every update of a telemetry.TelemetryCache."""
+        cache.listeners.append(self.record)
+
+    def record(self, topic, value, received_at):
+        layout = RECORD_LAYOUTS.get(topic)
+        if layout is None or value is None:
+            return
+        if self._pending >= MAX_PENDING_FLUSHES:
+            self.dropped += 1
+            return
+        topic_id, payload, pack, _ = layout
+        try:
+            self._buffer += RECORD_HEADER.pack(topic_id, received_at) + payload.pack(*pack(value))
+        except (KeyError, TypeError, struct.error):
+            self.dropped += 1
+            return
+        self.records += 1
+        if len(self._buffer) >= self.flush_bytes:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return None
+        data, self._buffer = bytes(self._buffer), bytearray()
+        self._pending += 1
+        future = asyncio.get_running_loop().run_in_executor(self._writer, self._write, data)
+        future.add_done_callback(self._write_done)
+        return future
+
+    def _write_done(self, future):
+        self._pending -= 1
+        if future.exception() is not None:
+            print(f"Telemetry recorder write failed: {future.exception()}")
+
+    def _write(self, data):
+        # Runs on the writer thread only
+        if self._file is None or self._file_bytes + len(data) > self.rotate_bytes:
+            self._open_segment()
+        self._file.write(data)
+        self._file.flush()
+        self._file_bytes += len(data)
+        self.bytes_written += len(data)
+
+    def _open_segment(self):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.log_dir, f"{self.prefix}-{len(self.segments):04d}{LOG_SUFFIX}")
+        self._file = open(path, "wb")
+        header = _file_header()
+        self._file.write(header)
+        self._file_bytes = len(header)
+        self.bytes_written += len(header)
+        self.segments.append(path)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_s)
+            self.flush()
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        future = self.flush()
+        if future is not None:
+            await future
+        await asyncio.get_running_loop().run_in_executor(self._writer, self._close_file)
+        self._writer.shutdown(wait=False)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self):
+        return {
+            "records": self.records,
+            "dropped": self.dropped,
+            "bytes_written": self.bytes_written,
+            "segments": len(self.segments),
+        }
+
+
+def log_segments(log_dir, prefix="telemetry"):
+    """Segment files of every recording in `log_dir`, oldest first."""
+    return sorted(glob.glob(os.path.join(log_dir, f"{prefix}-*{LOG_SUFFIX}")))
+
+def read_log(path):
+    """Yields (received_at, topic, value) for every record in one segment file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != LOG_MAGIC:
+        raise ValueError(f"{path} is not a telemetry log")
+    version, schema_length = struct.unpack_from("<HI", data, 4)
+    if version != LOG_VERSION:
+        raise ValueError(f"{path} has unsupported log version {version}")
+    offset = 10 + schema_length
+    while offset + RECORD_HEADER.size <= len(data):
+        topic_id, received_at = RECORD_HEADER.unpack_from(data, offset)
+        topic, payload, _, unpack = _LAYOUTS_BY_ID[topic_id]
+        offset += RECORD_HEADER.size
+        if offset + payload.size > len(data):
+            break # Truncated final record (recording was killed mid-write)
+        yield received_at, topic, unpack(payload.unpack_from(data, offset))
+        offset += payload.size
+
+def read_logs(paths):
+    for path in paths:
+        yield from read_log(path)
+
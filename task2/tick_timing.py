@@ -0,0 +1,109 @@
+# tick_timing.py
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Stage durations copied from an Ollama call_stats dict: stage name -> (field, divisor to ms)
+OLLAMA_STAGE_FIELDS = {
+    "prompt_build": ("prompt_build_ms", 1),
+    "http": ("http_ms", 1),
+    "json_parse": ("parse_ms", 1),
+    "ollama_total": ("total_duration", 1e6),
+    "ollama_load": ("load_duration", 1e6),
+    "ollama_prompt_eval": ("prompt_eval_duration", 1e6),
+    "ollama_eval": ("eval_duration", 1e6),
+}
+OLLAMA_COUNTER_FIELDS = ("prompt_eval_count", "eval_count", "first_token_ms", "early_exit")
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class TickTimer:
+    """
+    Records how long each stage of an advisor tick takes. Finished ticks go into
+    a fixed-size ring buffer that can be summarised (p50/p95/p99) or exported as JSONL.
+    """
+
+    def __init__(self, capacity=1000):
+        self.ticks = deque(maxlen=capacity)
+        self.tick_count = 0
+        self.current = None
+        self._tick_started = 0.0
+
+    def start_tick(self, **info):
+        self.tick_count += 1
+        self.current = {"tick": self.tick_count, "time": time.time(), "stages_ms": {}, "counters": {}}
+        self.current.update(info)
+        self._tick_started = time.perf_counter()
+        return self.current
+
+    def record(self, stage, duration_ms):
+        if self.current is not None:
+            stages = self.current["stages_ms"]
+            stages[stage] = stages.get(stage, 0.0) + duration_ms
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000)
+
+    def record_ollama_call(self, call_stats: dict):
+        for stage, (field, divisor) in OLLAMA_STAGE_FIELDS.items():
+            if field in call_stats:
+                self.record(stage, call_stats[field] / divisor)
+        if self.current is not None:
+            for field in OLLAMA_COUNTER_FIELDS:
+                if field in call_stats:
+                    self.current["counters"][field] = call_stats[field]
+
+    def end_tick(self):
+        if self.current is None:
+            return None
+        tick = self.current
+        tick["total_ms"] = (time.perf_counter() - self._tick_started) * 1000
+        self.ticks.append(tick)
+        self.current = None
+        return tick
+
+    def summary(self):
+        durations = {"total": [tick["total_ms"] for tick in self.ticks]}
+        for tick in self.ticks:
+            for stage, duration_ms in tick["stages_ms"].items():
+                durations.setdefault(stage, []).append(duration_ms)
+        result = {}
+        for stage, values in durations.items():
+            values.sort()
+            result[stage] = {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 0.50), 3),
+                "p95_ms": round(percentile(values, 0.95), 3),
+                "p99_ms": round(percentile(values, 0.99), 3),
+                "max_ms": round(values[-1], 3) if values else 0.0,
+            }
+        return result
+
+    def format_summary(self):
+        lines = [f"{'stage':<20} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}"]
+        for stage, s in self.summary().items():
+            lines.append(f"{stage:<20} {s['count']:>6} {s['p50_ms']:>10.2f} {s['p95_ms']:>10.2f} "
+                         f"{s['p99_ms']:>10.2f} {s['max_ms']:>10.2f}")
+        return "\n".join(lines)
+
+    def format_tick(self, tick):
+        stages = " ".join(f"{stage}={ms:.1f}ms" for stage, ms in tick["stages_ms"].items())
+        return f"tick {tick['tick']}: total={tick['total_ms']:.1f}ms {stages}"
+
+    def export_jsonl(self, path):
+        with open(path, "w") as f:
+            for tick in self.ticks:
+                f.write(json.dumps(tick, separators=(",", ":")) + "\n")
+        return len(self.ticks)
@@ -3,7 +3,7 @@ import json
 import time
 
 from telemetry import connect_drone, get_drone_telemetry
-from ollama_res import get_ollama_action
+from ollama_res import get_ollama_action, close_ollama_client
 from drone_action import DroneActionExecutor
 
 Mission_pending = True
@@ -108,6 +108,7 @@ async def drone_advisor(Mission):
         print(f"An unhandled error occurred: {e}")
 
     finally:
+        await close_ollama_client()
         if drone:
             print("Ensuring drone is disarmed and killed for cleanup...")
             try:
@@ -0,0 +1,101 @@
+# geodesy.py
+import math
+
+try:
+    import numpy as np
+except ImportError: # The *_many functions fall back to plain Python loops
+    np = None
+
+EARTH_RADIUS_M = 6371008.8 # Mean Earth radius (IUGG)
+FAST_PATH_MAX_M = 10000.0  # Below this the equirectangular approximation is within ~1e-4 relative error
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters between two points given in degrees."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+def equirectangular_m(lat1, lon1, lat2, lon2):
+    """Flat-earth distance in meters; fast and accurate for short distances."""
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return EARTH_RADIUS_M * math.hypot(x, y)
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """
+    Distance in meters, using the equirectangular fast path when the points are
+    close (arrival checks, geofences) and haversine otherwise.
+    """
+    distance = equirectangular_m(lat1, lon1, lat2, lon2)
+    if distance < FAST_PATH_MAX_M:
+        return distance
+    return haversine_m(lat1, lon1, lat2, lon2)
+
+def bearing_deg(lat1, lon1, lat2, lon2):
+    """Initial great-circle bearing from point 1 to point 2, 0-360 degrees clockwise from north."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_lambda = math.radians(lon2 - lon1)
+    x = math.sin(d_lambda) * math.cos(phi2)
+    y = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(d_lambda)
+    return math.degrees(math.atan2(x, y)) % 360.0
+
+def ned_to_lla(lat0, lon0, alt0, north_m, east_m, down_m=0.0):
+    """
+    Local north/east/down offset from a reference point to latitude, longitude
+    and altitude (spherical local tangent plane, for offsets of a few km).
+    """
+    lat = lat0 + math.degrees(north_m / EARTH_RADIUS_M)
+    lon = lon0 + math.degrees(east_m / (EARTH_RADIUS_M * math.cos(math.radians(lat0))))
+    return lat, lon, alt0 - down_m
+
+def lla_to_ned(lat0, lon0, alt0, lat, lon, alt):
+    """Inverse of ned_to_lla: (north_m, east_m, down_m) of a point relative to the reference."""
+    north_m = math.radians(lat - lat0) * EARTH_RADIUS_M
+    east_m = math.radians(lon - lon0) * EARTH_RADIUS_M * math.cos(math.radians(lat0))
+    return north_m, east_m, alt0 - alt
+
+
+# Batch versions for whole waypoint lists and position histories. They take and
+# return NumPy arrays when NumPy is installed, lists otherwise.
+
+def haversine_many(lat0, lon0, lats, lons):
+    """Distances in meters from one point to each of many points."""
+    if np is None:
+        return [haversine_m(lat0, lon0, lat, lon) for lat, lon in zip(lats, lons)]
+    phi0 = np.radians(lat0)
+    phi = np.radians(np.asarray(lats, dtype=float))
+    d_lambda = np.radians(np.asarray(lons, dtype=float) - lon0)
+    a = np.sin((phi - phi0) / 2) ** 2 + np.cos(phi0) * np.cos(phi) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def path_lengths_m(lats, lons):
+    """Length in meters of each leg of a path (len(lats) - 1 values)."""
+    if np is None:
+        return [haversine_m(lats[i], lons[i], lats[i + 1], lons[i + 1]) for i in range(len(lats) - 1)]
+    phi = np.radians(np.asarray(lats, dtype=float))
+    lam = np.radians(np.asarray(lons, dtype=float))
+    a = (np.sin(np.diff(phi) / 2) ** 2
+         + np.cos(phi[:-1]) * np.cos(phi[1:]) * np.sin(np.diff(lam) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def ned_to_lla_many(lat0, lon0, alt0, norths_m, easts_m, downs_m):
+    """ned_to_lla for many offsets from the same reference; returns (lats, lons, alts)."""
+    if np is None:
+        points = [ned_to_lla(lat0, lon0, alt0, n, e, d) for n, e, d in zip(norths_m, easts_m, downs_m)]
+        return [p[0] for p in points], [p[1] for p in points], [p[2] for p in points]
+    lats = lat0 + np.degrees(np.asarray(norths_m, dtype=float) / EARTH_RADIUS_M)
+    lons = lon0 + np.degrees(np.asarray(easts_m, dtype=float) / (EARTH_RADIUS_M * math.cos(math.radians(lat0))))
+    return lats, lons, alt0 - np.asarray(downs_m, dtype=float)
+
+def lla_to_ned_many(lat0, lon0, alt0, lats, lons, alts):
+    """lla_to_ned for many points against the same reference; returns (norths, easts, downs)."""
+    if np is None:
+        points = [lla_to_ned(lat0, lon0, alt0, lat, lon, alt) for lat, lon, alt in zip(lats, lons, alts)]
+        return [p[0] for p in points], [p[1] for p in points], [p[2] for p in points]
+    norths = np.radians(np.asarray(lats, dtype=float) - lat0) * EARTH_RADIUS_M
+    easts = np.radians(np.asarray(lons, dtype=float) - lon0) * EARTH_RADIUS_M * math.cos(math.radians(lat0))
+    return norths, easts, alt0 - np.asarray(alts, dtype=float)
+
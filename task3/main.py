@@ -3,18 +3,125 @@ import json
 import time
 
 
-from telemetry import connect_drone, get_drone_telemetry
-from ollama_res import get_ollama_action
+from telemetry import connect_drone, get_drone_telemetry, wait_for_telemetry
+from ollama_res import get_ollama_action, invalidate_cached_plan, close_ollama_client
 from drone_action import DroneActionExecutor
+from mission_compiler import OP_NAMES, OP_GOTO, OP_LAND, OP_TAKEOFF, MissionCompileError, compile_mission
+from geodesy import lla_to_ned
 
 
 last_human_command = "Start mission"
 
 Mission = " go to lat: 25, lon: 49, altitude : 30 and land there."
 
+MAX_REPLANS = 2 # Deviations tolerated before the mission is abandoned and the drone lands
+MAX_CROSS_TRACK_M = 15.0 # Distance off the current goto leg that counts as a deviation
+
+
+# --- Mission plans ---
+async def get_mission_plan(mission: str, home, deviation=None, telemetry_data=None):
+    """
+    Returns the compiled mission for `mission` with its home at `home`, or None.
+    The first plan comes through the plan cache; a plan that does not compile
+    is dropped from the cache. After a `deviation` (from fly_mission) the
+    planner is told why the drone left the plan and where it is now, and the
+    new plan is compiled to continue from the current position in
+    `telemetry_data` instead of starting over from home.
+    """
+    start_offset, airborne = (0.0, 0.0), False
+    if deviation is None:
+        print("-- Getting mission plan...")
+        plan = await get_ollama_action(mission)
+    else:
+        position = (telemetry_data or {}).get("position") or {}
+        if "latitude_deg" not in position:
+            print("No position fix; cannot replan from the current position.")
+            return None
+        north, east, _ = lla_to_ned(home[0], home[1], 0.0, position["latitude_deg"], position["longitude_deg"], 0.0)
+        start_offset, airborne = (north, east), bool(telemetry_data.get("in_air"))
+        print(f"-- Replanning from {north:.1f}m north, {east:.1f}m east of home...")
+        replan = dict(deviation, in_air=airborne, north_m=north, east_m=east,
+                      altitude_m=position.get("relative_altitude_m") or 0.0)
+        plan = await get_ollama_action(mission, replan=replan)
+    print(json.dumps(plan, indent=2))
+
+    try:
+        return compile_mission(plan, home, start_offset, airborne)
+    except MissionCompileError as e:
+        print(f"!!! Mission plan rejected: {e} !!!")
+        if deviation is None:
+            invalidate_cached_plan(mission)
+        return None
+
+
+# --- Mission execution ---
+def detect_deviation(telemetry_data: dict, leg_start, leg_end, step_number):
+    """
+    Returns why the drone is no longer following the mission, or None.
+    leg_start/leg_end are the (lat, lon) ends of the goto leg being flown.
+    """
+    if telemetry_data.get("in_air") is False:
+        return f"step {step_number}: drone is no longer in the air"
+    position = telemetry_data.get("position")
+    if not position:
+        return None
+    lat0, lon0 = leg_start
+    leg_north, leg_east, _ = lla_to_ned(lat0, lon0, 0.0, leg_end[0], leg_end[1], 0.0)
+    north, east, _ = lla_to_ned(lat0, lon0, 0.0, position["latitude_deg"], position["longitude_deg"], 0.0)
+    leg_length = (leg_north ** 2 + leg_east ** 2) ** 0.5
+    if leg_length < 1.0:
+        off_track = (north ** 2 + east ** 2) ** 0.5
+    else:
+        off_track = abs(north * leg_east - east * leg_north) / leg_length
+    if off_track > MAX_CROSS_TRACK_M:
+        return f"step {step_number}: {off_track:.1f} m off the planned leg"
+    return None
+
+async def fly_mission(drone, action_executor: DroneActionExecutor, mission):
+    """
+    Flies a compiled mission step by step without consulting the LLM.
+    Returns None once the mission is complete, or the deviation that ended it:
+    {"step", "total_steps", "op", "reason"} for get_mission_plan to replan from.
+    """
+    def deviation(reason):
+        return {"step": step_number, "total_steps": len(mission), "op": op, "reason": reason}
+
+    telemetry_data = await get_drone_telemetry(drone)
+    leg_start = mission.start
+    for i, (op, lat, lon, alt) in enumerate(mission.steps()):
+        step_number = i + 1
+        print(f"\n--- Mission step {step_number}/{len(mission)}: {op} (lat {lat:.6f}, lon {lon:.6f}, alt {alt:.1f}m) ---")
+        telemetry_data = await get_drone_telemetry(drone)
+
+        if mission.ops[i] == OP_TAKEOFF:
+            if telemetry_data.get("in_air"):
+                print("Skipping takeoff: Already in air.")
+                continue
+            if not telemetry_data.get("armed") and not await action_executor.arm_drone():
+                return deviation(f"step {step_number}: arming failed")
+            handle = action_executor.takeoff_drone(alt)
+
+        elif mission.ops[i] == OP_GOTO:
+            handle = action_executor.goto_location(lat, lon, alt)
+            # Watch the leg on every telemetry update while the goto runs
+            while not handle.done():
+                telemetry_data = await wait_for_telemetry(drone)
+                reason = detect_deviation(telemetry_data, leg_start, (lat, lon), step_number)
+                if reason:
+                    handle.cancel()
+                    return deviation(reason)
+            leg_start = (lat, lon)
+
+        elif mission.ops[i] == OP_LAND:
+            handle = action_executor.land_drone()
+
+        if not await handle:
+            return deviation(f"step {step_number}: {OP_NAMES[mission.ops[i]]} {handle.status}")
+    return None
+
 
 # --- Main Logic ---
-async def run_ollama_drone_advisor(update_interval_seconds=3):
+async def run_ollama_drone_advisor(mission=Mission):
     print("--- Starting Ollama Drone Advisor ---")
 
     drone = None
@@ -31,96 +138,47 @@ async def run_ollama_drone_advisor(update_interval_seconds=3):
     print("Drone connected. Ready for commands.")
     start_time = time.time()
     try:
-        while True:
-            print(f"\n--- Telemetry Update (Time: {time.time()-start_time}s) ---")
-            
-            #  Step-1 telemetry from mavsdk(sitl)
-            telemetry_data = await get_drone_telemetry(drone) 
-            print("Raw Telemetry Snippet:")
-            print(f"  Battery: {telemetry_data.get('battery', {}).get('remaining_percent', 'N/A')}%")
-            print(f"  GPS Fix: {telemetry_data.get('gps_info', {}).get('fix_type', 'N/A')}D")
-            print(f"  In Air: {telemetry_data.get('in_air', 'N/A')}")
-            print(f"  Armed: {telemetry_data.get('armed', 'N/A')}")
-            print(f"  Flight Mode: {telemetry_data.get('flight_mode', 'N/A')}")
-            print(f"  Current Action Executor State: {action_executor.current_action}")
-            position = telemetry_data.get("position", {})
-            print(f"  Latitude: {position.get('latitude_deg', 'N/A')}")
-            print(f"  Longitude: {position.get('longitude_deg', 'N/A')}")
-            print(f"  Altitude: {position.get('relative_altitude_m', 'N/A')} m")
-
-            # Step-2. Send data to llms
-            llm_action_request = await get_ollama_action(Mission, telemetry_data)
-            
-            # Step-3. Display llms suggestion
-            print(f"\nOllama's Suggested Action :")
-            print(json.dumps(llm_action_request, indent=2))
-
-            # step-4. Execute suggested action
-            action_type = llm_action_request.get("action")
-            message = llm_action_request.get("message", "No specific message.")
-            
-            # --- Action Execution Logic ---
-            if action_type == "takeoff":
-                altitude =    llm_action_request.get("altitude_m")
-                if telemetry_data.get("in_air") == False:
-                    print("-- Drone is taking off...")
-                    await action_executor.takeoff_drone(altitude) 
-                elif telemetry_data.get("in_air") == False and altitude is not None:
-                    await action_executor.takeoff_drone(altitude)
-                else:
-                    print(f"Skipping takeoff: Already in air or invalid altitude ({altitude}).")
-            
-            elif action_type == "arm":
-                if telemetry_data.get("armed") == False:
-                    await action_executor.arm_drone()
-                else:
-                    print(f"Skipping arm: Already armed ({telemetry_data.get('armed')}) or in air ({telemetry_data.get('in_air')}).")
-
-            elif action_type == "disarm":
-                if telemetry_data.get("armed") == True and telemetry_data.get("in_air") == False:
-                    await action_executor.disarm_drone()
-                else:
-                    print(f"Skipping disarm: Already disarmed or in air ({telemetry_data.get('in_air')}).")
-
-            elif action_type == "goto":
-                lat = llm_action_request.get("latitude_deg")
-                lon = llm_action_request.get("longitude_deg")
-                alt = llm_action_request.get("altitude_m")
-                if telemetry_data.get("armed") == True and telemetry_data.get("in_air") == True and telemetry_data.get("health", {}).get("global_position_ok", False) and lat is not None and lon is not None and alt is not None:
-                    await action_executor.goto_location(lat, lon, alt)
-                else:
-                    print(f"Skipping goto: Not armed, not in air, no GPS, or invalid coordinates.")
-            
-            elif action_type == "land":
-                if telemetry_data.get("armed") == True and telemetry_data.get("in_air") == True:
-                    await action_executor.land_drone()
-                else:
-                    print(f"Skipping land: Not armed or not in air.")
-
-            elif action_type == "rtl":
-                if telemetry_data.get("armed") == True and telemetry_data.get("in_air") == True and telemetry_data.get("health", {}).get("home_position_ok", False):
-                    await action_executor.rtl_drone()
-                else:
-                    print(f"Skipping RTL: Not armed, not in air, or no home position.")
-
-            elif action_type == "hold":
-                await action_executor.hold_drone(llm_action_request.get("reason", "No specific reason."))
-            
-            elif action_type == "error":
-                print(f"!!! LLM Error/Intervention Requested: {message} !!!")
-                await action_executor.hold_drone("LLM requested human intervention due to error.")
-            
-            else:
-                print(f"Unknown action type received from LLM: {action_type}. Defaulting to hold.")
-                await action_executor.hold_drone("Unknown LLM action.")
-
-            await asyncio.sleep(update_interval_seconds)
+        telemetry_data = await get_drone_telemetry(drone)
+        print("Raw Telemetry Snippet:")
+        print(f"  Battery: {telemetry_data.get('battery', {}).get('remaining_percent', 'N/A')}%")
+        print(f"  GPS Fix: {telemetry_data.get('gps_info', {}).get('fix_type', 'N/A')}D")
+        print(f"  In Air: {telemetry_data.get('in_air', 'N/A')}")
+        print(f"  Armed: {telemetry_data.get('armed', 'N/A')}")
+        print(f"  Flight Mode: {telemetry_data.get('flight_mode', 'N/A')}")
+        if telemetry_data.get("stale_topics"):
+            print(f"  Stale Topics: {', '.join(telemetry_data['stale_topics'])}")
+        position = telemetry_data.get("position", {})
+        print(f"  Latitude: {position.get('latitude_deg', 'N/A')}")
+        print(f"  Longitude: {position.get('longitude_deg', 'N/A')}")
+        print(f"  Altitude: {position.get('relative_altitude_m', 'N/A')} m")
+        if "latitude_deg" not in position:
+            print("No position fix; cannot plan a mission.")
+            return
+        # Offsets in the plan are relative to where the mission starts
+        home = (position["latitude_deg"], position["longitude_deg"])
+
+        # Plan once (from the plan cache when this mission was planned before), then fly it
+        # without the LLM; only a deviation from the plan triggers a replan from where the drone is
+        compiled = await get_mission_plan(mission, home)
+        replans = 0
+        while compiled is not None:
+            deviation = await fly_mission(drone, action_executor, compiled)
+            if deviation is None:
+                print(f"\nMission complete in {time.time() - start_time:.1f}s after {replans} replan(s).")
+                break
+            print(f"\n!!! Deviation from mission plan: {deviation['reason']} !!!")
+            replans += 1
+            if replans > MAX_REPLANS:
+                print("Too many deviations, abandoning mission.")
+                break
+            compiled = await get_mission_plan(mission, home, deviation, await get_drone_telemetry(drone))
 
     except KeyboardInterrupt:
         print("\nSimulation interrupted by user.")
     except Exception as e:
         print(f"An unhandled error occurred: {e}")
     finally:
+        await close_ollama_client()
         if drone:
             print("Ensuring drone is disarmed and killed for cleanup...")
             try:
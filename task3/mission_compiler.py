@@ -0,0 +1,191 @@
+# mission_compiler.py
+import re
+from array import array
+from itertools import accumulate
+
+from geodesy import ned_to_lla, ned_to_lla_many, path_lengths_m
+
+# Op codes of a compiled mission
+OP_TAKEOFF = 1
+OP_GOTO = 2
+OP_LAND = 3
+OP_NAMES = {OP_TAKEOFF: "takeoff", OP_GOTO: "goto", OP_LAND: "land"}
+
+# Plan limits checked before anything is flown
+MIN_ALTITUDE_M = 2.0
+MAX_ALTITUDE_M = 120.0
+MAX_DISTANCE_FROM_HOME_M = 1000.0
+MAX_STEPS = 100
+
+_NUMBER = r"(-?\d+(?:\.\d+)?)"
+_TAKEOFF_RE = re.compile(rf"^takeoff(?:\s+(?:to|at))?\s+{_NUMBER}\s*m?$")
+_GOTO_RE = re.compile(rf"^goto\s+(.*?),?\s*alt(?:itude)?\s*{_NUMBER}\s*m?$")
+_OFFSET_RE = re.compile(rf"(north|south|east|west)\s+{_NUMBER}\s*m?")
+_LAND_RE = re.compile(r"^land\b")
+_STEP_KEY_RE = re.compile(r"(\d+)")
+
+
+class MissionCompileError(ValueError):
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__("; ".join(problems))
+
+
+class CompiledMission:
+    """
+    A plan from the task3 mission planner, parsed once into parallel typed arrays:
+    op code, north/east offset from the previous position and altitude per step,
+    plus every goto resolved to an absolute waypoint from the home position.
+    A replanned mission continues from `start_offset`, the drone's position
+    relative to home when the plan was made, and may already be airborne.
+    """
+
+    def __init__(self, ops, d_north_m, d_east_m, altitude_m, home, start_offset=(0.0, 0.0), airborne=False):
+        self.ops = ops               # array("b") of OP_* codes
+        self.d_north_m = d_north_m   # array("d"), 0 for non-goto steps
+        self.d_east_m = d_east_m     # array("d"), 0 for non-goto steps
+        self.altitude_m = altitude_m # array("d"), relative altitude, 0 for land
+        self.home = home             # (latitude_deg, longitude_deg)
+        self.start_offset = tuple(start_offset) # (north_m, east_m) from home where the plan starts
+        self.airborne = airborne     # planned for a drone already in the air: no takeoff step
+        self.start = home            # (latitude_deg, longitude_deg) of start_offset
+        self.latitude_deg = []
+        self.longitude_deg = []
+        self.north_m = []            # cumulative offsets from home
+        self.east_m = []
+        self._resolve()
+
+    def _resolve(self):
+        # One pass over the whole plan: cumulative offsets, then a single batch conversion
+        start_north, start_east = self.start_offset
+        self.north_m = list(accumulate(self.d_north_m, initial=start_north))[1:]
+        self.east_m = list(accumulate(self.d_east_m, initial=start_east))[1:]
+        lat0, lon0 = self.home
+        self.start = ned_to_lla(lat0, lon0, 0.0, start_north, start_east)[:2]
+        lats, lons, _ = ned_to_lla_many(lat0, lon0, 0.0, self.north_m, self.east_m, [0.0] * len(self.ops))
+        self.latitude_deg = [float(lat) for lat in lats]
+        self.longitude_deg = [float(lon) for lon in lons]
+
+    def __len__(self):
+        return len(self.ops)
+
+    def steps(self):
+        """Yields (op name, latitude_deg, longitude_deg, altitude_m) per step."""
+        for i, op in enumerate(self.ops):
+            yield OP_NAMES[op], self.latitude_deg[i], self.longitude_deg[i], self.altitude_m[i]
+
+    def distance_m(self):
+        """Horizontal length of the whole route in meters."""
+        if not self.ops:
+            return 0.0
+        lats, lons = [self.start[0], *self.latitude_deg], [self.start[1], *self.longitude_deg]
+        return float(sum(path_lengths_m(lats, lons)))
+
+    def validate(self):
+        problems = []
+        if not self.ops:
+            return ["plan has no steps"]
+        if len(self.ops) > MAX_STEPS:
+            problems.append(f"plan has {len(self.ops)} steps, limit is {MAX_STEPS}")
+        if self.ops[0] != OP_TAKEOFF and not self.airborne:
+            problems.append("plan must start with takeoff")
+        if self.ops[-1] != OP_LAND:
+            problems.append("plan must end with land")
+        for i, op in enumerate(self.ops):
+            step = i + 1
+            if op == OP_TAKEOFF and self.airborne:
+                problems.append(f"step {step}: takeoff while the drone is already in the air")
+            elif op == OP_TAKEOFF and i > 0:
+                problems.append(f"step {step}: takeoff is only allowed as the first step")
+            if op == OP_LAND and i < len(self.ops) - 1:
+                problems.append(f"step {step}: land is only allowed as the last step")
+            if op != OP_LAND and not MIN_ALTITUDE_M <= self.altitude_m[i] <= MAX_ALTITUDE_M:
+                problems.append(f"step {step}: altitude {self.altitude_m[i]}m outside {MIN_ALTITUDE_M}-{MAX_ALTITUDE_M}m")
+            if (self.north_m[i] ** 2 + self.east_m[i] ** 2) ** 0.5 > MAX_DISTANCE_FROM_HOME_M:
+                problems.append(f"step {step}: more than {MAX_DISTANCE_FROM_HOME_M:.0f}m from home")
+        return problems
+
+    def to_dict(self):
+        return {
+            "home": list(self.home),
+            "ops": list(self.ops),
+            "d_north_m": list(self.d_north_m),
+            "d_east_m": list(self.d_east_m),
+            "altitude_m": list(self.altitude_m),
+            "start_offset": list(self.start_offset),
+            "airborne": self.airborne,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(array("b", data["ops"]), array("d", data["d_north_m"]), array("d", data["d_east_m"]),
+                   array("d", data["altitude_m"]), tuple(data["home"]),
+                   tuple(data.get("start_offset", (0.0, 0.0))), data.get("airborne", False))
+
+
+def _parse_step(text):
+    """Returns (op, d_north_m, d_east_m, altitude_m) for one step string."""
+    text = " ".join(text.lower().replace(":", " ").split())
+    match = _TAKEOFF_RE.match(text)
+    if match:
+        return OP_TAKEOFF, 0.0, 0.0, float(match.group(1))
+    match = _GOTO_RE.match(text)
+    if match:
+        d_north = d_east = 0.0
+        for direction, value in _OFFSET_RE.findall(match.group(1)):
+            value = float(value)
+            if direction == "north":
+                d_north += value
+            elif direction == "south":
+                d_north -= value
+            elif direction == "east":
+                d_east += value
+            else:
+                d_east -= value
+        return OP_GOTO, d_north, d_east, float(match.group(2))
+    if _LAND_RE.match(text):
+        return OP_LAND, 0.0, 0.0, 0.0
+    raise ValueError(f"cannot parse step: {text!r}")
+
+def _ordered_steps(plan: dict):
+    def step_number(key):
+        match = _STEP_KEY_RE.search(key)
+        return int(match.group(1)) if match else float("inf")
+    return [plan[key] for key in sorted(plan, key=step_number)]
+
+def compile_mission(plan: dict, home, start_offset=(0.0, 0.0), airborne=False):
+    """
+    Compiles a planner response such as {"step 1": "takeoff to 20m", ...} for a
+    mission whose home is `home` (latitude_deg, longitude_deg).
+    A replan is compiled from the drone's current position instead:
+    `start_offset` is its (north_m, east_m) from home, and when `airborne` a
+    leading takeoff step is dropped.
+    Raises MissionCompileError listing every step that cannot be parsed or flown.
+    """
+    if plan.get("action") == "error":
+        raise MissionCompileError([f"planner error: {plan.get('message')}"])
+    ops, d_north, d_east, altitude = array("b"), array("d"), array("d"), array("d")
+    problems = []
+    for step, text in enumerate(_ordered_steps(plan), start=1):
+        try:
+            op, dn, de, alt = _parse_step(str(text))
+        except ValueError as e:
+            problems.append(f"step {step}: {e}")
+            continue
+        ops.append(op)
+        d_north.append(dn)
+        d_east.append(de)
+        altitude.append(alt)
+    if problems:
+        raise MissionCompileError(problems)
+    if airborne and ops and ops[0] == OP_TAKEOFF:
+        # Planners tend to start every plan with a takeoff; in the air it is a no-op
+        for column in (ops, d_north, d_east, altitude):
+            del column[0]
+
+    mission = CompiledMission(ops, d_north, d_east, altitude, tuple(home), start_offset, airborne)
+    problems = mission.validate()
+    if problems:
+        raise MissionCompileError(problems)
+    return mission
+
@@ -1,14 +1,185 @@
 import httpx
 import json
 import asyncio
+import time
+from collections import deque
 from typing import Dict, Any
 
+from plan_cache import get_plan_cache, prompt_hash
+
 OLLAMA_HOST = "http://localhost:11434"  
 OLLAMA_MODEL = "llama3.2:3b"       
+OLLAMA_STREAM = True # parse the action while tokens arrive and stop early
+OLLAMA_KEEP_ALIVE = "30m" # keep the model resident between ticks
+OLLAMA_LOG_TIMINGS = True # print per-call prompt_eval_count / durations
+OLLAMA_CALL_LOG_SIZE = 200
+OLLAMA_TIMEOUT_S = 60.0
+OLLAMA_USE_PLAN_CACHE = True # serve repeated missions from plan_cache instead of the model
+
+# Shared HTTP client: one keep-alive connection pool for every Ollama call
+OLLAMA_MAX_CONNECTIONS = 4
+OLLAMA_MAX_KEEPALIVE_CONNECTIONS = 2
+OLLAMA_KEEPALIVE_EXPIRY_S = 60.0
+
+try:
+    import h2 # noqa: F401 (enables httpx HTTP/2 when the server offers it)
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+_ollama_client = None
+
+def get_ollama_client() -> httpx.AsyncClient:
+    global _ollama_client
+    if _ollama_client is None or _ollama_client.is_closed:
+        _ollama_client = httpx.AsyncClient(
+            base_url=OLLAMA_HOST,
+            timeout=OLLAMA_TIMEOUT_S,
+            limits=httpx.Limits(
+                max_connections=OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY_S
+            ),
+            http2=_HTTP2_AVAILABLE
+        )
+    return _ollama_client
+
+async def close_ollama_client():
+    global _ollama_client
+    if _ollama_client is not None:
+        await _ollama_client.aclose()
+        _ollama_client = None
+
+
+class IncrementalJSONObjectParser:
+    """
+    Scans streamed text and returns the first complete top-level JSON object as
+    soon as its closing brace arrives. Text outside the object (markdown fences,
+    trailing whitespace) is ignored.
+    """
 
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str):
+        self.text += chunk
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = self._depth > 0
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._pos = i + 1
+                    return json.loads(text[self._start:i + 1])
+        self._pos = len(text)
+        return None
+
+
+# Timing fields Ollama reports with a finished response (durations in nanoseconds)
+OLLAMA_TIMING_FIELDS = ("total_duration", "load_duration", "prompt_eval_count",
+                        "prompt_eval_duration", "eval_count", "eval_duration")
+
+def _copy_ollama_timings(body: dict, call_stats: dict):
+    for field in OLLAMA_TIMING_FIELDS:
+        if field in body:
+            call_stats[field] = body[field]
+
+async def _generate_json(client: httpx.AsyncClient, payload: dict, call_stats: dict = None):
+    """
+    Runs /api/generate and returns the parsed JSON object. In streaming mode the
+    object is returned as soon as it is complete and the response is closed,
+    which makes Ollama stop generating the remaining tokens.
+
+    call_stats, if given, receives the wall-clock time to the first token and to
+    the parsed object, the time spent parsing, plus Ollama's own timing fields when
+    the generation ran to completion (a stream cancelled early never receives them).
+    """
+    call_stats = call_stats if call_stats is not None else {}
+    started = time.perf_counter()
+    if not payload.get("stream"):
+        response = await client.post("/api/generate", json=payload)
+        response.raise_for_status()
+        body = response.json()
+        call_stats["http_ms"] = (time.perf_counter() - started) * 1000
+        _copy_ollama_timings(body, call_stats)
+        raw_text = body.get("response", "").strip()
+        parse_started = time.perf_counter()
+        # Clean up potential markdown fences
+        parsed_json = json.loads(raw_text.replace("```json", "").replace("```", "").strip())
+        call_stats["parse_ms"] = (time.perf_counter() - parse_started) * 1000
+        return parsed_json
+
+    parser = IncrementalJSONObjectParser()
+    async with client.stream("POST", "/api/generate", json=payload) as response:
+        if response.is_error:
+            await response.aread()
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if "error" in chunk:
+                raise RuntimeError(f"Ollama stream error: {chunk['error']}")
+            if "first_token_ms" not in call_stats:
+                call_stats["first_token_ms"] = (time.perf_counter() - started) * 1000
+            if chunk.get("done"):
+                _copy_ollama_timings(chunk, call_stats)
+            parse_started = time.perf_counter()
+            parsed_json = parser.feed(chunk.get("response", ""))
+            call_stats["parse_ms"] = call_stats.get("parse_ms", 0.0) + (time.perf_counter() - parse_started) * 1000
+            if parsed_json is not None:
+                call_stats["http_ms"] = (time.perf_counter() - started) * 1000
+                call_stats["early_exit"] = not chunk.get("done", False)
+                return parsed_json
+            if chunk.get("done"):
+                break
+    call_stats["http_ms"] = (time.perf_counter() - started) * 1000
+    # The stream ended without a complete object; let json report why.
+    return json.loads(parser.text.strip())
 
-async def get_ollama_action(mission_statement: str) -> Dict[str, Any]:
-    prompt_content = f"""
+def format_call_stats(call_stats: dict):
+    parts = [f"{call_stats.get('model', '?')}", f"http={call_stats.get('http_ms', 0):.0f}ms"]
+    if "first_token_ms" in call_stats:
+        parts.append(f"first_token={call_stats['first_token_ms']:.0f}ms")
+    if "prompt_eval_count" in call_stats:
+        parts.append(f"prompt_eval_count={call_stats['prompt_eval_count']}")
+        parts.append(f"prompt_eval={call_stats.get('prompt_eval_duration', 0) / 1e6:.0f}ms")
+        parts.append(f"eval_count={call_stats.get('eval_count', 0)}")
+        parts.append(f"total={call_stats.get('total_duration', 0) / 1e6:.0f}ms")
+    elif call_stats.get("early_exit"):
+        parts.append("early_exit (no Ollama counters)")
+    return " ".join(parts)
+
+
+# Stats of the most recent Ollama calls, newest last
+OLLAMA_CALL_LOG = deque(maxlen=OLLAMA_CALL_LOG_SIZE)
+
+def _record_call(call_stats: dict):
+    OLLAMA_CALL_LOG.append(call_stats)
+    if OLLAMA_LOG_TIMINGS:
+        print(f"[Ollama timings] {format_call_stats(call_stats)}")
+
+
+# Static planner instructions, sent as the system prompt so Ollama can reuse their KV cache
+SYSTEM_PROMPT = """
 You are a highly accurate Drone Mission Planner AI.
 
 Your task is to convert the given mission statement (written in simple natural language) into a step-by-step list of **structured micro steps** for the drone.
@@ -25,49 +196,76 @@ You are limited to using only **three actions**:
 - The value is a string describing the action and parameters.
 
 ### Example JSON Format:
-{{
+{
   "step 1": "takeoff to 20m",
   "step 2": "goto north 5m, east -10m, altitude 20m",
   "step 3": "goto north 10m, east -5m, altitude 30m",
   "step 4": "land"
-}}
+}
+"""
 
-### Mission:
-{mission_statement}
+SYSTEM_PROMPT_HASH = prompt_hash(SYSTEM_PROMPT)
+
+# Appended to the mission prompt when the drone left its plan and the rest must be planned from where it is
+REPLAN_PROMPT = """
+### Replan:
+The previous plan ({total_steps} steps) was abandoned during step {step} ({op}). Reason: {reason}.
+The drone is {state} at {altitude_m:.1f}m altitude, {north_m:.1f}m north and {east_m:.1f}m east of where the mission started.
+Plan only the rest of the mission, starting from the drone's current position.{takeoff_rule}
 """
 
+def mission_prompt(mission_statement: str, replan: dict = None) -> str:
+    """
+    The per-mission prompt. `replan` describes an interrupted plan: the
+    deviation (step, total_steps, op, reason) and the drone's current state
+    (in_air, altitude_m, and north_m/east_m from where the mission started).
+    """
+    prompt = f"### Mission:\n{mission_statement}\n"
+    if replan:
+        prompt += REPLAN_PROMPT.format(
+            state="flying" if replan["in_air"] else "on the ground",
+            takeoff_rule=" It is already in the air: do not take off again." if replan["in_air"] else "",
+            **replan)
+    return prompt
+
+def invalidate_cached_plan(mission_statement: str):
+    get_plan_cache().invalidate(mission_statement, OLLAMA_MODEL, SYSTEM_PROMPT_HASH)
+
+async def get_ollama_action(mission_statement: str, client: httpx.AsyncClient = None,
+                            use_cache: bool = OLLAMA_USE_PLAN_CACHE, refresh: bool = False,
+                            replan: dict = None) -> Dict[str, Any]:
+    """
+    Plans `mission_statement`. Plans are served from the on-disk plan cache when
+    this mission was planned before with the same model and system prompt;
+    refresh=True asks the model again and replaces the stored plan.
+    A `replan` (see mission_prompt) plans the rest of an interrupted mission
+    from the drone's current position and never touches the cache.
+    """
+    use_cache = use_cache and not replan
+    if use_cache and not refresh:
+        plan = get_plan_cache().get(mission_statement, OLLAMA_MODEL, SYSTEM_PROMPT_HASH)
+        if plan is not None:
+            return plan
+
     payload = {
         "model": OLLAMA_MODEL,
-        "prompt": prompt_content,
-        "stream": False,
-        "format": "json"
+        "system": SYSTEM_PROMPT,
+        "prompt": mission_prompt(mission_statement, replan),
+        "stream": OLLAMA_STREAM,
+        "format": "json",
+        "keep_alive": OLLAMA_KEEP_ALIVE
     }
 
+    call_stats = {"model": OLLAMA_MODEL}
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(f"{OLLAMA_HOST}/api/generate", json=payload)
-            response.raise_for_status()
-
-            response_json = response.json()
-            raw_text = response_json.get("response", "").strip()
-
-            try:
-                # Attempt to parse directly
-                parsed_json = json.loads(raw_text)
-                return parsed_json
-            except json.JSONDecodeError:
-                # Fallback: Clean markdown artifacts if any (shouldn't happen with format='json')
-                clean_text = (
-                    raw_text.replace("```json", "")
-                    .replace("```", "")
-                    .strip()
-                )
-                parsed_json = json.loads(clean_text)
-                return parsed_json
+        plan = await _generate_json(client or get_ollama_client(), payload, call_stats)
+        if use_cache and plan.get("action") != "error":
+            get_plan_cache().put(mission_statement, OLLAMA_MODEL, SYSTEM_PROMPT_HASH, plan)
+        return plan
 
     except json.JSONDecodeError as e:
         print(f"[ERROR] JSON parsing error from Ollama: {e}")
-        print(f"[DEBUG] Ollama Raw Response:\n{raw_text}")
+        print(f"[DEBUG] Ollama Raw Response:\n{e.doc}")
         return {"action": "error", "message": f"Invalid JSON response: {e}"}
 
     except httpx.RequestError as e:
@@ -81,6 +279,8 @@ You are limited to using only **three actions**:
     except Exception as e:
         print(f"[ERROR] Unexpected error: {e}")
         return {"action": "error", "message": f"Unexpected error: {e}"}
+    finally:
+        _record_call(call_stats)
 
 
 async def main_ollama_test():
@@ -89,10 +289,14 @@ async def main_ollama_test():
        "takeoff at 10m and inspect reagion in 10m radius."
     ]
     
-    for t in testcases:
-        print(f"Testing Ollama -> {t}:")
-        llm_output = await get_ollama_action(t)
-        print(json.dumps(llm_output, indent=2))
+    try:
+        for t in testcases:
+            print(f"Testing Ollama -> {t}:")
+            llm_output = await get_ollama_action(t)
+            print(json.dumps(llm_output, indent=2))
+        print(f"Plan cache: {get_plan_cache().stats()}")
+    finally:
+        await close_ollama_client()
     
     
     
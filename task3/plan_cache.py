@@ -0,0 +1,188 @@
+# plan_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+
+def default_plan_cache_path():
+    """
+    $OD_PLAN_CACHE_PATH, else mission_plans.sqlite3 in the user's cache directory
+    ($XDG_CACHE_HOME or ~/.cache, %LOCALAPPDATA% on Windows), never the source tree.
+    """
+    if os.environ.get("OD_PLAN_CACHE_PATH"):
+        return os.environ["OD_PLAN_CACHE_PATH"]
+    cache_home = os.environ.get("LOCALAPPDATA" if os.name == "nt" else "XDG_CACHE_HOME")
+    return os.path.join(cache_home or os.path.join(os.path.expanduser("~"), ".cache"), "od-test", "mission_plans.sqlite3")
+
+PLAN_CACHE_PATH = default_plan_cache_path()
+PLAN_CACHE_MAX_ENTRIES = 1000
+PLAN_CACHE_MAX_BYTES = 8 * 1024 * 1024 # Total size of stored plan JSON
+PLAN_CACHE_WARM_START = 20 # Most-used plans loaded into memory when the cache opens
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    key TEXT PRIMARY KEY,
+    mission TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    plan TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS plans_last_used ON plans (last_used);
+"""
+
+
+def _sha256(text: str):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def prompt_hash(system_prompt: str):
+    return _sha256(system_prompt)[:16]
+
+def plan_key(mission: str, model: str, prompt_hash: str):
+    # Whitespace differences do not make a different mission
+    return _sha256(f"{model}\0{prompt_hash}\0{' '.join(mission.split())}")
+
+
+class PlanCache:
+    """
+    Content-addressed SQLite store of parsed planner responses, keyed on
+    mission text + model + system prompt hash. Least recently used plans are
+    evicted once the entry or byte limit is exceeded; every plan carries a
+    checksum and a corrupt row is dropped instead of returned.
+    """
+
+    def __init__(self, path=None, max_entries=PLAN_CACHE_MAX_ENTRIES,
+                 max_bytes=PLAN_CACHE_MAX_BYTES, warm_start=PLAN_CACHE_WARM_START):
+        self.path = path or PLAN_CACHE_PATH
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = {} # key -> plan, for warm-started and recently used plans
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.corrupt = 0
+        self._db = self._open()
+        if warm_start:
+            self.warm_start(warm_start)
+
+    def _open(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path)
+        try:
+            ok = db.execute("PRAGMA quick_check").fetchone()[0] == "ok"
+        except sqlite3.DatabaseError:
+            ok = False
+        if not ok:
+            # Keep the damaged file for inspection and start over
+            db.close()
+            print(f"Plan cache {self.path} failed its integrity check, starting a new one.")
+            os.replace(self.path, f"{self.path}.corrupt-{int(time.time())}")
+            db = sqlite3.connect(self.path)
+        db.executescript(_SCHEMA)
+        return db
+
+    def close(self):
+        self._db.close()
+
+    def warm_start(self, count):
+        """Loads the `count` most frequently used plans into memory."""
+        rows = self._db.execute(
+            "SELECT key, plan, checksum FROM plans ORDER BY hits DESC, last_used DESC LIMIT ?", (count,)
+        ).fetchall()
+        for key, plan_json, checksum in rows:
+            plan = self._decode(key, plan_json, checksum)
+            if plan is not None:
+                self._memory[key] = plan
+        return len(self._memory)
+
+    def _decode(self, key, plan_json, checksum):
+        if _sha256(plan_json) == checksum:
+            try:
+                return json.loads(plan_json)
+            except ValueError:
+                pass
+        print(f"Dropping corrupt plan cache entry {key[:12]}.")
+        self.corrupt += 1
+        self._memory.pop(key, None)
+        with self._db:
+            self._db.execute("DELETE FROM plans WHERE key = ?", (key,))
+        return None
+
+    def get(self, mission: str, model: str, prompt_hash: str):
+        key = plan_key(mission, model, prompt_hash)
+        plan = self._memory.get(key)
+        if plan is None:
+            row = self._db.execute("SELECT plan, checksum FROM plans WHERE key = ?", (key,)).fetchone()
+            plan = self._decode(key, *row) if row else None
+        if plan is None:
+            self.misses += 1
+            return None
+        self._memory[key] = plan
+        with self._db:
+            self._db.execute("UPDATE plans SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+        self.hits += 1
+        return json.loads(json.dumps(plan)) # Callers may modify their copy
+
+    def put(self, mission: str, model: str, prompt_hash: str, plan: dict):
+        key = plan_key(mission, model, prompt_hash)
+        plan_json = json.dumps(plan, sort_keys=True, separators=(",", ":"))
+        now = time.time()
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO plans (key, mission, model, prompt_hash, plan, checksum, size, created_at, last_used, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE((SELECT hits FROM plans WHERE key = ?), 0))",
+                (key, mission, model, prompt_hash, plan_json, _sha256(plan_json), len(plan_json), now, now, key)
+            )
+        self._memory[key] = json.loads(plan_json)
+        self._evict()
+
+    def invalidate(self, mission: str, model: str, prompt_hash: str):
+        key = plan_key(mission, model, prompt_hash)
+        self._memory.pop(key, None)
+        with self._db:
+            self._db.execute("DELETE FROM plans WHERE key = ?", (key,))
+
+    def _evict(self):
+        count, total_bytes = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM plans").fetchone()
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+        with self._db:
+            for key, size in self._db.execute("SELECT key, size FROM plans ORDER BY last_used ASC").fetchall():
+                if count <= self.max_entries and total_bytes <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM plans WHERE key = ?", (key,))
+                self._memory.pop(key, None)
+                count -= 1
+                total_bytes -= size
+                self.evictions += 1
+
+    def stats(self):
+        count, total_bytes = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM plans").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "bytes": total_bytes,
+            "in_memory": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "corrupt": self.corrupt,
+        }
+
+
+_plan_cache = None
+
+def get_plan_cache():
+    global _plan_cache
+    if _plan_cache is None:
+        _plan_cache = PlanCache()
+    return _plan_cache
+
@@ -0,0 +1,34 @@
+import importlib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASKS = ("task1", "task2", "task3")
+
+sys.path.insert(0, os.path.join(ROOT, "sim"))
+
+_task_modules = {} # task -> {module name: module} imported from that task directory
+
+
+def import_task_module(task, name):
+    """
+    Imports <task>/<name>.py. The task directories use flat imports with
+    clashing module names (telemetry, geodesy, ...), so every task gets its own
+    set of modules and none of them stays in sys.modules for the next task.
+    """
+    modules = _task_modules.setdefault(task, {})
+    if name not in modules:
+        task_dir = os.path.join(ROOT, task)
+        local_names = {file[:-3] for file in os.listdir(task_dir) if file.endswith(".py")}
+        outside = {module: sys.modules.pop(module) for module in local_names if module in sys.modules}
+        sys.modules.update(modules)
+        sys.path.insert(0, task_dir)
+        try:
+            importlib.import_module(name)
+        finally:
+            sys.path.remove(task_dir)
+            for module in local_names:
+                if module in sys.modules:
+                    modules[module] = sys.modules.pop(module)
+            sys.modules.update(outside)
+    return modules[name]
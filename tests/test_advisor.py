@@ -0,0 +1,116 @@
+import asyncio
+import types
+
+import fake_mavsdk
+from conftest import import_task_module
+
+TIME_FACTOR = 50.0 # simulated seconds per event loop second
+
+
+class IdleCommands:
+    """A command source that never sends a command."""
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def get(self):
+        await asyncio.Event().wait()
+
+
+def fly_task2_advisor(decide=None, **advisor_kwargs):
+    """
+    Runs the task2 advisor on an airborne fake vehicle, then stops it the way
+    Ctrl-C does. Returns the simulated vehicle and what the advisor task ended with.
+    """
+    telemetry = import_task_module("task2", "telemetry")
+    drone_action = import_task_module("task2", "drone_action")
+    advisor = import_task_module("task2", "main")
+
+    async def hold(human_command, telemetry_data, call_stats=None):
+        return {"action": "hold", "reason": "test"}
+
+    async def run():
+        drone = await telemetry.connect_drone(system_factory=lambda: fake_mavsdk.System(time_factor=TIME_FACTOR))
+        try:
+            executor = drone_action.DroneActionExecutor(drone)
+            assert await executor.arm_drone()
+            assert await executor.takeoff_drone(10.0)
+            task = asyncio.create_task(advisor.run_ollama_drone_advisor(
+                drone=drone, decide=decide or hold, command_source=IdleCommands(), **advisor_kwargs))
+            await asyncio.sleep(1.0)
+            task.cancel()
+            outcome, = await asyncio.wait_for(asyncio.gather(task, return_exceptions=True), 30.0)
+            return drone.vehicle, outcome
+        finally:
+            await telemetry.stop_telemetry_cache(drone)
+            await drone.close()
+    return asyncio.run(run())
+
+def assert_landed_safely(vehicle):
+    assert vehicle.commands["return_to_launch"] == 1
+    assert not vehicle.in_air and not vehicle.crashed
+    assert not vehicle.armed
+
+
+def test_recorder_failure_does_not_skip_landing(monkeypatch, tmp_path):
+    advisor = import_task_module("task2", "main")
+    close = advisor.TelemetryRecorder.close
+    async def failing_close(self):
+        await close(self)
+        raise OSError(28, "No space left on device")
+    monkeypatch.setattr(advisor.TelemetryRecorder, "close", failing_close)
+
+    vehicle, outcome = fly_task2_advisor(telemetry_log_dir=str(tmp_path))
+    assert not isinstance(outcome, OSError)
+    assert_landed_safely(vehicle)
+
+def test_tick_export_failure_does_not_skip_landing(monkeypatch, tmp_path):
+    advisor = import_task_module("task2", "main")
+    monkeypatch.setattr(advisor, "TICK_TIMINGS_EXPORT_PATH", str(tmp_path / "missing" / "ticks.jsonl"))
+
+    vehicle, outcome = fly_task2_advisor()
+    assert not isinstance(outcome, OSError)
+    assert_landed_safely(vehicle)
+
+def test_task1_tick_export_failure_does_not_skip_landing(monkeypatch, tmp_path):
+    advisor = import_task_module("task1", "main")
+    telemetry = import_task_module("task1", "telemetry")
+    monkeypatch.setattr(advisor, "TICK_TIMINGS_EXPORT_PATH", str(tmp_path / "missing" / "ticks.jsonl"))
+    drones = []
+    async def connect_sim_drone():
+        drones.append(await telemetry.connect_drone(system_factory=lambda: fake_mavsdk.System(time_factor=TIME_FACTOR)))
+        return drones[0]
+    async def advice(telemetry_data, call_stats=None):
+        return {"summary": "ok", "issues_detected": [], "suggested_action": "none"}
+    async def no_wait(seconds):
+        pass
+    monkeypatch.setattr(advisor, "connect_drone", connect_sim_drone)
+    monkeypatch.setattr(advisor, "get_ollama_response", advice)
+    # Only the advisor's own sleeps: its 10 s wait for the landing
+    monkeypatch.setattr(advisor, "asyncio", types.SimpleNamespace(sleep=no_wait))
+
+    async def run():
+        try:
+            await advisor.run_ollama_drone_advisor(duration_seconds=0.2, update_interval_seconds=0)
+        finally:
+            await telemetry.stop_telemetry_cache(drones[0])
+            await drones[0].close()
+    asyncio.run(run())
+    assert drones[0].vehicle.commands["land"] == 1
+    assert drones[0].vehicle.commands["kill"] == 1
+
+def test_tick_source_names_where_the_decision_came_from(tmp_path):
+    tick_timing = import_task_module("task2", "tick_timing")
+    tick_timer = tick_timing.TickTimer()
+    llm_calls = []
+    async def decide(human_command, telemetry_data, call_stats=None):
+        llm_calls.append(human_command)
+        return {"action": "hold", "reason": "test"}
+
+    fly_task2_advisor(decide=decide, tick_timer=tick_timer)
+    sources = [tick.get("source") for tick in tick_timer.ticks]
+    assert sources and set(sources) <= {"rule", "cache", "llm"}
+    assert sources.count("llm") == len(llm_calls)
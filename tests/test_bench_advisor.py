@@ -0,0 +1,72 @@
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+
+import pytest
+
+from conftest import ROOT
+
+
+@pytest.fixture
+def bench():
+    spec = importlib.util.spec_from_file_location("bench_advisor", os.path.join(ROOT, "benchmarks", "bench_advisor.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def result(**overrides):
+    return dict({"decisions_per_s": 10.0, "tick_p50_ms": 1.0, "tick_p95_ms": 2.0, "snapshot_p50_us": 5.0,
+                 "snapshot_p99_us": 9.0, "prompt_bytes_per_request": 800.0, "rss_growth_kb_per_tick": 0.1}, **overrides)
+
+def baseline(*tasks):
+    return {"meta": {"created": "then"}, "results": {task: result() for task in tasks}}
+
+
+def test_crashed_task_is_a_regression(bench):
+    regressions = bench.compare({"task1": result()}, baseline("task1", "task3"), 0.15)
+    assert regressions == [("task3", "result", None, None)]
+
+def test_task_not_run_is_not_a_regression(bench):
+    assert bench.compare({"task1": result()}, baseline("task1", "task3"), 0.15, tasks=["task1"]) == []
+
+def test_missing_metric_is_a_regression(bench):
+    new = result()
+    del new["tick_p95_ms"]
+    assert bench.compare({"task1": new}, baseline("task1"), 0.15) == [("task1", "tick_p95_ms", 2.0, None)]
+
+def test_slower_metric_is_a_regression(bench):
+    regressions = bench.compare({"task1": result(tick_p50_ms=1.5)}, baseline("task1"), 0.15)
+    assert regressions == [("task1", "tick_p50_ms", 1.0, 1.5)]
+
+
+def run_with_workers(bench, monkeypatch, worker, result_paths):
+    def fake_run(command, cwd=None):
+        path = command[command.index("--result") + 1]
+        result_paths.append(path)
+        return subprocess.CompletedProcess(command, worker(command[command.index("--worker") + 1], path))
+    monkeypatch.setattr(bench.subprocess, "run", fake_run)
+    args = argparse.Namespace(tasks=["task1", "task2", "task3"], duration=1.0, time_factor=1.0,
+                              profile="instant", verbose=False)
+    return bench.run_benchmarks(args)
+
+def test_run_benchmarks_drops_failed_tasks_and_removes_result_files(bench, monkeypatch):
+    def worker(task, path):
+        if task == "task1":
+            with open(path, "w") as f:
+                json.dump(result(), f)
+            return 0
+        return 1 if task == "task2" else 0 # task3 exits cleanly without writing a result
+    result_paths = []
+    results = run_with_workers(bench, monkeypatch, worker, result_paths)
+    assert list(results) == ["task1"]
+    assert len(result_paths) == 3 and not any(os.path.exists(path) for path in result_paths)
+
+def test_result_file_removed_when_the_run_raises(bench, monkeypatch):
+    def worker(task, path):
+        raise KeyboardInterrupt
+    result_paths = []
+    with pytest.raises(KeyboardInterrupt):
+        run_with_workers(bench, monkeypatch, worker, result_paths)
+    assert len(result_paths) == 1 and not os.path.exists(result_paths[0])
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+from conftest import import_task_module
+
+
+@pytest.fixture
+def command_source():
+    return import_task_module("task2", "command_source")
+
+async def send(open_connection, *commands):
+    """Sends one command per line and returns the server's replies."""
+    reader, writer = await open_connection()
+    replies = []
+    for command in commands:
+        writer.write(command.encode() + b"\n")
+        await writer.drain()
+        replies.append(await reader.readline())
+    writer.close()
+    await writer.wait_closed()
+    return replies
+
+async def next_command(source):
+    return await asyncio.wait_for(source.get(), 1.0)
+
+
+def test_tcp_commands_are_delivered_in_order(command_source):
+    async def run():
+        source = command_source.CommandSource(use_stdin=False, tcp_port=0) # any free port
+        await source.start()
+        try:
+            port = source._servers[0].sockets[0].getsockname()[1]
+            connect = lambda: asyncio.open_connection("127.0.0.1", port)
+            replies = await send(connect, "Take off to 10m", "   ", "  Land  ")
+            assert replies == [b"ok\n"] * 3
+            assert [await next_command(source), await next_command(source)] == ["Take off to 10m", "Land"]
+            # A second client is served by the same source
+            await send(connect, "RTL")
+            assert await next_command(source) == "RTL"
+            assert source.received == 3 and source.queue.empty()
+        finally:
+            await source.stop()
+        with pytest.raises(OSError):
+            await asyncio.open_connection("127.0.0.1", port)
+    asyncio.run(run())
+
+@pytest.mark.skipif(not hasattr(asyncio, "open_unix_connection"), reason="no Unix sockets")
+def test_unix_socket_commands(command_source, tmp_path):
+    path = str(tmp_path / "commands.sock")
+    async def run():
+        source = command_source.CommandSource(use_stdin=False, unix_path=path)
+        await source.start()
+        try:
+            await send(lambda: asyncio.open_unix_connection(path), "Land")
+            assert await next_command(source) == "Land"
+        finally:
+            await source.stop()
+        assert not os.path.exists(path)
+    asyncio.run(run())
+
+@pytest.mark.skipif(sys.platform == "win32", reason="the selector cannot watch pipes on Windows")
+def test_stdin_lines_split_across_reads(command_source, monkeypatch, capsys):
+    read_fd, write_fd = os.pipe()
+    monkeypatch.setattr(sys, "stdin", os.fdopen(read_fd))
+    async def run():
+        source = command_source.CommandSource(prompt="> ")
+        await source.start()
+        try:
+            os.write(write_fd, b"Take off to 10m\nLa")
+            assert await next_command(source) == "Take off to 10m"
+            os.write(write_fd, b"nd\n")
+            assert await next_command(source) == "Land"
+            os.close(write_fd) # EOF stops the stdin reader
+            await asyncio.sleep(0.05)
+            assert source._stdin_fd is None
+        finally:
+            await source.stop()
+            sys.stdin.close()
+    asyncio.run(run())
+    assert capsys.readouterr().out.count("> ") == 3 # at start, and after each completed read
@@ -0,0 +1,100 @@
+import types
+
+import pytest
+
+from conftest import import_task_module
+
+CELL = 2_500_000 # a 1 m cell index north of the equator, ~22.5 degrees
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1000.0)
+    module = import_task_module("task2", "decision_cache")
+    monkeypatch.setattr(module, "time", types.SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+@pytest.fixture
+def decision_cache(clock):
+    return import_task_module("task2", "decision_cache")
+
+def hovering(north_m=CELL + 0.5, altitude_m=10.5, battery=80, **overrides):
+    return dict({
+        "position": {"latitude_deg": north_m / 111320.0, "longitude_deg": 0.0, "relative_altitude_m": altitude_m},
+        "battery": {"remaining_percent": battery},
+        "in_air": True,
+        "armed": True,
+        "flight_mode": "HOLD",
+        "gps_info": {"fix_type": 3},
+        "health": {"armable": True, "global_position_ok": True},
+    }, **overrides)
+
+HOLD = {"action": "hold", "reason": "Holding"}
+
+
+def test_hit_returns_a_copy(decision_cache):
+    cache = decision_cache.DecisionCache()
+    assert cache.get("Hold", hovering()) is None
+    cache.put("Hold", hovering(), HOLD)
+    decision = cache.get("Hold", hovering())
+    assert decision == HOLD
+    decision["action"] = "land"
+    assert cache.get("Hold", hovering()) == HOLD
+    assert cache.get("Land", hovering()) is None
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+@pytest.mark.parametrize("stored, looked_up, hit", [
+    (hovering(north_m=CELL + 0.1), hovering(north_m=CELL + 0.9), True),
+    (hovering(north_m=CELL + 0.9), hovering(north_m=CELL + 1.1), False),
+    (hovering(north_m=CELL - 0.1), hovering(north_m=CELL + 0.1), False),
+    (hovering(altitude_m=10.1), hovering(altitude_m=10.9), True),
+    (hovering(altitude_m=10.9), hovering(altitude_m=11.1), False),
+    (hovering(battery=80), hovering(battery=79), False),
+    (hovering(), hovering(flight_mode="LAND"), False),
+    (hovering(), hovering(gps_info={"fix_type": 1}), False),
+    (hovering(), hovering(health={"armable": True, "global_position_ok": False}), False),
+    (hovering(), hovering(armed=False, in_air=False), False),
+], ids=["same 1 m cell", "next cell north", "cell boundary", "same 1 m altitude band",
+        "next altitude band", "battery percent", "flight mode", "gps fix", "health", "armed/in air"])
+def test_quantized_fingerprint_boundary(decision_cache, stored, looked_up, hit):
+    cache = decision_cache.DecisionCache()
+    cache.put("Hold", stored, HOLD)
+    assert (cache.get("Hold", looked_up) is not None) == hit
+
+def test_coarser_steps_widen_the_cell(decision_cache):
+    cache = decision_cache.DecisionCache(position_step_m=5.0, altitude_step_m=5.0, battery_step_percent=10)
+    cache.put("Hold", hovering(north_m=CELL + 0.1, altitude_m=10.1, battery=80), HOLD)
+    assert cache.get("Hold", hovering(north_m=CELL + 4.0, altitude_m=14.0, battery=89)) == HOLD
+
+def test_entries_expire_after_ttl(decision_cache, clock):
+    cache = decision_cache.DecisionCache(ttl_s=30.0)
+    cache.put("Hold", hovering(), HOLD)
+    clock.now += 30.0
+    assert cache.get("Hold", hovering()) == HOLD
+    clock.now += 0.1 # a hit does not refresh the entry's age
+    assert cache.get("Hold", hovering()) is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["entries"] == 0
+
+def test_evicts_least_recently_used(decision_cache):
+    cache = decision_cache.DecisionCache(max_entries=2)
+    cache.put("Hold", hovering(), HOLD)
+    cache.put("Land", hovering(), {"action": "land"})
+    assert cache.get("Hold", hovering()) == HOLD # "Land" is now the least recently used
+    cache.put("RTL", hovering(), {"action": "rtl"})
+    assert cache.get("Land", hovering()) is None
+    assert cache.get("Hold", hovering()) == HOLD
+    assert cache.get("RTL", hovering()) == {"action": "rtl"}
+    assert cache.stats()["evictions"] == 1
+
+def test_error_actions_are_never_cached(decision_cache):
+    cache = decision_cache.DecisionCache()
+    cache.put("Go", hovering(), {"action": "error", "message": "Ollama connection failed"})
+    assert cache.get("Go", hovering()) is None
+    assert cache.stats()["entries"] == 0
+
+def test_missing_telemetry_still_fingerprints(decision_cache):
+    cache = decision_cache.DecisionCache()
+    cache.put("Hold", {}, HOLD)
+    assert cache.get("Hold", {"position": None, "battery": None}) == HOLD
+    cache.clear()
+    assert cache.get("Hold", {}) is None
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+import fake_mavsdk
+from conftest import import_task_module
+
+TIME_FACTOR = 20.0       # simulated seconds per event loop second
+TARGET_OFFSET_DEG = 1e-3 # ~110 m north of home, several seconds of simulated cruise
+
+
+def fly(task, scenario):
+    telemetry = import_task_module(task, "telemetry")
+    drone_action = import_task_module(task, "drone_action")
+
+    async def run():
+        drone = await telemetry.connect_drone(system_factory=lambda: fake_mavsdk.System(time_factor=TIME_FACTOR))
+        executor = drone_action.DroneActionExecutor(drone)
+        try:
+            assert await executor.arm_drone()
+            assert await executor.takeoff_drone(10.0)
+            return await asyncio.wait_for(scenario(drone, executor), 10.0)
+        finally:
+            await telemetry.stop_telemetry_cache(drone)
+            await drone.close()
+    return asyncio.run(run())
+
+async def wait_for_progress(handle, progress):
+    while handle.progress < progress and not handle.done():
+        await asyncio.sleep(0.01)
+    assert not handle.done(), handle
+
+def target(north_deg=TARGET_OFFSET_DEG, alt=10.0):
+    lat, lon = fake_mavsdk.SIM_HOME
+    return lat + north_deg, lon, alt
+
+def distance_to(executor, lat, lon):
+    vehicle = executor.drone.vehicle
+    return executor._calculate_distance(vehicle.latitude_deg(), vehicle.longitude_deg(), lat, lon)
+
+
+TASKS = ("task2", "task3")
+
+@pytest.mark.parametrize("task", TASKS)
+def test_goto_survives_hold_and_routine_actions(task):
+    async def scenario(drone, executor):
+        goto = executor.goto_location(*target())
+        await wait_for_progress(goto, 0.2)
+        # What the planner turns an LLM "hold" or "error" reply into, plus other routine actions
+        rejected = [
+            executor.hold_drone("No specific command, conditions not met, or already at target."),
+            executor.hold_drone("LLM requested human intervention due to error."),
+            executor.arm_drone(),
+            executor.takeoff_drone(10.0),
+            executor.goto_location(*target()), # same target again
+        ]
+        assert [handle.status for handle in rejected] == ["rejected"] * len(rejected)
+        assert executor.current_handle is goto
+        assert await goto
+        return goto
+
+    goto = fly(task, scenario)
+    assert goto.status == "done"
+
+@pytest.mark.parametrize("task", TASKS)
+def test_new_goto_target_replaces_running_goto(task):
+    async def scenario(drone, executor):
+        first = executor.goto_location(*target())
+        await wait_for_progress(first, 0.1)
+        lat, lon, alt = target(north_deg=-TARGET_OFFSET_DEG / 2)
+        second = executor.goto_location(lat, lon, alt)
+        assert second.status == "running"
+        assert await second
+        assert first.status == "cancelled"
+        assert distance_to(executor, lat, lon) < 3.0
+    fly(task, scenario)
+
+@pytest.mark.parametrize("task", TASKS)
+def test_safety_action_preempts_goto(task):
+    async def scenario(drone, executor):
+        goto = executor.goto_location(*target())
+        await wait_for_progress(goto, 0.1)
+        land = executor.land_drone()
+        assert land.status == "running"
+        assert executor.goto_location(*target(north_deg=0.0)).status == "rejected"
+        assert await land
+        assert goto.status == "cancelled"
+        assert drone.vehicle.altitude_m < 0.5
+    fly(task, scenario)
+
+@pytest.mark.parametrize("task", TASKS)
+@pytest.mark.parametrize("altitude_m", [0.0, -5.0, float("nan")])
+def test_takeoff_below_ground_is_rejected(task, altitude_m):
+    telemetry = import_task_module(task, "telemetry")
+    drone_action = import_task_module(task, "drone_action")
+
+    async def run():
+        drone = await telemetry.connect_drone(system_factory=lambda: fake_mavsdk.System(time_factor=TIME_FACTOR))
+        executor = drone_action.DroneActionExecutor(drone)
+        try:
+            assert await executor.arm_drone()
+            takeoff = executor.takeoff_drone(altitude_m)
+            assert takeoff.status == "rejected"
+            assert await takeoff is False
+            return drone.vehicle
+        finally:
+            await telemetry.stop_telemetry_cache(drone)
+            await drone.close()
+
+    vehicle = asyncio.run(run())
+    assert vehicle.commands["takeoff"] == 0
+    assert vehicle.armed and not vehicle.in_air
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+
+import fake_mavsdk
+from conftest import import_task_module
+
+
+@pytest.fixture
+def fleet():
+    return import_task_module("task2", "fleet")
+
+
+class HangingSystem(fake_mavsdk.System):
+    """A vehicle that never answers, and remembers being closed."""
+    closed = False
+
+    async def connect(self, system_address=None):
+        await asyncio.sleep(3600)
+
+    async def close(self):
+        self.closed = True
+        await super().close()
+
+class ServerOnlySystem:
+    """mavsdk.System's shape: no close(), a mavsdk_server stopped by _stop_mavsdk_server()."""
+    stopped = False
+
+    async def connect(self, system_address=None):
+        raise ConnectionError("mavsdk_server did not start")
+
+    def _stop_mavsdk_server(self):
+        self.stopped = True
+
+
+@pytest.mark.parametrize("system_class, closed", [(HangingSystem, "closed"), (ServerOnlySystem, "stopped")])
+def test_connect_failure_closes_the_system(fleet, monkeypatch, system_class, closed):
+    monkeypatch.setattr(fleet, "FLEET_CONNECT_TIMEOUT_S", 0.05)
+    systems = []
+    def system_factory(vehicle):
+        def build():
+            systems.append(system_class())
+            return systems[-1]
+        return build
+
+    vehicle = fleet.parse_vehicles(["udp://:14540"])[0]
+    asyncio.run(fleet._connect(vehicle, system_factory))
+    assert vehicle.drone is None
+    assert vehicle.error.startswith("connect failed")
+    assert len(systems) == 1 and getattr(systems[0], closed)
+
+def test_connect_keeps_the_connected_system(fleet):
+    vehicle = fleet.parse_vehicles(["udp://:14540"])[0]
+    system = fake_mavsdk.System(time_factor=20.0)
+
+    async def run():
+        await fleet._connect(vehicle, lambda vehicle: lambda: system)
+        try:
+            assert vehicle.drone is system and vehicle.error is None
+            assert system.connected
+        finally:
+            await fleet.close_system(system)
+        assert not system.connected
+    asyncio.run(run())
+
+
+async def request(scheduler, vehicle, served, hold_s=0.01):
+    async with scheduler.slot(vehicle):
+        served.append(vehicle)
+        await asyncio.sleep(hold_s)
+
+def test_busy_vehicle_cannot_starve_the_others(fleet):
+    scheduler = fleet.FairScheduler(concurrency=2)
+    served = []
+    async def vehicle_loop(vehicle, requests):
+        for _ in range(requests):
+            await request(scheduler, vehicle, served)
+
+    async def run():
+        await asyncio.gather(vehicle_loop("busy", 30), *(vehicle_loop(f"v{i}", 5) for i in range(1, 5)))
+    asyncio.run(run())
+
+    assert len(served) == 50
+    # While all five vehicles are asking, each gets about a fifth of the slots
+    assert served[:12].count("busy") <= 3
+    assert set(served[:12]) == {"busy", "v1", "v2", "v3", "v4"}
+    # and the quiet vehicles finish long before the busy one
+    assert max(i for i, vehicle in enumerate(served) if vehicle != "busy") < 30
+    assert scheduler.active == 0 and not scheduler._waiting
+    assert scheduler.stats("busy")["requests"] == 30 and scheduler.stats("v1")["requests"] == 5
+
+def test_cancelled_queued_request_releases_its_place(fleet):
+    scheduler = fleet.FairScheduler(concurrency=1)
+    served = []
+
+    async def run():
+        holder = asyncio.create_task(request(scheduler, "a", served))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(request(scheduler, "b", served))
+        await asyncio.sleep(0)
+        queued.cancel()
+        results = await asyncio.gather(holder, queued, return_exceptions=True)
+        assert isinstance(results[1], asyncio.CancelledError)
+        assert (scheduler.active, len(scheduler._waiting)) == (0, 0)
+        # The slot is still usable afterwards
+        await asyncio.wait_for(request(scheduler, "c", served), 1.0)
+    asyncio.run(run())
+    assert served == ["a", "c"]
+    assert scheduler.active == 0
+
+def test_cancelled_after_grant_passes_the_slot_on(fleet):
+    scheduler = fleet.FairScheduler(concurrency=1)
+
+    async def run():
+        await scheduler.acquire("a")
+        granted = asyncio.create_task(scheduler.acquire("b"))
+        waiting = asyncio.create_task(scheduler.acquire("c"))
+        await asyncio.sleep(0)
+        scheduler.release() # hands the slot to "b", whose task has not resumed yet
+        granted.cancel()
+        await asyncio.gather(granted, return_exceptions=True)
+        await asyncio.wait_for(waiting, 1.0)
+        assert (scheduler.active, len(scheduler._waiting)) == (1, 0)
+        scheduler.release()
+    asyncio.run(run())
+    assert scheduler.granted == {"a": 1, "b": 1, "c": 1}
+    assert scheduler.active == 0
+
+def test_route_command(fleet):
+    vehicles = fleet.parse_vehicles(["north=udp://:14540", "udp://:14541", "udp://:14542"])
+    for vehicle in vehicles[:2]:
+        vehicle.drone = object() # the third one never connected
+    names = lambda recipients: [vehicle.name for vehicle in recipients]
+
+    assert names(fleet.route_command(vehicles, "all: RTL")) == ["north", "2"]
+    assert names(fleet.route_command(vehicles, "north: Land")) == ["north"]
+    assert names(fleet.route_command(vehicles, "3: Land")) == []
+    assert names(fleet.route_command(vehicles, "Land")) == []
+    assert names(fleet.route_command(vehicles, "north:  ")) == []
+    assert [vehicle.commands.queue.qsize() for vehicle in vehicles] == [2, 1, 0]
+    assert vehicles[0].commands.queue.get_nowait() == "RTL"
+
+def test_parse_vehicles(fleet):
+    assert [(v.name, v.address, v.index) for v in fleet.parse_vehicles([], count=2)] == [
+        ("1", "udp://:14540", 0), ("2", "udp://:14541", 1)]
+    with pytest.raises(ValueError):
+        fleet.parse_vehicles(["a=udp://:14540", "a=udp://:14541"])
@@ -0,0 +1,111 @@
+import filecmp
+import math
+import os
+
+import pytest
+
+from conftest import ROOT, import_task_module
+
+# task2 and task3 each keep a copy, since every task directory is self-contained
+GEODESY_TASKS = ("task2", "task3")
+R = 6371008.8 # EARTH_RADIUS_M
+
+PARIS = (48.8566, 2.3522)
+LONDON = (51.5074, -0.1278)
+AHMEDABAD = (23.0225, 72.5714)
+ZURICH_SITL = (47.397742, 8.545594)
+
+# (description, function name, arguments, reference value, absolute tolerance).
+# Distances are spherical references for EARTH_RADIUS_M.
+REFERENCE_CASES = [
+    ("1 degree of latitude", "haversine_m", (0.0, 0.0, 1.0, 0.0), 111195.08, 0.01),
+    ("1 degree of longitude at 60N", "haversine_m", (60.0, 0.0, 60.0, 1.0),
+     2 * R * math.asin(math.cos(math.radians(60.0)) * math.sin(math.radians(0.5))), 1e-6),
+    ("Paris to London", "haversine_m", (*PARIS, *LONDON), 343556.0, 1.0),
+    ("antipodes", "haversine_m", (0.0, 0.0, 0.0, 180.0), math.pi * R, 0.01),
+    ("same point", "haversine_m", (*AHMEDABAD, *AHMEDABAD), 0.0, 1e-9),
+    ("fast path at 2 m", "equirectangular_m", (*ZURICH_SITL, ZURICH_SITL[0] + 2 / 111195.08, ZURICH_SITL[1]), 2.0, 1e-6),
+    ("distance_m at 2 m", "distance_m", (*ZURICH_SITL, ZURICH_SITL[0] + 2 / 111195.08, ZURICH_SITL[1]), 2.0, 1e-6),
+    ("distance_m switches to haversine", "distance_m", (*PARIS, *LONDON), 343556.0, 1.0),
+    ("bearing due north", "bearing_deg", (10.0, 20.0, 11.0, 20.0), 0.0, 1e-9),
+    ("bearing due east on the equator", "bearing_deg", (0.0, 0.0, 0.0, 1.0), 90.0, 1e-9),
+    ("bearing due south", "bearing_deg", (11.0, 20.0, 10.0, 20.0), 180.0, 1e-9),
+    ("bearing due west", "bearing_deg", (0.0, 1.0, 0.0, 0.0), 270.0, 1e-9),
+    ("bearing Paris to London", "bearing_deg", (*PARIS, *LONDON), 330.0, 0.5),
+]
+
+
+@pytest.fixture(params=GEODESY_TASKS)
+def geodesy(request):
+    return import_task_module(request.param, "geodesy")
+
+@pytest.fixture(params=["pure_python", "numpy"])
+def batch_geodesy(request, geodesy, monkeypatch):
+    """The module with its batch functions forced onto one implementation."""
+    if request.param == "numpy":
+        monkeypatch.setattr(geodesy, "np", pytest.importorskip("numpy"))
+    else:
+        monkeypatch.setattr(geodesy, "np", None)
+    return geodesy
+
+
+def test_task_copies_are_identical():
+    paths = [os.path.join(ROOT, task, "geodesy.py") for task in GEODESY_TASKS]
+    assert filecmp.cmp(*paths, shallow=False)
+
+@pytest.mark.parametrize("description, function, args, expected, tolerance", REFERENCE_CASES,
+                         ids=[case[0] for case in REFERENCE_CASES])
+def test_reference_values(geodesy, description, function, args, expected, tolerance):
+    assert getattr(geodesy, function)(*args) == pytest.approx(expected, abs=tolerance)
+
+@pytest.mark.parametrize("distance", [1.0, 10.0, 100.0, 1000.0, 9999.0])
+def test_fast_path_stays_within_relative_error(geodesy, distance):
+    lat, lon = 47.4, 8.5
+    target = (lat + distance / 111195.08, lon + distance / 75000.0)
+    fast = geodesy.equirectangular_m(lat, lon, *target)
+    assert fast == pytest.approx(geodesy.haversine_m(lat, lon, *target), rel=1e-4)
+
+def test_distance_m_uses_haversine_beyond_fast_path(geodesy):
+    lat, lon = 0.0, 0.0
+    far = (lat + 2 * geodesy.FAST_PATH_MAX_M / 111195.08, lon + 0.5)
+    assert geodesy.distance_m(lat, lon, *far) == geodesy.haversine_m(lat, lon, *far)
+
+def test_ned_round_trip(geodesy):
+    lat, lon, alt = geodesy.ned_to_lla(*AHMEDABAD, 50.0, 300.0, -400.0, -20.0)
+    north, east, down = geodesy.lla_to_ned(*AHMEDABAD, 50.0, lat, lon, alt)
+    assert (north, east, down) == pytest.approx((300.0, -400.0, -20.0), abs=1e-6)
+    assert alt == 70.0
+    assert geodesy.distance_m(*AHMEDABAD, lat, lon) == pytest.approx(500.0, abs=0.05)
+    assert geodesy.bearing_deg(*AHMEDABAD, lat, lon) == pytest.approx(360.0 - math.degrees(math.atan2(400.0, 300.0)), abs=0.01)
+
+
+def test_batch_distances_match_references(batch_geodesy):
+    lats, lons = [PARIS[0], LONDON[0], 1.0], [PARIS[1], LONDON[1], 0.0]
+    assert list(batch_geodesy.haversine_many(0.0, 0.0, lats[2:], lons[2:])) == pytest.approx([111195.08], abs=0.01)
+    assert list(batch_geodesy.haversine_many(*PARIS, lats[:2], lons[:2])) == pytest.approx([0.0, 343556.0], abs=1.0)
+    assert list(batch_geodesy.path_lengths_m(lats[:2], lons[:2])) == pytest.approx([343556.0], abs=1.0)
+
+def test_batch_functions_match_scalar_ones(batch_geodesy):
+    g = batch_geodesy
+    norths, easts, downs = [0.0, 300.0, 300.0, -2500.0], [0.0, 0.0, -400.0, 1200.0], [0.0, 0.0, -20.0, -35.5]
+    lats, lons, alts = g.ned_to_lla_many(*AHMEDABAD, 50.0, norths, easts, downs)
+    scalar = [g.ned_to_lla(*AHMEDABAD, 50.0, n, e, d) for n, e, d in zip(norths, easts, downs)]
+    assert list(lats) == pytest.approx([p[0] for p in scalar], abs=1e-12)
+    assert list(lons) == pytest.approx([p[1] for p in scalar], abs=1e-12)
+    assert list(alts) == pytest.approx([p[2] for p in scalar], abs=1e-9)
+
+    assert list(g.haversine_many(*AHMEDABAD, lats, lons)) == pytest.approx(
+        [g.haversine_m(*AHMEDABAD, lat, lon) for lat, lon in zip(lats, lons)], abs=1e-6)
+    assert list(g.path_lengths_m(lats, lons)) == pytest.approx(
+        [g.haversine_m(lats[i], lons[i], lats[i + 1], lons[i + 1]) for i in range(len(lats) - 1)], abs=1e-6)
+
+    back = g.lla_to_ned_many(*AHMEDABAD, 50.0, lats, lons, alts)
+    for values, expected in zip(back, (norths, easts, downs)):
+        assert list(values) == pytest.approx(expected, abs=1e-6)
+
+def test_batch_return_types(batch_geodesy, request):
+    distances = batch_geodesy.haversine_many(0.0, 0.0, [1.0], [0.0])
+    if request.node.callspec.params["batch_geodesy"] == "numpy":
+        assert type(distances).__name__ == "ndarray"
+    else:
+        assert isinstance(distances, list)
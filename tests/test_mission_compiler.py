@@ -0,0 +1,102 @@
+import pytest
+
+from conftest import import_task_module
+
+HOME = (23.0225, 72.5714)
+
+
+@pytest.fixture
+def mission_compiler():
+    return import_task_module("task3", "mission_compiler")
+
+def ops(mission):
+    return [op for op, *_ in mission.steps()]
+
+
+def test_compiles_steps_in_numeric_order(mission_compiler):
+    plan = {
+        "step 1": "takeoff to 20m",
+        "step 2": "goto north 5m, east -10m, altitude 20m",
+        "step 3": "goto north 10m, east -5m, altitude 30m",
+        "step 10": "land",
+        "step 4": "goto south 15m, west 0m, altitude 30m",
+    }
+    mission = mission_compiler.compile_mission(plan, HOME)
+    # "step 10" sorts after "step 4", not between "step 1" and "step 2"
+    assert ops(mission) == ["takeoff", "goto", "goto", "goto", "land"]
+    assert mission.north_m == pytest.approx([0.0, 5.0, 15.0, 0.0, 0.0])
+    assert mission.east_m == pytest.approx([0.0, -10.0, -15.0, -15.0, -15.0])
+    assert list(mission.altitude_m) == [20.0, 20.0, 30.0, 30.0, 0.0]
+    assert mission.latitude_deg[0] == pytest.approx(HOME[0]) and mission.longitude_deg[0] == pytest.approx(HOME[1])
+    assert mission.distance_m() == pytest.approx(2 * 125 ** 0.5 + 15.0, abs=0.01)
+
+def test_ordered_steps(mission_compiler):
+    plan = {"step 10": "j", "step 2": "b", "step 1": "a", "Step 3:": "c", "notes": "last"}
+    assert mission_compiler._ordered_steps(plan) == ["a", "b", "c", "j", "last"]
+
+@pytest.mark.parametrize("text, expected", [
+    ("takeoff to 20m", (1, 0.0, 0.0, 20.0)),
+    ("Takeoff at 12.5 m", (1, 0.0, 0.0, 12.5)),
+    ("goto north 5m, east -10m, altitude 20m", (2, 5.0, -10.0, 20.0)),
+    ("goto south 15m, west 4m, alt 30m", (2, -15.0, -4.0, 30.0)),
+    ("GOTO: north 5m north 2m, altitude 10", (2, 7.0, 0.0, 10.0)),
+    ("land", (3, 0.0, 0.0, 0.0)),
+    ("land at the launch point", (3, 0.0, 0.0, 0.0)),
+])
+def test_parse_step(mission_compiler, text, expected):
+    assert mission_compiler._parse_step(text) == expected
+
+
+
+@pytest.mark.parametrize("plan, problem", [
+    ({}, "plan has no steps"),
+    ({"step 1": "goto north 5m, east 0m, altitude 20m", "step 2": "land"}, "plan must start with takeoff"),
+    ({"step 1": "takeoff to 20m", "step 2": "goto north 5m, east 0m, altitude 20m"}, "plan must end with land"),
+    ({"step 1": "takeoff to 20m", "step 2": "takeoff to 30m", "step 3": "land"},
+     "step 2: takeoff is only allowed as the first step"),
+    ({"step 1": "takeoff to 20m", "step 2": "land", "step 3": "land"}, "step 2: land is only allowed as the last step"),
+    ({"step 1": "takeoff to 500m", "step 2": "land"}, "step 1: altitude 500.0m outside 2.0-120.0m"),
+    ({"step 1": "takeoff to 1m", "step 2": "land"}, "step 1: altitude 1.0m outside 2.0-120.0m"),
+    ({"step 1": "takeoff to 20m", "step 2": "goto north 5m, east 0m, altitude 121m", "step 3": "land"},
+     "step 2: altitude 121.0m outside 2.0-120.0m"),
+    ({"step 1": "takeoff to 20m", "step 2": "orbit the tower", "step 3": "land"}, "step 2: cannot parse step: 'orbit the tower'"),
+    ({"step 1": "takeoff to 20m", "step 2": "goto north 5000m, east 0m, altitude 20m", "step 3": "land"},
+     "step 2: more than 1000m from home"),
+    ({"step 1": "takeoff to 20m", "step 2": "goto north 800m, east 600.1m, altitude 20m", "step 3": "land"},
+     "step 2: more than 1000m from home"),
+    ({"action": "error", "message": "Connection failed"}, "planner error: Connection failed"),
+], ids=["empty", "no takeoff", "no land", "second takeoff", "early land", "too high", "too low", "goto too high",
+        "unparsable", "far away", "just past the geofence", "planner error"])
+def test_rejects_bad_plans(mission_compiler, plan, problem):
+    with pytest.raises(mission_compiler.MissionCompileError) as excinfo:
+        mission_compiler.compile_mission(plan, HOME)
+    assert problem in excinfo.value.problems
+
+@pytest.mark.parametrize("altitude", [2.0, 120.0])
+def test_altitude_limits_are_inclusive(mission_compiler, altitude):
+    plan = {"step 1": f"takeoff to {altitude}m", "step 2": "land"}
+    assert list(mission_compiler.compile_mission(plan, HOME).altitude_m) == [altitude, 0.0]
+
+def test_geofence_limit_is_inclusive(mission_compiler):
+    plan = {"step 1": "takeoff to 20m", "step 2": "goto north 800m, east 600m, altitude 20m",
+            "step 3": "goto south 1600m, altitude 20m", "step 4": "land"}
+    mission = mission_compiler.compile_mission(plan, HOME)
+    assert max((n ** 2 + e ** 2) ** 0.5 for n, e in zip(mission.north_m, mission.east_m)) == pytest.approx(1000.0)
+
+def test_step_limit(mission_compiler):
+    plan = {"step 1": "takeoff to 20m", "step 999": "land"}
+    plan.update({f"step {i}": "goto north 1m, altitude 20m" for i in range(2, mission_compiler.MAX_STEPS + 1)})
+    with pytest.raises(mission_compiler.MissionCompileError, match=f"limit is {mission_compiler.MAX_STEPS}"):
+        mission_compiler.compile_mission(plan, HOME)
+
+def test_every_problem_is_reported(mission_compiler):
+    plan = {"step 1": "hover", "step 2": "spin", "step 3": "land"}
+    with pytest.raises(mission_compiler.MissionCompileError) as excinfo:
+        mission_compiler.compile_mission(plan, HOME)
+    assert [problem.split(":")[0] for problem in excinfo.value.problems] == ["step 1", "step 2"]
+
+def test_round_trips_through_dict(mission_compiler):
+    plan = {"step 1": "takeoff to 20m", "step 2": "goto north 5m, east -10m, altitude 20m", "step 3": "land"}
+    mission = mission_compiler.compile_mission(plan, HOME)
+    copy = mission_compiler.CompiledMission.from_dict(mission.to_dict())
+    assert list(copy.steps()) == list(mission.steps())
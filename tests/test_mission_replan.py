@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from conftest import import_task_module
+
+HOME = (23.0225, 72.5714)
+PLAN = {
+    "step 1": "takeoff to 20m",
+    "step 2": "goto north 10m, east -5m, altitude 30m",
+    "step 3": "land",
+}
+DEVIATION = {"step": 2, "total_steps": 4, "op": "goto", "reason": "step 2: 18.2 m off the planned leg"}
+
+
+@pytest.fixture
+def mission_compiler():
+    return import_task_module("task3", "mission_compiler")
+
+@pytest.fixture
+def ollama_res():
+    return import_task_module("task3", "ollama_res")
+
+@pytest.fixture
+def advisor():
+    return import_task_module("task3", "main")
+
+def telemetry_at(north_m, east_m, altitude_m=25.0, in_air=True):
+    geodesy = import_task_module("task3", "geodesy")
+    lat, lon, _ = geodesy.ned_to_lla(*HOME, 0.0, north_m, east_m, 0.0)
+    return {"in_air": in_air, "position": {"latitude_deg": lat, "longitude_deg": lon, "relative_altitude_m": altitude_m}}
+
+
+def test_airborne_replan_continues_from_start_offset(mission_compiler):
+    mission = mission_compiler.compile_mission(PLAN, HOME, start_offset=(40.0, 20.0), airborne=True)
+    assert [op for op, *_ in mission.steps()] == ["goto", "land"]
+    assert mission.north_m == pytest.approx([50.0, 50.0])
+    assert mission.east_m == pytest.approx([15.0, 15.0])
+    start = mission_compiler.compile_mission(
+        {"step 1": "takeoff to 20m", "step 2": "goto north 40m, east 20m, altitude 20m", "step 3": "land"}, HOME)
+    assert mission.start == pytest.approx((start.latitude_deg[1], start.longitude_deg[1]), abs=1e-9)
+    assert mission.distance_m() == pytest.approx((10 ** 2 + 5 ** 2) ** 0.5, abs=0.01)
+    assert mission_compiler.CompiledMission.from_dict(mission.to_dict()).north_m == mission.north_m
+
+def test_airborne_replan_rejects_a_later_takeoff(mission_compiler):
+    plan = {"step 1": "goto north 5m, east 0m, altitude 20m", "step 2": "takeoff to 20m", "step 3": "land"}
+    with pytest.raises(mission_compiler.MissionCompileError, match="already in the air"):
+        mission_compiler.compile_mission(plan, HOME, start_offset=(5.0, 5.0), airborne=True)
+
+def test_replan_on_the_ground_still_needs_takeoff(mission_compiler):
+    plan = {"step 1": "goto north 5m, east 0m, altitude 20m", "step 2": "land"}
+    with pytest.raises(mission_compiler.MissionCompileError, match="must start with takeoff"):
+        mission_compiler.compile_mission(plan, HOME, start_offset=(5.0, 5.0))
+
+def test_geofence_stays_relative_to_home(mission_compiler):
+    plan = {"step 1": "goto north 30m, east 0m, altitude 20m", "step 2": "land"}
+    with pytest.raises(mission_compiler.MissionCompileError, match="from home"):
+        mission_compiler.compile_mission(plan, HOME, start_offset=(mission_compiler.MAX_DISTANCE_FROM_HOME_M - 10.0, 0.0),
+                                         airborne=True)
+
+
+def test_replan_prompt_carries_deviation_and_position(ollama_res):
+    replan = dict(DEVIATION, in_air=True, north_m=42.0, east_m=-7.5, altitude_m=25.0)
+    prompt = ollama_res.mission_prompt("survey the field", replan)
+    assert prompt.startswith("### Mission:\nsurvey the field\n")
+    assert "during step 2 (goto)" in prompt
+    assert DEVIATION["reason"] in prompt
+    assert "42.0m north and -7.5m east" in prompt
+    assert "25.0m altitude" in prompt
+    assert "do not take off again" in prompt
+    assert "do not take off again" not in ollama_res.mission_prompt("survey the field", dict(replan, in_air=False))
+    assert ollama_res.mission_prompt("survey the field") == "### Mission:\nsurvey the field\n"
+
+def test_replan_bypasses_plan_cache(ollama_res, monkeypatch):
+    payloads = []
+    async def fake_generate_json(client, payload, call_stats=None):
+        payloads.append(payload)
+        return PLAN
+    def no_cache():
+        raise AssertionError("replans must not use the plan cache")
+    monkeypatch.setattr(ollama_res, "_generate_json", fake_generate_json)
+    monkeypatch.setattr(ollama_res, "get_plan_cache", no_cache)
+
+    replan = dict(DEVIATION, in_air=True, north_m=1.0, east_m=2.0, altitude_m=3.0)
+    assert asyncio.run(ollama_res.get_ollama_action("survey the field", client=object(), replan=replan)) == PLAN
+    assert "### Replan:" in payloads[0]["prompt"]
+
+
+def test_get_mission_plan_replans_from_current_position(advisor, monkeypatch):
+    calls = []
+    async def fake_get_ollama_action(mission, **kwargs):
+        calls.append(kwargs)
+        return PLAN
+    monkeypatch.setattr(advisor, "get_ollama_action", fake_get_ollama_action)
+    monkeypatch.setattr(advisor, "invalidate_cached_plan", lambda mission: pytest.fail("replan invalidated the cache"))
+
+    mission = asyncio.run(advisor.get_mission_plan("survey the field", HOME, DEVIATION, telemetry_at(40.0, 20.0)))
+    replan = calls[0]["replan"]
+    assert replan["reason"] == DEVIATION["reason"] and replan["step"] == 2 and replan["in_air"]
+    assert (replan["north_m"], replan["east_m"]) == pytest.approx((40.0, 20.0), abs=1e-6)
+    assert replan["altitude_m"] == 25.0
+    # No takeoff, no trip back home: the first waypoint is the plan's offset from where the drone is
+    assert [op for op, *_ in mission.steps()] == ["goto", "land"]
+    assert (mission.north_m[0], mission.east_m[0]) == pytest.approx((50.0, 15.0), abs=1e-6)
+
+    landed = asyncio.run(advisor.get_mission_plan("survey the field", HOME, DEVIATION, telemetry_at(40.0, 20.0, 0.0, False)))
+    assert [op for op, *_ in landed.steps()] == ["takeoff", "goto", "land"]
+    assert landed.north_m[0] == pytest.approx(40.0, abs=1e-6)
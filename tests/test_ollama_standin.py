@@ -0,0 +1,141 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import ollama_standin
+from conftest import import_task_module
+
+TELEMETRY = '{"lat":47.397742,"lon":8.545594,"alt":10.0,"bat":80,"fix":3,"air":true,"arm":true}'
+GOTO_PROMPT = 'Current Telemetry: %s\nHuman Command: "Go to 47.3980, 8.5460 at 20m"\n' % TELEMETRY
+GOTO_ACTION = {"action": "goto", "latitude_deg": 47.398, "longitude_deg": 8.546, "altitude_m": 20.0}
+
+
+def with_standin(test, **standin_kwargs):
+    """Runs `test(server, client)` against a stand-in on a free port and returns its result."""
+    async def run():
+        server = await ollama_standin.OllamaStandIn(port=0, **standin_kwargs).start()
+        try:
+            async with httpx.AsyncClient(base_url=server.url) as client:
+                return await test(server, client)
+        finally:
+            await server.stop()
+    return asyncio.run(run())
+
+async def generate(client, prompt, stream):
+    """Returns (status, response text, final body) of one /api/generate call."""
+    payload = {"model": ollama_standin.STANDIN_MODEL, "prompt": prompt, "stream": stream}
+    if not stream:
+        response = await client.post("/api/generate", json=payload)
+        body = response.json()
+        return response.status_code, body.get("response"), body
+    async with client.stream("POST", "/api/generate", json=payload) as response:
+        lines = [json.loads(line) async for line in response.aiter_lines() if line]
+    return response.status_code, "".join(line.get("response", "") for line in lines), lines[-1]
+
+
+@pytest.mark.parametrize("prompt, expected", [
+    (GOTO_PROMPT, GOTO_ACTION),
+    ('Current Telemetry: %s\nHuman Command: "Start mission"\n' % TELEMETRY.replace("80", "9"), {"action": "rtl"}),
+    ('Current Telemetry: %s\nHuman Command: "Take off to 15m"\n' % TELEMETRY.replace("true", "false"),
+     {"action": "arm"}),
+    ("### Mission:\nSurvey the field at 30m and come back\n",
+     {"step 1": "takeoff to 30m", "step 2": "goto north 20m, east 0m, altitude 30m",
+      "step 3": "goto north 0m, east 20m, altitude 30m", "step 4": "goto south 20m, west 20m, altitude 30m",
+      "step 5": "land"}),
+], ids=["task2 goto", "task2 low battery", "task2 arm first", "task3 plan"])
+def test_rule_responses(prompt, expected):
+    assert ollama_standin.rule_responder("", prompt) == expected
+
+def test_task1_advisory():
+    advisory = ollama_standin.rule_responder("", "Current drone telemetry: %s" % TELEMETRY.replace('"fix":3', '"fix":0'))
+    assert advisory["issues_detected"] == ["GPS fix lost"]
+    assert advisory["suggested_action"] == "Land immediately and check GPS"
+
+def test_scripted_responses_cycle():
+    respond = ollama_standin.scripted_responder([{"action": "land"}, "not json"])
+    assert [respond("", "") for _ in range(3)] == [{"action": "land"}, "not json", {"action": "land"}]
+
+@pytest.mark.parametrize("stream", [False, True], ids=["single body", "streamed"])
+def test_generate(stream):
+    async def test(server, client):
+        return await generate(client, GOTO_PROMPT, stream), server.stats()
+    (status, text, final), stats = with_standin(test)
+    assert status == 200
+    assert json.loads(text) == GOTO_ACTION
+    assert final["done"] is True
+    assert final["eval_count"] == stats["tokens_sent"] > 1
+    assert (stats["requests"], stats["streamed"]) == (1, int(stream))
+
+@pytest.mark.parametrize("stream", [False, True], ids=["single body", "streamed"])
+def test_error_injection(stream):
+    async def test(server, client):
+        return [await generate(client, GOTO_PROMPT, stream) for _ in range(3)], server.stats()
+    results, stats = with_standin(test, error_rate=1.0)
+    for status, _, body in results:
+        assert status == 500
+        assert "injected" in body["error"]
+    assert (stats["requests"], stats["errors_injected"], stats["tokens_sent"]) == (3, 3, 0)
+
+@pytest.mark.parametrize("stream", [False, True], ids=["single body", "streamed"])
+def test_malformed_injection(stream):
+    async def test(server, client):
+        return await generate(client, GOTO_PROMPT, stream), server.stats()
+    (status, text, final), stats = with_standin(test, malformed_rate=1.0)
+    assert status == 200 and final["done"] is True
+    assert text.endswith(" ... (truncated)")
+    assert json.dumps(GOTO_ACTION).startswith(text[:-len(" ... (truncated)")])
+    with pytest.raises(ValueError):
+        json.loads(text)
+    assert stats["malformed_injected"] == 1
+
+def test_injection_rates_are_seeded():
+    async def test(server, client):
+        outcomes = []
+        for _ in range(200):
+            status, text, _ = await generate(client, GOTO_PROMPT, stream=False)
+            if status != 200:
+                outcomes.append("error")
+            else:
+                try:
+                    json.loads(text)
+                    outcomes.append("ok")
+                except ValueError:
+                    outcomes.append("malformed")
+        return outcomes, server.stats()
+    outcomes, stats = with_standin(test, seed=2, error_rate=0.2, malformed_rate=0.3)
+    assert outcomes.count("error") == stats["errors_injected"]
+    assert outcomes.count("malformed") == stats["malformed_injected"]
+    assert 20 <= stats["errors_injected"] <= 60
+    assert 30 <= stats["malformed_injected"] <= 80
+    assert with_standin(test, seed=2, error_rate=0.2, malformed_rate=0.3)[0] == outcomes
+
+@pytest.mark.parametrize("method, path, body, status", [
+    ("POST", "/api/generate", b"{not json", 400),
+    ("GET", "/api/chat", b"", 404),
+    ("GET", "/api/version", b"", 200),
+])
+def test_other_requests(method, path, body, status):
+    async def test(server, client):
+        return (await client.request(method, path, content=body)).status_code
+    assert with_standin(test) == status
+
+@pytest.mark.parametrize("standin_kwargs, expected", [
+    ({}, GOTO_ACTION),
+    ({"error_rate": 1.0}, {"action": "error", "message": "Ollama API error 500"}),
+    ({"malformed_rate": 1.0}, {"action": "error"}),
+], ids=["ok", "http error", "malformed"])
+@pytest.mark.parametrize("stream", [False, True], ids=["single body", "streamed"])
+def test_task2_client_reports_injected_failures(standin_kwargs, expected, stream, monkeypatch):
+    ollama_res = import_task_module("task2", "ollama_res")
+    monkeypatch.setattr(ollama_res, "OLLAMA_STREAM", stream)
+    telemetry_data = {"armed": True, "in_air": True,
+                      "position": {"latitude_deg": 47.397742, "longitude_deg": 8.545594, "relative_altitude_m": 10.0},
+                      "battery": {"remaining_percent": 80}, "gps_info": {"fix_type": 3}}
+    async def test(server, client):
+        return await ollama_res.get_ollama_action("Go to 47.3980, 8.5460 at 20m", telemetry_data, client=client)
+    action = with_standin(test, **standin_kwargs)
+    assert {key: action[key] for key in expected} == expected
+    if expected["action"] == "error" and "message" not in expected:
+        assert "not valid JSON" in action["message"]
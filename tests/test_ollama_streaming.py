@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from conftest import TASKS, import_task_module
+
+# (id, streamed text, first complete top-level object in it)
+PARSER_CASES = [
+    ("plain object", '{"action": "land"}', {"action": "land"}),
+    ("nested object", '{"action": "goto", "target": {"lat": 1.5, "lon": [2, 3]}}',
+     {"action": "goto", "target": {"lat": 1.5, "lon": [2, 3]}}),
+    ("braces inside strings", '{"reason": "keep {x} } clear {", "action": "hold"}',
+     {"reason": "keep {x} } clear {", "action": "hold"}),
+    ("escaped quotes", '{"message": "say \\"}\\" then {", "action": "error"}',
+     {"message": 'say "}" then {', "action": "error"}),
+    ("escaped backslash before quote", '{"path": "C:\\\\", "action": "hold"}', {"path": "C:\\", "action": "hold"}),
+    ("markdown fences", '```json\n{"action": "rtl"}\n```\n', {"action": "rtl"}),
+    ("quoted text before the object", 'Here is "the" plan: {"step 1": "land"}', {"step 1": "land"}),
+    ("only the first object", '{"action": "arm"} {"action": "disarm"}', {"action": "arm"}),
+]
+
+@pytest.fixture(params=TASKS)
+def ollama_res(request):
+    return import_task_module(request.param, "ollama_res")
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def feed_until_object(parser, chunks):
+    """Feeds chunks the way _generate_json does; returns (index of the chunk that completed the object, object)."""
+    for i, chunk in enumerate(chunks):
+        result = parser.feed(chunk)
+        if result is not None:
+            return i, result
+    return None, None
+
+
+@pytest.mark.parametrize("text, expected", [case[1:] for case in PARSER_CASES], ids=[case[0] for case in PARSER_CASES])
+def test_parser_returns_object_at_its_closing_brace(ollama_res, text, expected):
+    start = text.index("{")
+    _, end = json.JSONDecoder().raw_decode(text, start)
+    # One character per chunk: the object comes back with its closing brace, not before or after
+    assert feed_until_object(ollama_res.IncrementalJSONObjectParser(), list(text)) == (end - 1, expected)
+
+@pytest.mark.parametrize("text, expected", [case[1:] for case in PARSER_CASES], ids=[case[0] for case in PARSER_CASES])
+@pytest.mark.parametrize("chunk_size", [2, 3, 7, 1000])
+def test_parser_handles_objects_split_across_chunks(ollama_res, text, expected, chunk_size):
+    index, result = feed_until_object(ollama_res.IncrementalJSONObjectParser(), chunked(text, chunk_size))
+    assert result == expected
+
+@pytest.mark.parametrize("text", ['{"action": "land"', '```json\n{"reason": "a } in a string', "no object here"])
+def test_parser_waits_for_an_incomplete_object(ollama_res, text):
+    parser = ollama_res.IncrementalJSONObjectParser()
+    assert all(parser.feed(chunk) is None for chunk in chunked(text, 2))
+    assert parser.text == text
+
+
+def stream_lines(*chunks, done=True):
+    """Ollama /api/generate streaming body: one JSON line per chunk, the last marked done."""
+    lines = [{"response": chunk, "done": False} for chunk in chunks]
+    if done:
+        lines.append({"response": "", "done": True, "eval_count": len(chunks)})
+    return "".join(json.dumps(line) + "\n" for line in lines).encode()
+
+def generate(ollama_res, body, stream=True):
+    async def run():
+        async def handler(request):
+            return httpx.Response(200, content=body)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://ollama") as client:
+            call_stats = {}
+            result = await ollama_res._generate_json(client, {"model": "m", "prompt": "p", "stream": stream}, call_stats)
+            return result, call_stats
+    return asyncio.run(run())
+
+
+def test_stream_returns_before_done(ollama_res):
+    result, call_stats = generate(ollama_res, stream_lines('```json\n{"action": ', '"land"}', "\n```", " trailing tokens"))
+    assert result == {"action": "land"}
+    assert call_stats["early_exit"] is True
+    assert "eval_count" not in call_stats
+
+def test_stream_falls_back_to_the_whole_text(ollama_res):
+    # No top-level object ever completes; whatever the model sent is parsed once the stream ends
+    result, call_stats = generate(ollama_res, stream_lines(" [1, ", "2]"))
+    assert result == [1, 2]
+    assert call_stats["eval_count"] == 2
+
+@pytest.mark.parametrize("body", [stream_lines('{"action": ', '"land"'), stream_lines('{"action": "land"', done=False)],
+                         ids=["done without closing brace", "connection closed early"])
+def test_stream_ending_early_raises_json_error(ollama_res, body):
+    with pytest.raises(json.JSONDecodeError):
+        generate(ollama_res, body)
+
+def test_non_streaming_response_strips_fences(ollama_res):
+    body = json.dumps({"response": '```json\n{"action": "rtl"}\n```', "done": True, "eval_count": 5}).encode()
+    result, call_stats = generate(ollama_res, body, stream=False)
+    assert result == {"action": "rtl"}
+    assert call_stats["eval_count"] == 5
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from conftest import import_task_module
+
+
+@pytest.fixture
+def pipeline():
+    return import_task_module("task2", "pipeline")
+
+
+def test_latest_value_overwrites_and_counts_drops(pipeline):
+    async def run():
+        slot = pipeline.LatestValue()
+        for value in ("a", "b", "c"):
+            slot.put(value)
+        assert await slot.get() == (3, "c")
+        assert slot.dropped == 2
+        slot.put("d") # taken below, so not dropped
+        assert await slot.get() == (4, "d")
+        assert slot.stats() == {"puts": 4, "dropped": 2}
+        assert slot.peek() == "d"
+    asyncio.run(run())
+
+def test_latest_value_get_waits_for_a_newer_value(pipeline):
+    async def run():
+        slot = pipeline.LatestValue()
+        slot.put("a")
+        await slot.get()
+        asyncio.get_running_loop().call_later(0.02, slot.put, "b")
+        assert await asyncio.wait_for(slot.get(), 1.0) == (2, "b")
+        with pytest.raises(asyncio.TimeoutError):
+            await slot.get(timeout=0.02)
+        # A second consumer asks by version instead of what was last taken
+        assert await slot.get(newer_than=1) == (2, "b")
+    asyncio.run(run())
+
+def test_run_current_completes_for_the_current_command(pipeline):
+    async def run():
+        commands = pipeline.CommandGenerations("Take off")
+        async def decide():
+            return {"action": "takeoff"}
+        generation, _ = commands.current()
+        assert await commands.run_current(generation, decide()) == (True, {"action": "takeoff"})
+        assert commands.cancelled == 0
+    asyncio.run(run())
+
+def test_run_current_cancels_on_a_newer_command(pipeline):
+    async def run():
+        commands = pipeline.CommandGenerations("Go to 23.0225, 72.5714 at 50m")
+        cancelled = asyncio.Event()
+        async def slow_llm():
+            try:
+                await asyncio.sleep(10.0)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return {"action": "goto"}
+        generation, _ = commands.current()
+        asyncio.get_running_loop().call_later(0.02, commands.update, "Land")
+        completed, result = await asyncio.wait_for(commands.run_current(generation, slow_llm()), 1.0)
+        assert (completed, result) == (False, None)
+        assert cancelled.is_set()
+        assert commands.current() == (1, "Land") and not commands.is_current(generation)
+        assert commands.stats() == {"generation": 1, "cancelled": 1, "dropped": 0}
+    asyncio.run(run())
+
+def test_run_current_cancels_its_request_when_cancelled_itself(pipeline):
+    async def run():
+        commands = pipeline.CommandGenerations("Hold")
+        cancelled = asyncio.Event()
+        async def slow_llm():
+            try:
+                await asyncio.sleep(10.0)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        runner = asyncio.create_task(commands.run_current(0, slow_llm()))
+        await asyncio.sleep(0.01)
+        runner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await runner
+        await asyncio.sleep(0)
+        assert cancelled.is_set()
+    asyncio.run(run())
+
+def test_vehicle_state(pipeline):
+    snapshot = {"armed": True, "in_air": True, "flight_mode": "HOLD", "battery": {"remaining_percent": 80}}
+    assert pipeline.vehicle_state(snapshot) == (True, True, "HOLD")
+    assert pipeline.vehicle_state(dict(snapshot, battery={"remaining_percent": 20})) == pipeline.vehicle_state(snapshot)
+    assert pipeline.vehicle_state(dict(snapshot, flight_mode="LAND")) != pipeline.vehicle_state(snapshot)
+    assert pipeline.vehicle_state({}) == (None, None, None)
+
+def test_action_key_ignores_explanations(pipeline):
+    hold = {"action": "hold", "reason": "Waiting"}
+    assert pipeline.action_key(hold) == pipeline.action_key(dict(hold, reason="Still waiting"))
+    land = {"action": "land", "rule": "low_battery", "message": "Battery low"}
+    assert pipeline.action_key(land) == pipeline.action_key({"action": "land"})
+    goto = {"action": "goto", "latitude_deg": 1.0, "longitude_deg": 2.0, "altitude_m": 10.0}
+    assert pipeline.action_key(goto) != pipeline.action_key(dict(goto, altitude_m=20.0))
+    assert pipeline.action_key(dict(reversed(list(goto.items())))) == pipeline.action_key(goto)
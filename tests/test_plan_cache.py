@@ -0,0 +1,131 @@
+import itertools
+import json
+import os
+import types
+
+import pytest
+
+from conftest import ROOT, import_task_module
+
+
+def test_default_path_is_outside_the_source_tree(monkeypatch, tmp_path):
+    plan_cache = import_task_module("task3", "plan_cache")
+    monkeypatch.delenv("OD_PLAN_CACHE_PATH", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path))
+    path = plan_cache.default_plan_cache_path()
+    assert path == os.path.join(str(tmp_path), "od-test", "mission_plans.sqlite3")
+    assert not os.path.abspath(plan_cache.PLAN_CACHE_PATH).startswith(os.path.join(ROOT, "task3"))
+
+def test_path_is_configurable(monkeypatch, tmp_path):
+    plan_cache = import_task_module("task3", "plan_cache")
+    path = str(tmp_path / "nested" / "plans.sqlite3")
+    monkeypatch.setenv("OD_PLAN_CACHE_PATH", path)
+    assert plan_cache.default_plan_cache_path() == path
+
+    # The cache directory is created on first use
+    monkeypatch.setattr(plan_cache, "PLAN_CACHE_PATH", path)
+    cache = plan_cache.PlanCache()
+    try:
+        cache.put("takeoff and land", "model", "hash", {"step 1": "takeoff to 20m", "step 2": "land"})
+        assert cache.path == path and os.path.exists(path)
+    finally:
+        cache.close()
+
+
+PH = "prompt-hash"
+MODEL = "llama3.2:3b"
+PLAN = {"step 1": "takeoff to 20m", "step 2": "land"}
+
+
+@pytest.fixture
+def plan_cache(monkeypatch):
+    module = import_task_module("task3", "plan_cache")
+    # A clock that always moves forward, so least-recently-used order never ties
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(module, "time", types.SimpleNamespace(time=lambda: float(next(ticks))))
+    return module
+
+@pytest.fixture
+def open_cache(plan_cache, tmp_path):
+    caches = []
+    def open_cache(**kwargs):
+        caches.append(plan_cache.PlanCache(str(tmp_path / "plans.sqlite3"), **kwargs))
+        return caches[-1]
+    yield open_cache
+    for cache in caches:
+        cache.close()
+
+
+def test_hit_and_miss_keys(open_cache, plan_cache):
+    cache = open_cache()
+    assert cache.get("takeoff and land", MODEL, PH) is None
+    cache.put("takeoff and land", MODEL, PH, PLAN)
+    assert cache.get("  takeoff   and land ", MODEL, PH) == PLAN
+    assert cache.get("takeoff and land", "llama3.2:1b", PH) is None
+    assert cache.get("takeoff and land", MODEL, plan_cache.prompt_hash("v2")) is None
+    assert (cache.hits, cache.misses) == (1, 3)
+
+def test_get_returns_a_copy(open_cache):
+    cache = open_cache()
+    cache.put("mission", MODEL, PH, PLAN)
+    cache.get("mission", MODEL, PH)["step 1"] = "takeoff to 900m"
+    assert cache.get("mission", MODEL, PH) == PLAN
+
+def test_invalidate(open_cache):
+    cache = open_cache()
+    cache.put("mission", MODEL, PH, PLAN)
+    cache.invalidate("mission", MODEL, PH)
+    assert cache.get("mission", MODEL, PH) is None
+    assert cache.stats()["entries"] == 0
+
+def test_evicts_least_recently_used_by_entry_count(open_cache):
+    cache = open_cache(max_entries=2)
+    cache.put("a", MODEL, PH, PLAN)
+    cache.put("b", MODEL, PH, PLAN)
+    assert cache.get("a", MODEL, PH) == PLAN # "b" is now the least recently used
+    cache.put("c", MODEL, PH, PLAN)
+    assert cache.get("b", MODEL, PH) is None
+    assert cache.get("a", MODEL, PH) == PLAN and cache.get("c", MODEL, PH) == PLAN
+    assert cache.stats()["entries"] == 2 and cache.evictions == 1
+
+def test_evicts_least_recently_used_by_bytes(open_cache):
+    size = len(json.dumps(PLAN, sort_keys=True, separators=(",", ":")))
+    cache = open_cache(max_bytes=2 * size)
+    cache.put("a", MODEL, PH, PLAN)
+    cache.put("b", MODEL, PH, PLAN)
+    cache.put("c", MODEL, PH, PLAN)
+    assert cache.get("a", MODEL, PH) is None
+    assert cache.stats()["bytes"] == 2 * size and cache.evictions == 1
+
+def test_checksum_mismatch_drops_the_entry(open_cache):
+    cache = open_cache()
+    cache.put("mission", MODEL, PH, PLAN)
+    with cache._db:
+        cache._db.execute("UPDATE plans SET plan = '{\"step 1\": \"takeoff to 900m\"}'")
+    cache._memory.clear()
+    assert cache.get("mission", MODEL, PH) is None
+    assert cache.corrupt == 1 and cache.stats()["entries"] == 0
+
+def test_damaged_file_is_quarantined(open_cache, tmp_path):
+    path = tmp_path / "plans.sqlite3"
+    path.write_bytes(b"not a database" * 100)
+    cache = open_cache()
+    quarantined = [name for name in os.listdir(tmp_path) if name.startswith("plans.sqlite3.corrupt-")]
+    assert len(quarantined) == 1
+    assert (tmp_path / quarantined[0]).read_bytes() == b"not a database" * 100
+    cache.put("mission", MODEL, PH, PLAN)
+    assert cache.get("mission", MODEL, PH) == PLAN
+
+def test_warm_start_loads_most_used_plans(open_cache):
+    cache = open_cache()
+    for mission in ("a", "b", "c"):
+        cache.put(mission, MODEL, PH, {"mission": mission})
+    for _ in range(3):
+        cache.get("b", MODEL, PH)
+    cache.get("c", MODEL, PH)
+    cache.close()
+
+    reopened = open_cache(warm_start=2)
+    assert sorted(plan["mission"] for plan in reopened._memory.values()) == ["b", "c"]
+    assert reopened.get("b", MODEL, PH) == {"mission": "b"}
@@ -0,0 +1,63 @@
+import json
+import re
+
+import pytest
+
+from conftest import import_task_module
+
+# Dotted field references in prompt text, e.g. "health.armable" or "telemetry_data.in_air"
+FIELD_REFERENCE = re.compile(r"\b(?:telemetry_data\.)?[a-z_]{3,}\.[a-z_.]*[a-z_]")
+
+TELEMETRY = {
+    "position": {"latitude_deg": 47.3977419, "longitude_deg": 8.5455938, "relative_altitude_m": 10.04},
+    "battery": {"remaining_percent": 14, "voltage_v": 15.73},
+    "gps_info": {"num_satellites": 10, "fix_type": 3},
+    "health": {"global_position_ok": True, "home_position_ok": True, "armable": True},
+    "flight_mode": "HOLD",
+    "in_air": True,
+    "armed": True,
+}
+
+
+def legend_names(legend):
+    return dict(entry.split("=", 1) for entry in legend.split())
+
+def system_prompts():
+    ollama_res = import_task_module("task2", "ollama_res")
+    for variant in ollama_res.PROMPT_TEMPLATES:
+        legend = ollama_res._legend_for(variant, "compact")
+        yield pytest.param(ollama_res.SYSTEM_PROMPTS[(variant, "compact")], legend, id=f"task2-{variant}")
+    ollama_res = import_task_module("task1", "ollama_res")
+    yield pytest.param(ollama_res.SYSTEM_PROMPT, ollama_res.TELEMETRY_LEGEND, id="task1")
+
+
+@pytest.mark.parametrize("system_prompt, legend", list(system_prompts()))
+def test_prompt_rules_only_name_fields_from_the_legend(system_prompt, legend):
+    names = set(legend_names(legend.strip(" ()").removeprefix("keys: ")).values())
+    instructions = system_prompt.replace(legend, "")
+    referenced = set(FIELD_REFERENCE.findall(instructions))
+    assert referenced <= names, f"fields missing from the legend: {referenced - names}"
+
+def test_prompt2_legend_uses_the_prompt_spelling():
+    ollama_res = import_task_module("task2", "ollama_res")
+    legend = legend_names(ollama_res._legend_for("prompt2", "compact").strip(" ()").removeprefix("keys: "))
+    assert legend["bat"] == "telemetry_data.battery.remaining_percent"
+    assert legend["home"] == "telemetry_data.health.home_position_ok"
+    assert "on_ground" not in ollama_res.SYSTEM_PROMPTS[("prompt2", "compact")]
+
+
+@pytest.mark.parametrize("task", ["task1", "task2"])
+def test_legend_keys_resolve_to_the_encoded_values(task):
+    prompt_encoding = import_task_module(task, "prompt_encoding")
+    encoded = json.loads(prompt_encoding.encode_telemetry(TELEMETRY))
+    legend = legend_names(prompt_encoding.telemetry_legend())
+    assert set(encoded) <= set(legend)
+    for key, value in encoded.items():
+        source = TELEMETRY
+        for part in legend[key].split("."):
+            source = source[part]
+        expected = source
+        decimals = prompt_encoding.TELEMETRY_FIELDS[key][1]
+        if decimals is not None and isinstance(source, float):
+            expected = round(source, decimals) if decimals else int(round(source))
+        assert value == expected, key
@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import pytest
+
+from conftest import import_task_module
+
+FLIGHT_START = 1.7e9 # time.time() of the first synthetic record
+FLIGHT_S = 60.0
+FLIGHT_RATE_HZ = 10.0
+COMMANDS = [(2.0, "Take off to 10m"), (30.0, "Hold here")]
+
+
+@pytest.fixture(scope="module")
+def replay():
+    return import_task_module("task2", "replay")
+
+@pytest.fixture(scope="module")
+def flight(replay, tmp_path_factory):
+    """Segments of a recorded takeoff, hover with a draining battery and RTL."""
+    log_dir = str(tmp_path_factory.mktemp("telemetry_logs"))
+    recorder_module = import_task_module("task2", "telemetry_recorder")
+
+    async def record():
+        recorder = recorder_module.TelemetryRecorder(log_dir, prefix="synthetic")
+        recorder.start()
+        for i in range(int(FLIGHT_S * FLIGHT_RATE_HZ)):
+            t = i / FLIGHT_RATE_HZ
+            in_air = 5.0 <= t < FLIGHT_S - 5.0
+            battery = int(40 - 35 * t / FLIGHT_S)
+            for topic, value in (
+                ("position", {"latitude_deg": 47.397742 + t * 1e-6, "longitude_deg": 8.545594,
+                              "relative_altitude_m": min(10.0, (t - 5.0) * 2.0) if in_air else 0.0}),
+                ("velocity_ned", {"north_m_s": 0.1, "east_m_s": 0.0, "down_m_s": 0.0}),
+                ("attitude_euler", {"roll_deg": 0.0, "pitch_deg": 0.0, "yaw_deg": 90.0}),
+                ("battery", {"remaining_percent": battery, "voltage_v": 14.0 + battery / 50}),
+                ("flight_mode", "READY" if t < 5.0 else "RETURN_TO_LAUNCH" if battery < 15 else "HOLD"),
+                ("gps_info", {"num_satellites": 10, "fix_type": 3}),
+                ("in_air", in_air),
+                ("armed", 3.0 <= t < FLIGHT_S - 2.0),
+                ("health", {"global_position_ok": True, "home_position_ok": True, "armable": True}),
+            ):
+                recorder.record(topic, value, FLIGHT_START + t)
+            future = recorder.flush()
+            if future is not None:
+                await future
+        await recorder.close()
+    asyncio.run(record())
+
+    flights = replay.find_flights([log_dir])
+    assert len(flights) == 1
+    return next(iter(flights.values()))
+
+def recording_decider(calls, latency_s=0.0):
+    """A hold decider that notes the (time.time(), time.monotonic()) of every call."""
+    async def decide(human_command, telemetry_data, call_stats=None):
+        calls.append((time.time(), time.monotonic()))
+        await asyncio.sleep(latency_s)
+        return {"action": "hold", "reason": "test"}
+    return decide
+
+
+def test_virtual_time_loop_skips_sleeps(replay):
+    loop = replay.VirtualTimeEventLoop(start=100.0)
+    try:
+        started = time.perf_counter()
+        loop.run_until_complete(asyncio.sleep(3600))
+        assert time.perf_counter() - started < 1.0
+        assert loop.time() == pytest.approx(3700.0)
+    finally:
+        loop.close()
+
+def test_replay_runs_the_recording_in_virtual_time(replay, flight):
+    report = replay.replay_flight(flight, commands=COMMANDS)
+    assert report["records"] == int(FLIGHT_S * FLIGHT_RATE_HZ) * 9
+    # From the first to the last record, plus the tail
+    assert report["virtual_s"] == pytest.approx(FLIGHT_S - 1 / FLIGHT_RATE_HZ + replay.REPLAY_TAIL_S)
+    assert report["wall_s"] < report["virtual_s"]
+    assert report["decisions"] > 0
+    # The recorded battery drains below the RTL threshold, so the rules take over
+    assert report["decided_actions"].get("rtl", 0) > 0
+    assert report["drone_commands"].get("return_to_launch") == 1
+
+def test_clock_follows_the_recording(replay, flight):
+    calls = []
+    # A single command, so no call is cut short by a newer one
+    replay.replay_flight(flight, decide=recording_decider(calls, latency_s=2.0), commands=[(0.0, "Hold here")])
+    assert len(calls) > 1
+    wall_times = [wall for wall, _ in calls]
+    assert all(FLIGHT_START <= wall <= FLIGHT_START + FLIGHT_S + replay.REPLAY_TAIL_S for wall in wall_times)
+    # Each decision takes 2 s of virtual time, on both clocks
+    assert all(b - a >= 2.0 - 1e-6 for a, b in zip(wall_times, wall_times[1:]))
+    assert all(b[1] - a[1] == pytest.approx(b[0] - a[0]) for a, b in zip(calls, calls[1:]))
+
+def test_replays_are_deterministic(replay, flight):
+    first = replay.replay_flight(flight, commands=COMMANDS)
+    second = replay.replay_flight(flight, commands=COMMANDS)
+    for key in ("records", "virtual_s", "ticks", "decisions", "sources", "decided_actions", "drone_commands"):
+        assert first[key] == second[key]
+
+def test_clocks_are_restored(replay, flight):
+    real_time, real_monotonic = time.time, time.monotonic
+    replay.replay_flight(flight, commands=COMMANDS)
+    assert (time.time, time.monotonic) == (real_time, real_monotonic)
+
+def test_clocks_are_restored_when_the_replay_fails(replay, flight, monkeypatch):
+    async def broken_replay(records, decide, commands, tail_s):
+        raise RuntimeError("replay failed")
+    monkeypatch.setattr(replay, "_replay", broken_replay)
+    real_time, real_monotonic = time.time, time.monotonic
+    with pytest.raises(RuntimeError, match="replay failed"):
+        replay.replay_flight(flight)
+    assert (time.time, time.monotonic) == (real_time, real_monotonic)
+
+def test_empty_recording(replay, tmp_path):
+    recorder_module = import_task_module("task2", "telemetry_recorder")
+    async def record_nothing():
+        recorder = recorder_module.TelemetryRecorder(str(tmp_path))
+        recorder.start()
+        recorder.record("armed", True, 1.0)
+        await recorder.close()
+    asyncio.run(record_nothing())
+    path = recorder_module.log_segments(str(tmp_path))[0]
+    with open(path, "r+b") as f:
+        f.truncate(len(recorder_module._file_header()))
+    assert replay.replay_flight([path]) is None
@@ -0,0 +1,83 @@
+import pytest
+
+from conftest import import_task_module
+
+safety_rules = import_task_module("task2", "safety_rules")
+
+FLYING = {"armed": True, "in_air": True}
+ON_GROUND = {"armed": False, "in_air": False}
+GOOD_GPS = {"gps_info": {"fix_type": 3}}
+
+
+def telemetry(*parts, battery=None, fix_type=None, **health):
+    snapshot = {}
+    for part in parts:
+        snapshot.update(part)
+    if battery is not None:
+        snapshot["battery"] = {"remaining_percent": battery}
+    if fix_type is not None:
+        snapshot["gps_info"] = {"fix_type": fix_type}
+    if health:
+        snapshot["health"] = health
+    return snapshot
+
+
+@pytest.mark.parametrize("snapshot, rule, action", [
+    (telemetry(FLYING, battery=12, home_position_ok=True), "low_battery_rtl", "rtl"),
+    (telemetry(FLYING, battery=12, home_position_ok=False), "low_battery_land", "land"),
+    (telemetry(FLYING, battery=14), "low_battery_land", "land"),
+    (telemetry(FLYING, battery=80, fix_type=0), "gps_lost_land", "land"),
+    (telemetry(FLYING, battery=80, fix_type=1), "gps_lost_land", "land"),
+    (telemetry(ON_GROUND, armable=False), "pre_arm_failed", "error"),
+])
+def test_rule_fires(snapshot, rule, action):
+    engine = safety_rules.SafetyRuleEngine()
+    decision = engine.evaluate(snapshot)
+    assert decision["rule"] == rule
+    assert decision["action"] == action
+    assert engine.hits[rule] == 1
+    assert engine.llm_fallthroughs == 0
+
+def test_pre_arm_failure_carries_message():
+    decision = safety_rules.SafetyRuleEngine().evaluate(telemetry(ON_GROUND, armable=False))
+    assert decision["message"] == safety_rules.PRE_ARM_FAILED_MESSAGE
+
+
+@pytest.mark.parametrize("snapshot, rule", [
+    # Low battery with a home position returns rather than landing
+    (telemetry(FLYING, battery=12, fix_type=3, home_position_ok=True), "low_battery_rtl"),
+    # Low battery outranks a lost GPS fix, with or without a home position
+    (telemetry(FLYING, battery=10, fix_type=0, home_position_ok=True), "low_battery_rtl"),
+    (telemetry(FLYING, battery=10, fix_type=0, home_position_ok=False), "low_battery_land"),
+])
+def test_rule_precedence(snapshot, rule):
+    assert safety_rules.SafetyRuleEngine().evaluate(snapshot)["rule"] == rule
+
+
+@pytest.mark.parametrize("snapshot", [
+    telemetry(FLYING, GOOD_GPS, battery=safety_rules.LOW_BATTERY_PERCENT, home_position_ok=True),
+    telemetry(ON_GROUND, battery=5, armable=True),
+    telemetry(FLYING, battery=80, fix_type=2),
+    telemetry(ON_GROUND, fix_type=0, armable=True),
+    telemetry(ON_GROUND),
+    telemetry({"armed": True, "in_air": False}, battery=5, fix_type=0, armable=False),
+    {},
+], ids=["battery_at_threshold", "low_battery_on_ground", "2d_fix_in_air", "no_gps_on_ground",
+        "armable_unknown", "armed_on_ground", "empty"])
+def test_no_rule_fires(snapshot):
+    engine = safety_rules.SafetyRuleEngine()
+    assert engine.evaluate(snapshot) is None
+    assert engine.llm_fallthroughs == 1
+    assert sum(engine.hits.values()) == 0
+
+
+def test_returned_actions_are_copies():
+    engine = safety_rules.SafetyRuleEngine()
+    snapshot = telemetry(FLYING, battery=12, home_position_ok=True)
+    engine.evaluate(snapshot)["action"] = "tampered"
+    assert engine.evaluate(snapshot)["action"] == "rtl"
+    assert engine.stats() == {
+        "evaluations": 2,
+        "llm_fallthroughs": 0,
+        "rule_hits": {"low_battery_rtl": 2, "low_battery_land": 0, "gps_lost_land": 0, "pre_arm_failed": 0},
+    }
@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+
+from conftest import TASKS, import_task_module
+
+
+@pytest.mark.parametrize("task", TASKS)
+def test_failing_listener_does_not_block_others_or_waiters(task, capsys):
+    telemetry = import_task_module(task, "telemetry")
+
+    async def run():
+        cache = telemetry.TelemetryCache(drone=None)
+        seen = []
+        def broken(topic, value, received_at):
+            raise RuntimeError("disk full")
+        cache.listeners = [broken, lambda topic, value, received_at: seen.append((topic, value))]
+
+        waiter = asyncio.create_task(cache.wait_for_update(timeout=1.0))
+        await asyncio.sleep(0)
+        cache.update("armed", True)
+        assert await waiter
+        return cache, seen
+
+    cache, seen = asyncio.run(run())
+    assert seen == [("armed", True)]
+    assert cache.latest["armed"] is True
+    assert cache.updates == 1
+    assert "failed on 'armed': disk full" in capsys.readouterr().out
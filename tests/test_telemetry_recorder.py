@@ -0,0 +1,138 @@
+import asyncio
+import os
+import shutil
+import threading
+
+import pytest
+
+from conftest import import_task_module
+
+SAMPLE = {
+    "position": {"latitude_deg": 47.397742, "longitude_deg": 8.545594, "relative_altitude_m": 10.5},
+    "velocity_ned": {"north_m_s": 1.0, "east_m_s": -0.5, "down_m_s": 0.25},
+    "attitude_euler": {"roll_deg": 0.4, "pitch_deg": -1.2, "yaw_deg": 90.0},
+    "battery": {"remaining_percent": 64, "voltage_v": 15.42},
+    "flight_mode": "RETURN_TO_LAUNCH",
+    "gps_info": {"num_satellites": 10, "fix_type": 3},
+    "in_air": True,
+    "armed": False,
+    "health": {"global_position_ok": True, "home_position_ok": False, "armable": True},
+}
+
+
+@pytest.fixture
+def recorder_module():
+    return import_task_module("task2", "telemetry_recorder")
+
+def record_and_close(recorder, samples):
+    """
+    Records (topic, value, received_at) samples on a running loop, then closes
+    the recorder. Each sample is flushed before the next, so none are dropped.
+    """
+    async def run():
+        recorder.start()
+        try:
+            for topic, value, received_at in samples:
+                recorder.record(topic, value, received_at)
+                future = recorder.flush()
+                if future is not None:
+                    await future
+        finally:
+            await recorder.close()
+    asyncio.run(run())
+
+def assert_same_value(read, written):
+    # float32 payload fields come back within float32 precision
+    if isinstance(written, dict):
+        assert read.keys() == written.keys()
+        for key in written:
+            assert_same_value(read[key], written[key])
+    elif isinstance(written, float):
+        assert read == pytest.approx(written, rel=1e-6)
+    else:
+        assert read == written and type(read) is type(written)
+
+
+def test_every_topic_round_trips(recorder_module, tmp_path):
+    recorder = recorder_module.TelemetryRecorder(str(tmp_path))
+    samples = [(topic, value, 1000.0 + i * 0.02) for i, (topic, value) in enumerate(SAMPLE.items())]
+    record_and_close(recorder, samples)
+
+    assert recorder_module.log_segments(str(tmp_path)) == recorder.segments
+    records = list(recorder_module.read_logs(recorder.segments))
+    assert [(received_at, topic) for received_at, topic, _ in records] == [(t, topic) for topic, _, t in samples]
+    for (_, topic, value), (_, written, _) in zip(records, samples):
+        assert_same_value(value, written)
+    assert recorder.stats() == {"records": len(SAMPLE), "dropped": 0,
+                                "bytes_written": os.path.getsize(recorder.segments[0]), "segments": 1}
+
+def test_segments_rotate(recorder_module, tmp_path):
+    recorder = recorder_module.TelemetryRecorder(str(tmp_path), rotate_bytes=2048, flush_bytes=256)
+    samples = [(topic, value, 1000.0 + i) for i in range(60) for topic, value in SAMPLE.items()]
+    record_and_close(recorder, samples)
+
+    segments = recorder_module.log_segments(str(tmp_path))
+    assert len(segments) > 1 and segments == recorder.segments
+    assert all(os.path.getsize(path) <= 2048 for path in segments)
+    # Every segment is readable on its own, and together they hold every record in order
+    assert all(next(recorder_module.read_log(path), None) is not None for path in segments)
+    records = list(recorder_module.read_logs(segments))
+    assert [(t, topic) for t, topic, _ in records] == [(t, topic) for topic, _, t in samples]
+    assert sum(map(os.path.getsize, segments)) == recorder.bytes_written
+    assert recorder.dropped == 0
+
+def test_truncated_final_record_is_ignored(recorder_module, tmp_path):
+    recorder = recorder_module.TelemetryRecorder(str(tmp_path))
+    record_and_close(recorder, [("position", SAMPLE["position"], 1.0), ("position", SAMPLE["position"], 2.0)])
+    path = recorder.segments[0]
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 3)
+    assert [t for t, _, _ in recorder_module.read_log(path)] == [1.0]
+
+def test_rejects_other_files(recorder_module, tmp_path):
+    path = tmp_path / "other.odtl"
+    path.write_bytes(b"JUNKJUNKJUNK")
+    with pytest.raises(ValueError, match="not a telemetry log"):
+        list(recorder_module.read_log(str(path)))
+
+def test_unusable_values_are_skipped(recorder_module, tmp_path):
+    recorder = recorder_module.TelemetryRecorder(str(tmp_path))
+    record_and_close(recorder, [
+        ("position", {"latitude_deg": 1.0}, 1.0), # missing fields
+        ("gps_info", {"num_satellites": 10, "fix_type": 300}, 2.0), # out of range for its byte
+        ("position", None, 3.0),
+        ("stale_topics", ["battery"], 4.0), # not a recorded topic
+        ("flight_mode", "NOT_A_MODE", 5.0),
+    ])
+    assert (recorder.records, recorder.dropped) == (1, 2)
+    assert list(recorder_module.read_log(recorder.segments[0])) == [(5.0, "flight_mode", "UNKNOWN")]
+
+def test_records_are_dropped_while_the_disk_is_behind(recorder_module, tmp_path):
+    recorder = recorder_module.TelemetryRecorder(str(tmp_path), flush_bytes=1)
+    disk = threading.Event()
+    write = recorder._write
+    def slow_write(data):
+        disk.wait(5.0)
+        write(data)
+    recorder._write = slow_write
+
+    async def run():
+        recorder.start()
+        for i in range(recorder_module.MAX_PENDING_FLUSHES + 5):
+            recorder.record("armed", True, float(i))
+        assert (recorder.records, recorder.dropped) == (recorder_module.MAX_PENDING_FLUSHES, 5)
+        disk.set()
+        await recorder.close()
+    asyncio.run(run())
+    assert len(list(recorder_module.read_log(recorder.segments[0]))) == recorder_module.MAX_PENDING_FLUSHES
+
+def test_close_reports_write_errors(recorder_module, tmp_path):
+    log_dir = tmp_path / "logs"
+    recorder = recorder_module.TelemetryRecorder(str(log_dir))
+    async def run():
+        recorder.start()
+        recorder.record("armed", True, 1.0)
+        shutil.rmtree(log_dir)
+        await recorder.close()
+    with pytest.raises(OSError):
+        asyncio.run(run())